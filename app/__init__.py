@@ -2,6 +2,7 @@
 # Imports
 
 from flask import Flask
+from jinja2 import FileSystemBytecodeCache
 import os
 from flask_sqlalchemy import SQLAlchemy
 from dotenv import load_dotenv
@@ -9,6 +10,7 @@ from config import Config, instance_path # Import instance_path
 from flask_migrate import Migrate
 from flask_wtf import CSRFProtect
 from flask_login import LoginManager
+from sqlalchemy import event
 
 # Load the environment variable
 load_dotenv()
@@ -26,11 +28,49 @@ app.config.from_object(Config)
 if not os.path.exists(instance_path):
     os.makedirs(instance_path)
 
+# Persistent Jinja bytecode cache; set before the first template use creates the environment
+if app.config['JINJA_BYTECODE_CACHE_DIR']:
+    os.makedirs(app.config['JINJA_BYTECODE_CACHE_DIR'], exist_ok=True)
+    app.jinja_options = {**app.jinja_options, 'bytecode_cache': FileSystemBytecodeCache(app.config['JINJA_BYTECODE_CACHE_DIR'])}
+
 # Initialise database
 db = SQLAlchemy(app)
+
+def apply_sqlite_pragmas(dbapi_connection, pragmas):
+    """
+    Runs PRAGMA statements on a raw SQLite connection.
+    Args:
+        dbapi_connection: A sqlite3 connection.
+        pragmas (dict): {pragma name: value}, applied in order.
+    """
+    cursor = dbapi_connection.cursor()
+    for name, value in pragmas.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+def on_sqlite_connect(dbapi_connection, connection_record):
+    apply_sqlite_pragmas(dbapi_connection, app.config['SQLITE_PRAGMAS'])
+
+# Apply the SQLite engine profile to every pooled connection
+with app.app_context():
+    if db.engine.dialect.name == 'sqlite':
+        event.listen(db.engine, 'connect', on_sqlite_connect)
+
 # migrate database
 migrate = Migrate(app,db)
 
+# Opt-in request timing, switched on by the REQUEST_TIMING setting
+from app.instrumentation import init_instrumentation
+init_instrumentation(app, db)
+
+# Registered after the timing hooks so it runs before them and its cost shows up in Server-Timing
+from app.compression import init_compression
+init_compression(app)
+
+# {% call cached_fragment(key...) %} in templates
+from app.fragment_cache import cached_fragment
+app.add_template_global(cached_fragment)
+
 # Initialize Flask-Login
 login_manager = LoginManager()
 login_manager.init_app(app)
@@ -39,16 +79,14 @@ login_manager.login_view = 'login' # Changed from 'routes.login'
 # import models 
 from app import models
 
-# User loader function for Flask-Login
-@login_manager.user_loader
-def load_user(user_id):
-    print(f"--- load_user called with user_id: {user_id} ---")
-    user = models.User.query.get(int(user_id)) # Changed UserInfo to User
-    print(f"--- load_user returning: {user} ---")
-    return user
+# User loader function for Flask-Login, backed by a TTL cache
+from app.user_cache import load_user
+login_manager.user_loader(load_user)
 
 #  Input routes
 from app import routes
+#  CLI maintenance commands
+from app import commands
 #  Register Bluprints
 from app.upload import upload_bp
 app.register_blueprint(upload_bp)
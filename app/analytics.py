@@ -0,0 +1,177 @@
+# analytics.py
+# Dashboard metrics for the visualise page, computed with pandas over one user's entry columns.
+# The semantics follow what static/js/visualise.js used to compute from the raw rows in the browser,
+# so the page only receives the per-day series and the handful of numbers each chart draws.
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+from app import db, columnar
+from app.models import FitnessEntry, FoodEntry
+
+FITNESS_COLUMNS = ('date', 'activity_type', 'duration', 'calories_burned', 'emotion')
+FOOD_COLUMNS = ('date', 'meal_type', 'calories')
+MEAL_TYPES = ('Breakfast', 'Lunch', 'Dinner', 'Snack')
+
+# Radar chart: raw value at which each metric scores 100
+PERFORMANCE_MAX = {
+    'Consistency': 100,  # % of days in the window with a workout
+    'Duration': 120,  # A 2-hour average workout is excellent
+    'Intensity': 15,  # 15 calories per minute is high intensity
+    'Frequency': 10,  # 10 different activities
+    'Diversity': 10
+}
+# Goal chart: (target, unit)
+GOALS = {
+    'Weekly Activity': (5, 'sessions'),  # Active days per week
+    'Daily Movement': (30, 'minutes'),  # Average per active day
+    'Calorie Burn': (2000, 'calories'),
+    'Activity Diversity': (3, 'types')
+}
+
+
+def _frame(model, columns, user_id, start_date, end_date):
+    # Newest first, like /api/entries, so ties keep the order the browser used to see
+    stmt = select(*(getattr(model, column) for column in columns)).where(model.user_id == user_id)
+    if start_date:
+        stmt = stmt.where(model.date >= start_date)
+    if end_date:
+        stmt = stmt.where(model.date <= end_date)
+    rows = db.session.execute(stmt.order_by(model.date.desc(), model.id.desc())).all()
+    frame = pd.DataFrame.from_records(rows, columns=list(columns))
+    frame['date'] = pd.to_datetime(frame['date'])
+    return frame
+
+def _cached_frame(kind, columns, user_id, start_date, end_date, version):
+    # Same frame as _frame, sliced out of the memory-mapped columnar cache
+    entries = columnar.load_columns(user_id, kind, version).window(start_date, end_date).newest_first()
+    frame = pd.DataFrame({column: entries.decoded(column) for column in columns})
+    frame['date'] = frame['date'].astype('datetime64[ns]')
+    return frame
+
+def load_entry_frames(user_id, start_date, end_date, version=None):
+    """
+    Reads the columns the dashboard needs for one user and window.
+    Args:
+        user_id (int): The user whose entries are read.
+        start_date (date, optional): First day to include.
+        end_date (date, optional): Last day to include.
+        version (int, optional): The user's data_version, which saves the columnar cache a lookup.
+    Returns:
+        tuple: (fitness DataFrame, food DataFrame)
+    """
+    if columnar.is_enabled():
+        return (_cached_frame('fitness', FITNESS_COLUMNS, user_id, start_date, end_date, version),
+                _cached_frame('food', FOOD_COLUMNS, user_id, start_date, end_date, version))
+    return (_frame(FitnessEntry, FITNESS_COLUMNS, user_id, start_date, end_date),
+            _frame(FoodEntry, FOOD_COLUMNS, user_id, start_date, end_date))
+
+def _truthy_strings(series):
+    # JavaScript truthiness for the optional text columns: drop NULL and ''
+    return series.notna() & (series.fillna('') != '')
+
+def _js_round(value):
+    # Math.round rounds halves up; Python's round() would round them to even
+    return int(np.floor(value + 0.5))
+
+def dashboard_metrics(fitness, food):
+    """
+    Computes every dashboard chart's numbers from the entry frames.
+    Args:
+        fitness (DataFrame): FITNESS_COLUMNS rows, newest first.
+        food (DataFrame): FOOD_COLUMNS rows, newest first.
+    Returns:
+        dict: JSON-ready metrics; ordered collections are lists because jsonify sorts dict keys.
+    """
+    duration = fitness['duration'].astype(float).fillna(0.0)
+    burned = fitness['calories_burned'].astype(float).fillna(0.0)
+    consumed = food['calories'].astype(float).fillna(0.0)
+
+    # Per-day series over every date with a fitness or food entry
+    fitness_days = pd.DataFrame({'duration': duration, 'burned': burned, 'date': fitness['date']}).groupby('date').sum()
+    food_days = consumed.groupby(food['date']).sum()
+    dates = fitness_days.index.union(food_days.index).sort_values()
+    day_duration = fitness_days['duration'].reindex(dates, fill_value=0.0).to_numpy()
+    day_burned = fitness_days['burned'].reindex(dates, fill_value=0.0).to_numpy()
+    day_consumed = food_days.reindex(dates, fill_value=0.0).to_numpy()
+    per_minute = np.divide(day_burned, day_duration, out=np.zeros_like(day_burned), where=day_duration > 0)
+
+    # Activity types in order of first appearance, then a stable sort by intensity
+    typed = _truthy_strings(fitness['activity_type'])
+    by_type = pd.DataFrame({
+        'type': fitness['activity_type'][typed], 'duration': duration[typed], 'burned': burned[typed]
+    }).groupby('type', sort=False).agg(count=('type', 'size'), duration=('duration', 'sum'), burned=('burned', 'sum'))
+    by_type['intensity'] = np.divide(by_type['burned'].to_numpy(), by_type['duration'].to_numpy(),
+                                     out=np.zeros(len(by_type)), where=by_type['duration'].to_numpy() > 0)
+    top_intensity = by_type.sort_values('intensity', ascending=False, kind='stable').head(10)
+    type_count = len(by_type)
+
+    workouts = len(fitness)
+    total_duration = float(duration.sum())
+    total_burned = float(burned.sum())
+    total_consumed = float(consumed.sum())
+
+    performance = {
+        'Consistency': fitness_days.shape[0] / len(dates) * 100 if workouts and len(dates) else 0,
+        'Duration': total_duration / workouts if workouts else 0,
+        'Intensity': total_burned / total_duration if total_duration > 0 else 0,
+        'Frequency': min(type_count, 10),
+        'Diversity': type_count
+    }
+
+    # Missing or unknown meal types count as snacks
+    meals = food['meal_type'].where(food['meal_type'].isin(MEAL_TYPES), 'Snack')
+    meal_totals = pd.DataFrame({'meal': meals, 'calories': consumed}).groupby('meal').agg(
+        count=('meal', 'size'), calories=('calories', 'sum')).reindex(list(MEAL_TYPES), fill_value=0)
+
+    emotional = _truthy_strings(fitness['emotion'])
+    emotions = fitness['emotion'][emotional].groupby(fitness['emotion'][emotional], sort=False).size()
+
+    # Weeks are keyed by calendar year and whole weeks since the epoch, as new Date(date) does in UTC
+    active_days = fitness_days.index
+    week_keys = pd.DataFrame({'year': active_days.year, 'week': (active_days - pd.Timestamp(0)).days // 7})
+    week_count = len(week_keys.drop_duplicates())
+    goal_values = {
+        'Weekly Activity': len(active_days) / week_count if week_count else 0,
+        'Daily Movement': float(fitness_days['duration'].mean()) if len(active_days) else 0,
+        'Calorie Burn': total_burned,
+        'Activity Diversity': type_count
+    }
+
+    return {
+        'dates': [day.date().isoformat() for day in dates],
+        'daily': {
+            'duration': day_duration.tolist(),
+            'calories_burned': day_burned.tolist(),
+            'calories_consumed': day_consumed.tolist(),
+            'calorie_gap': (day_consumed - day_burned).tolist(),
+            'calories_per_minute': per_minute.tolist()
+        },
+        'summary': {
+            'workouts': workouts,
+            'food_entries': len(food),
+            'workout_minutes': total_duration,
+            'calories_burned': total_burned,
+            'calories_consumed': total_consumed,
+            'calorie_gap': total_consumed - total_burned
+        },
+        'intensity': [
+            {'type': activity_type, 'intensity': float(row['intensity']), 'count': int(row['count']),
+             'total_calories': float(row['burned'])}
+            for activity_type, row in top_intensity.iterrows()
+        ],
+        'performance': [
+            {'metric': metric, 'value': float(value), 'score': min(100.0, value / PERFORMANCE_MAX[metric] * 100)}
+            for metric, value in performance.items()
+        ],
+        'meals': [
+            {'meal_type': meal_type, 'count': int(row['count']), 'calories': float(row['calories'])}
+            for meal_type, row in meal_totals.iterrows()
+        ],
+        'emotions': [{'emotion': emotion, 'count': int(count)} for emotion, count in emotions.items()],
+        'goals': [
+            {'goal': goal, 'target': target, 'unit': unit, 'current': float(goal_values[goal]),
+             'percentage': _js_round(min(100, goal_values[goal] / target * 100))}
+            for goal, (target, unit) in GOALS.items()
+        ]
+    }
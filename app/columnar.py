@@ -0,0 +1,370 @@
+# columnar.py
+# Optional per-user columnar copy of the fitness and food entry history for analytics reads.
+# Each user's entries of one kind are stored as raw NumPy column files under COLUMNAR_CACHE_DIR,
+# sorted by (date, id), with the text columns dictionary-encoded. Reads memory-map the files, so a
+# date range is two searchsorted calls and a slice; nothing is copied until a caller decodes it.
+#
+# A table is stamped with the users.data_version it was built at and rebuilt from SQL when the
+# version has moved on. /upload appends the rows it committed instead; deletes drop the table.
+
+import json
+import os
+import shutil
+import threading
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+import numpy as np
+from flask import current_app
+from sqlalchemy import select
+from app import db
+from app.models import User, FitnessEntry, FoodEntry
+
+try:
+    import fcntl
+except ImportError:  # Not on Windows; the in-process lock below still serialises this process's writers
+    fcntl = None
+
+# kind -> (model, numeric columns, dictionary-encoded text columns)
+TABLES = {
+    'fitness': (FitnessEntry, ('duration', 'calories_burned'), ('activity_type', 'emotion')),
+    'food': (FoodEntry, ('quantity', 'calories'), ('food_name', 'meal_type'))
+}
+NULL_CODE = -1  # Code stored for a NULL text value
+
+_thread_lock = threading.Lock()
+# (directory, kind) -> (generation, rows, EntryColumns); saves re-mapping unchanged files on every read
+_mapped = OrderedDict()
+_mapped_lock = threading.Lock()
+MAPPED_TABLES = 256  # Most recently read tables kept mapped per process
+
+
+def is_enabled():
+    """Whether analytics reads should go through the columnar cache (app.config['COLUMNAR_CACHE'])."""
+    return bool(current_app.config.get('COLUMNAR_CACHE'))
+
+def _user_dir(user_id):
+    return os.path.join(current_app.config['COLUMNAR_CACHE_DIR'], str(int(user_id)))
+
+def _dtypes(kind):
+    _, numeric, encoded = TABLES[kind]
+    dtypes = {'id': np.dtype('int64'), 'date': np.dtype('datetime64[D]')}
+    dtypes.update({column: np.dtype('float64') for column in numeric})  # NULL is stored as NaN
+    dtypes.update({column: np.dtype('int32') for column in encoded})
+    return dtypes
+
+def _column_path(directory, kind, generation, column):
+    return os.path.join(directory, f'{kind}.{generation}.{column}.bin')
+
+def _meta_path(directory, kind):
+    return os.path.join(directory, f'{kind}.json')
+
+def _read_meta(directory, kind):
+    try:
+        with open(_meta_path(directory, kind)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _write_meta(directory, kind, meta):
+    # Readers open the column files a meta file names, so it is replaced only after they are written
+    path = _meta_path(directory, kind)
+    temp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump(meta, f)
+    os.replace(temp_path, path)
+
+@contextmanager
+def _locked(directory):
+    """Serialises builders and appenders of one user's tables, across threads and (with fcntl) processes."""
+    os.makedirs(directory, exist_ok=True)
+    with _thread_lock:
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(directory, 'lock'), 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def _current_version(user_id):
+    return db.session.query(User.data_version).filter(User.id == user_id).scalar()
+
+def _fetch(kind, user_id, after_id=None):
+    """Reads a user's rows of one kind, sorted by (date, id), as one array per column."""
+    model, numeric, encoded = TABLES[kind]
+    columns = ('id', 'date') + numeric + encoded
+    stmt = select(*(getattr(model, column) for column in columns)).where(model.user_id == user_id)
+    if after_id is not None:
+        stmt = stmt.where(model.id > after_id)
+    rows = db.session.execute(stmt.order_by(model.date, model.id)).all()
+    values = list(zip(*rows)) if rows else [()] * len(columns)
+    return dict(zip(columns, values))
+
+def _encode(raw, dictionaries, dtypes):
+    """Turns _fetch output into typed arrays, adding unseen strings to the dictionaries in place."""
+    arrays = {'id': np.array(raw['id'], dtype=dtypes['id']), 'date': np.array(raw['date'], dtype=dtypes['date'])}
+    for column, dtype in dtypes.items():
+        if column in arrays:
+            continue
+        if column in dictionaries:
+            dictionary = dictionaries[column]
+            index = {value: code for code, value in enumerate(dictionary)}
+            codes = []
+            for value in raw[column]:
+                if value is None:
+                    codes.append(NULL_CODE)
+                    continue
+                if value not in index:
+                    index[value] = len(dictionary)
+                    dictionary.append(value)
+                codes.append(index[value])
+            arrays[column] = np.array(codes, dtype=dtype)
+        else:
+            arrays[column] = np.array(raw[column], dtype=dtype)  # None becomes NaN
+    return arrays
+
+def _build(directory, kind, user_id, version):
+    """Writes a fresh generation of a table from SQL and points the meta file at it."""
+    old_meta = _read_meta(directory, kind)
+    dictionaries = {column: [] for column in TABLES[kind][2]}
+    arrays = _encode(_fetch(kind, user_id), dictionaries, _dtypes(kind))
+    generation = uuid.uuid4().hex[:12]
+    for column, values in arrays.items():
+        values.tofile(_column_path(directory, kind, generation, column))
+    meta = {
+        'version': version,
+        'generation': generation,
+        'rows': len(arrays['id']),
+        'max_id': int(arrays['id'].max()) if len(arrays['id']) else 0,
+        'last_date': str(arrays['date'][-1]) if len(arrays['date']) else None,
+        'dictionaries': dictionaries
+    }
+    _write_meta(directory, kind, meta)
+    if old_meta:
+        _remove_generation(directory, kind, old_meta['generation'])
+    return meta
+
+def _remove_generation(directory, kind, generation):
+    for column in _dtypes(kind):
+        try:
+            os.remove(_column_path(directory, kind, generation, column))
+        except OSError:
+            # Already gone, or (on Windows) still mapped by a reader; the next build retries
+            pass
+
+
+class EntryColumns:
+    """
+    A read-only view of one user's entries of one kind, sorted by (date, id).
+    Column arrays are memory-mapped (or slices of them); text columns hold dictionary codes.
+    """
+
+    def __init__(self, kind, arrays, dictionaries):
+        self.kind = kind
+        self.arrays = arrays
+        self.dictionaries = dictionaries
+
+    def __len__(self):
+        return len(self.arrays['id'])
+
+    def window(self, start_date=None, end_date=None):
+        """
+        Restricts the view to a date range without copying.
+        Args:
+            start_date (date, optional): First day to include.
+            end_date (date, optional): Last day to include.
+        Returns:
+            EntryColumns: A view over the rows dated in the range.
+        """
+        dates = self.arrays['date']
+        start = np.searchsorted(dates, np.datetime64(start_date, 'D'), 'left') if start_date else 0
+        end = np.searchsorted(dates, np.datetime64(end_date, 'D'), 'right') if end_date else len(dates)
+        return EntryColumns(self.kind, {column: values[start:end] for column, values in self.arrays.items()},
+                            self.dictionaries)
+
+    def newest_first(self):
+        """Returns the same rows ordered by (date, id) descending, as a reversed view."""
+        return EntryColumns(self.kind, {column: values[::-1] for column, values in self.arrays.items()},
+                            self.dictionaries)
+
+    def decoded(self, column):
+        """
+        Returns a column with codes turned back into strings (None for NULL) and NaN into None.
+        Args:
+            column (str): Any column name, including 'date'.
+        Returns:
+            ndarray: An object array for text columns, otherwise the stored array itself.
+        """
+        values = self.arrays[column]
+        if column in self.dictionaries:
+            # NULL_CODE (-1) indexes the trailing None
+            lookup = np.array(self.dictionaries[column] + [None], dtype=object)
+            return lookup[values]
+        return values
+
+    def records(self, columns):
+        """
+        Builds JSON-ready dicts, with ISO dates and None for NULL, for the given columns.
+        Args:
+            columns (iterable[str]): Column names in the order the dicts should list them.
+        Returns:
+            list[dict]: One dict per row.
+        """
+        values = []
+        for column in columns:
+            if column == 'date':
+                values.append(np.datetime_as_string(self.arrays['date']).tolist())
+            elif column in self.dictionaries:
+                values.append(self.decoded(column).tolist())
+            else:
+                array = self.arrays[column]
+                if array.dtype.kind == 'f':
+                    objects = array.astype(object)
+                    objects[np.isnan(array)] = None
+                    values.append(objects.tolist())
+                else:
+                    values.append(array.tolist())
+        return [dict(zip(columns, row)) for row in zip(*values)]
+
+
+def _open(directory, kind, meta):
+    key = (directory, kind)
+    with _mapped_lock:
+        mapped = _mapped.get(key)
+        if mapped is not None and mapped[:2] == (meta['generation'], meta['rows']):
+            _mapped.move_to_end(key)
+            return mapped[2]
+    arrays = {}
+    for column, dtype in _dtypes(kind).items():
+        if meta['rows'] == 0:
+            arrays[column] = np.empty(0, dtype=dtype)
+        else:
+            # Appends only ever extend the files, so mapping the first `rows` values is consistent
+            arrays[column] = np.memmap(_column_path(directory, kind, meta['generation'], column),
+                                       dtype=dtype, mode='r', shape=(meta['rows'],))
+    columns = EntryColumns(kind, arrays, meta['dictionaries'])
+    with _mapped_lock:
+        _mapped[key] = (meta['generation'], meta['rows'], columns)
+        _mapped.move_to_end(key)
+        while len(_mapped) > MAPPED_TABLES:
+            _mapped.popitem(last=False)
+    return columns
+
+def load_columns(user_id, kind, version=None):
+    """
+    Returns a user's cached entry columns, building or rebuilding the table if it is missing or stale.
+    Args:
+        user_id (int): The user whose entries are read.
+        kind (str): 'fitness' or 'food'.
+        version (int, optional): The user's current data_version, if the caller already has it.
+    Returns:
+        EntryColumns: Every entry of that kind; use window() to select dates.
+    """
+    if kind not in TABLES:
+        raise ValueError(f"Unknown entry type: {kind}")
+    directory = _user_dir(user_id)
+    if version is None:
+        version = _current_version(user_id)
+    meta = _read_meta(directory, kind)
+    if meta is not None and meta['version'] == version:
+        try:
+            return _open(directory, kind, meta)
+        except FileNotFoundError:
+            pass  # Replaced by a rebuild between reading meta and mapping; rebuild under the lock
+    with _locked(directory):
+        meta = _read_meta(directory, kind)
+        if meta is None or meta['version'] != version:
+            meta = _build(directory, kind, user_id, version)
+        return _open(directory, kind, meta)
+
+def append_entries(user_id, food_rows=()):
+    """
+    Appends the entries a user committed since their tables were built; call after committing an upload.
+    Rows are fetched by id above the cached maximum. A table is dropped instead (and rebuilt on the
+    next read) when a new row is dated before its last cached day, or when an upserted food row
+    replaced a meal it already holds.
+    Args:
+        user_id (int): The uploading user.
+        food_rows (iterable[dict]): The rows passed to upsert_user_food_entries, with date and meal_type.
+    """
+    if not is_enabled():
+        return
+    directory = _user_dir(user_id)
+    if not os.path.isdir(directory):
+        return
+    try:
+        with _locked(directory):
+            version = _current_version(user_id)
+            for kind in TABLES:
+                meta = _read_meta(directory, kind)
+                if meta is None:
+                    continue
+                if kind == 'food' and _replaces_cached_meal(directory, meta, food_rows):
+                    _drop(directory, kind, meta)
+                    continue
+                dictionaries = {column: list(values) for column, values in meta['dictionaries'].items()}
+                arrays = _encode(_fetch(kind, user_id, after_id=meta['max_id']), dictionaries, _dtypes(kind))
+                if len(arrays['id']) and meta['last_date'] and arrays['date'][0] < np.datetime64(meta['last_date']):
+                    _drop(directory, kind, meta)
+                    continue
+                for column, values in arrays.items():
+                    with open(_column_path(directory, kind, meta['generation'], column), 'ab') as f:
+                        values.tofile(f)
+                if len(arrays['id']):
+                    meta['rows'] += len(arrays['id'])
+                    meta['max_id'] = max(meta['max_id'], int(arrays['id'].max()))
+                    meta['last_date'] = str(arrays['date'][-1])
+                meta['version'] = version
+                meta['dictionaries'] = dictionaries
+                _write_meta(directory, kind, meta)
+    except OSError as e:
+        # The cache is only an accelerator; a failed append leaves a stale stamp that forces a rebuild
+        print(f"Error appending to columnar cache for user {user_id}: {e}")
+
+def _replaces_cached_meal(directory, meta, food_rows):
+    meals = meta['dictionaries']['meal_type']
+    keys = {(row['date'], row['meal_type']) for row in food_rows if row.get('meal_type') in meals}
+    if not keys or meta['rows'] == 0:
+        return False
+    cached = _open(directory, 'food', meta)
+    for row_date, meal_type in keys:
+        day = cached.window(row_date, row_date)
+        if np.any(day.arrays['meal_type'] == meals.index(meal_type)):
+            return True
+    return False
+
+def _drop(directory, kind, meta):
+    with _mapped_lock:
+        _mapped.pop((directory, kind), None)
+    try:
+        os.remove(_meta_path(directory, kind))
+    except OSError:
+        pass
+    _remove_generation(directory, kind, meta['generation'])
+
+def invalidate(user_id, kind=None):
+    """
+    Drops a user's cached table of one kind (or both); call after committing a delete or edit.
+    Args:
+        user_id (int): The user whose entries changed.
+        kind (str, optional): 'fitness' or 'food'; None drops both.
+    """
+    if not is_enabled():
+        return
+    directory = _user_dir(user_id)
+    if not os.path.isdir(directory):
+        return
+    with _locked(directory):
+        for table in ([kind] if kind else TABLES):
+            meta = _read_meta(directory, table)
+            if meta is not None:
+                _drop(directory, table, meta)
+
+def clear():
+    """Removes every user's cached tables."""
+    with _mapped_lock:
+        _mapped.clear()
+    shutil.rmtree(current_app.config['COLUMNAR_CACHE_DIR'], ignore_errors=True)
@@ -0,0 +1,13 @@
+# commands.py
+# Maintenance commands, run with `flask <command>`
+import click
+from app import app
+from app.rollups import rebuild_daily_user_stats
+
+
+@app.cli.command('rebuild-daily-stats')
+@click.option('--user-id', 'user_ids', type=int, multiple=True, help='Only rebuild this user (repeatable).')
+def rebuild_daily_stats_command(user_ids):
+    """Backfill daily_user_stats from the fitness and food entry tables."""
+    written = rebuild_daily_user_stats(list(user_ids) or None)
+    click.echo(f"Rebuilt {written} daily rollup rows.")
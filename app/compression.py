@@ -0,0 +1,64 @@
+# compression.py
+# Compresses text responses (rendered pages, JSON, CSV) for clients that accept it.
+# Brotli is used when the optional brotli package is installed and preferred by the client, gzip otherwise.
+
+import gzip
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # Optional; responses fall back to gzip
+    brotli = None
+
+
+def _compress(data, encoding, config):
+    if encoding == 'br':
+        return brotli.compress(data, quality=config['COMPRESS_BROTLI_QUALITY'])
+    # mtime=0 keeps the output identical for identical bodies
+    return gzip.compress(data, compresslevel=config['COMPRESS_LEVEL'], mtime=0)
+
+def choose_encoding(accept_encodings):
+    """
+    Picks the content coding to use from the client's Accept-Encoding.
+    Args:
+        accept_encodings (Accept): request.accept_encodings.
+    Returns:
+        str or None: 'br', 'gzip', or None to send the body as is.
+    """
+    offered = ['br', 'gzip'] if brotli is not None else ['gzip']
+    return accept_encodings.best_match(offered)
+
+def init_compression(app):
+    """
+    Registers the compression hook. It stays inert unless app.config['COMPRESS_RESPONSES'] is true.
+    Args:
+        app (Flask): The application.
+    """
+
+    @app.after_request
+    def compress_response(response):
+        config = app.config
+        if not config.get('COMPRESS_RESPONSES') or response.mimetype not in config['COMPRESS_MIMETYPES']:
+            return response
+
+        # The body depends on Accept-Encoding whether or not this particular response is compressed
+        response.vary.add('Accept-Encoding')
+        if (response.status_code < 200 or response.status_code in (204, 206, 304)
+                or response.direct_passthrough or response.is_streamed
+                or 'Content-Encoding' in response.headers or response.cache_control.no_transform):
+            return response
+
+        encoding = choose_encoding(request.accept_encodings)
+        if encoding is None:
+            return response
+        data = response.get_data()
+        if len(data) < config['COMPRESS_MIN_SIZE']:
+            return response
+
+        response.set_data(_compress(data, encoding, config))
+        response.headers['Content-Encoding'] = encoding
+        # The compressed bytes differ from the identity ones, so a strong validator must become weak
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
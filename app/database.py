@@ -1,10 +1,22 @@
 from app import db
 from app.models import User, UserInfo, FitnessEntry, FoodEntry, ShareEntry  # Added ShareEntry
+from app.rollups import track_entries
+from app.user_cache import invalidate_user
+from app.share_cache import cached_snapshot, invalidate_share
+from app.fragment_cache import invalidate_fragments
+from app.serializers import rows_to_script_json
+from app.passwords import hash_password, needs_rehash, PasswordHashingBusy
 from werkzeug.security import check_password_hash, generate_password_hash
 from datetime import date, time, datetime, timedelta  # Added datetime, timedelta
 from sqlalchemy.exc import IntegrityError  # Added IntegrityError
-from sqlalchemy import or_  # Added or_
+from sqlalchemy import or_, and_, select, func  # Added or_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.mysql import insert as mysql_insert
 from typing import Optional  # <-- Added for Python 3.9 compatibility
+from types import SimpleNamespace
+import base64
+import binascii
 
 def login_user(email_or_username, password):
     """
@@ -16,32 +28,57 @@ def login_user(email_or_username, password):
         User: The User object if login is successful, None otherwise.
     """
     user = User.query.filter(or_(User.email == email_or_username, User.username == email_or_username)).first()
-    if user and user.check_password(password):  # Assumes User model has check_password method
-        return user
-    return None
+    if user is None:
+        return None
+
+    # Detach the user and end the read transaction so the pooled connection
+    # goes back to the pool instead of being held while PBKDF2 runs
+    db.session.expunge(user)
+    db.session.rollback()
+
+    if not user.check_password(password):  # Assumes User model has check_password method
+        return None
+    if needs_rehash(user.password_hash):
+        # Upgrade hashes made with an older work factor while the plain password is at hand
+        try:
+            new_hash = hash_password(password)
+            User.query.filter_by(id=user.id).update({'password_hash': new_hash})
+            db.session.commit()
+            user.password_hash = new_hash
+        except PasswordHashingBusy:
+            pass  # Try again on the next login
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error upgrading password hash for user {user.id}: {str(e)}")
+    return user
 
-def register_user(username, email, password, gender, age, height, weight):
+def register_user(username, email, password, gender, age, height, weight, password_hash=None):
     """
     Registers a new user and creates an associated UserInfo record.
     Args:
         username (str): The user's username.
         email (str): The user's email.
-        password (str): The user's password.
+        password (str): The user's password; ignored when password_hash is given.
         gender (str): The user's gender.
         age (int): The user's age.
         height (float): The user's height.
         weight (float): The user's weight.
+        password_hash (str): A hash from app.passwords.hash_password, for callers that never hold the plaintext.
     Returns:
         User: The newly created User object if registration is successful, None otherwise.
     """
+    # Hash before touching the database, so no pooled connection is held while PBKDF2 runs,
+    # and outside the try so a busy hashing pool surfaces as a 503 rather than a failed registration
+    if password_hash is None:
+        password_hash = hash_password(password)
+
     if User.query.filter_by(email=email).first() is not None:
         return None  # Email already exists
     if User.query.filter_by(username=username).first() is not None:
         return None  # Username already exists
     
     try:
-        new_user = User(username=username, email=email)
-        new_user.set_password(password)  # Assumes User model has set_password method
+        new_user = User(username=username, email=email, password_hash=password_hash)
         db.session.add(new_user)
         db.session.flush()  # Flush to get the new_user.id for the UserInfo record
 
@@ -91,6 +128,7 @@ def reset_password(user, new_password):
     """
     user.set_password(new_password)
     db.session.commit()
+    invalidate_user(user.id)
 
 def update_user_profile_details(
     user_id_to_update: int, 
@@ -136,6 +174,7 @@ def update_user_profile_details(
     
     if updated:
         db.session.commit()
+        invalidate_user(user_id_to_update)
     return user_info  # Return UserInfo object
 
 def add_user_fitness_entry(user_id, date_val: date, activity_type_val: str, duration_val: float, calories_burned_val: float, emotion_val: str):
@@ -152,35 +191,156 @@ def add_user_fitness_entry(user_id, date_val: date, activity_type_val: str, dura
         emotion=emotion_val
     )
     db.session.add(new_entry)
+    track_entries(fitness_entries=[new_entry])
     db.session.commit()
     return new_entry
 
+FOOD_UPSERT_KEY = ('user_id', 'date', 'meal_type')
+FOOD_UPSERT_COLUMNS = ('food_name', 'quantity', 'calories')
+
+def _food_upsert_statement(dialect_name):
+    """
+    Builds a dialect-specific INSERT that updates the existing row on a (user_id, date, meal_type) conflict.
+    Returns:
+        The statement, or None when the dialect has no such INSERT.
+    """
+    table = FoodEntry.__table__
+    if dialect_name == 'sqlite':
+        stmt = sqlite_insert(table)
+        return stmt.on_conflict_do_update(
+            index_elements=list(FOOD_UPSERT_KEY),
+            set_={column: stmt.excluded[column] for column in FOOD_UPSERT_COLUMNS}
+        )
+    if dialect_name == 'postgresql':
+        stmt = postgresql_insert(table)
+        return stmt.on_conflict_do_update(
+            index_elements=list(FOOD_UPSERT_KEY),
+            set_={column: stmt.excluded[column] for column in FOOD_UPSERT_COLUMNS}
+        )
+    if dialect_name in ('mysql', 'mariadb'):
+        stmt = mysql_insert(table)
+        return stmt.on_duplicate_key_update({column: stmt.inserted[column] for column in FOOD_UPSERT_COLUMNS})
+    return None
+
+def _lock_food_entries(user_ids):
+    """
+    Takes the write lock for the given users' food entries before they are read, so two
+    uploads of the same (user_id, date, meal_type) cannot both see it missing and both
+    count their calories in the daily rollups.
+    SQLite: BEGIN IMMEDIATE, which pysqlite would otherwise defer to the first write.
+    PostgreSQL: a transaction-scoped advisory lock per user, since FOR UPDATE cannot lock
+    rows that do not exist yet. Other databases rely on SELECT ... FOR UPDATE.
+    Args:
+        user_ids (iterable[int]): The users whose entries are about to be replaced.
+    """
+    connection = db.session.connection()
+    dialect_name = connection.dialect.name
+    if dialect_name == 'sqlite':
+        if not connection.connection.dbapi_connection.in_transaction:
+            connection.exec_driver_sql('BEGIN IMMEDIATE')
+    elif dialect_name == 'postgresql':
+        # Always in the same order, so two uploads for several users cannot deadlock
+        for user_id in sorted(user_ids):
+            connection.execute(select(func.pg_advisory_xact_lock(user_id)))
+
+def _update_or_insert_food_entries(values, existing):
+    """
+    Portable fallback for _food_upsert_statement: updates the rows already loaded, inserts the rest.
+    Args:
+        values (list[dict]): Deduplicated rows, as built by upsert_user_food_entries.
+        existing (dict): {(user_id, date, meal_type): FoodEntry} for the rows being replaced, locked FOR UPDATE.
+    """
+    for row in values:
+        entry = existing.get((row['user_id'], row['date'], row['meal_type'])) if row['meal_type'] is not None else None
+        if entry is None:
+            db.session.add(FoodEntry(**row))
+        else:
+            for column in FOOD_UPSERT_COLUMNS:
+                setattr(entry, column, row[column])
+    db.session.flush()
+
+def upsert_user_food_entries(rows, commit=True):
+    """
+    Creates or updates many food entries in one INSERT ... ON CONFLICT DO UPDATE statement
+    (select-then-update/insert on dialects without one).
+    An entry is identified by (user_id, date, meal_type); the unique index on those
+    columns makes concurrent writers update the same row instead of adding duplicates.
+    Args:
+        rows (iterable[dict]): Dicts with user_id, date, food_name, quantity, calories and meal_type.
+            When a key repeats, the last row wins. Rows without a meal_type are always inserted.
+        commit (bool): Commit when done; pass False to keep the write in the caller's transaction.
+    Returns:
+        tuple: (number of rows written, sorted (user_id, date, meal_type) keys whose earlier entry was
+            replaced, either a stored one or an earlier row in rows)
+    """
+    latest = {}
+    repeated = set()
+    for row in rows:
+        row = {column: row.get(column) for column in FOOD_UPSERT_KEY + FOOD_UPSERT_COLUMNS}
+        # NULL meal types never conflict, so keep every one of them
+        key = (row['user_id'], row['date'], row['meal_type']) if row['meal_type'] is not None else object()
+        if latest.pop(key, None) is not None:
+            repeated.add(key)
+        latest[key] = row
+    values = list(latest.values())
+    if not values:
+        return 0, []
+
+    try:
+        # Read the rows being replaced so their calories leave the daily rollups. The write
+        # lock is taken first, so a concurrent upload cannot replace them between the read
+        # and the INSERT below
+        user_ids = {row['user_id'] for row in values}
+        _lock_food_entries(user_ids)
+        statement = _food_upsert_statement(db.session.get_bind().dialect.name)
+        matching = FoodEntry.query.filter(
+            FoodEntry.user_id.in_(user_ids),
+            FoodEntry.date.in_({row['date'] for row in values}),
+            FoodEntry.meal_type.in_({row['meal_type'] for row in values if row['meal_type'] is not None})
+        )
+        if statement is not None:
+            # The INSERT itself updates the rows, so only their old values are read
+            matching = matching.with_entities(FoodEntry.user_id, FoodEntry.date, FoodEntry.meal_type, FoodEntry.calories)
+        existing = {
+            (entry.user_id, entry.date, entry.meal_type): entry for entry in matching.with_for_update()
+            if (entry.user_id, entry.date, entry.meal_type) in latest
+        }
+        # Copy the old values before the fallback overwrites the loaded rows
+        replaced = [SimpleNamespace(user_id=entry.user_id, date=entry.date, calories=entry.calories) for entry in existing.values()]
+
+        if statement is not None:
+            db.session.execute(statement, values)
+        else:
+            _update_or_insert_food_entries(values, existing)
+        track_entries(
+            food_entries=[SimpleNamespace(**row) for row in values],
+            removed_food_entries=replaced
+        )
+        if commit:
+            db.session.commit()
+    except Exception:
+        if commit:
+            db.session.rollback()
+        raise
+    return len(values), sorted(repeated.union(existing))
+
 def upsert_user_food_entry(user_id, date_val: date, food_name_val: str, quantity_val: float, calories_val: float, meal_type_val: str):
     """
     Creates or updates a food entry for the user.
     An entry is identified by user_id, date_val, and meal_type_val for updates.
     Assumes FoodEntry model has a user_id field.
     """
-    food_entry = FoodEntry.query.filter_by(user_id=user_id, date=date_val, meal_type=meal_type_val).first()
-
-    if food_entry:
-        # Update existing food entry
-        food_entry.food_name = food_name_val
-        food_entry.quantity = quantity_val
-        food_entry.calories = calories_val
-    else:
-        # Create new food entry
-        food_entry = FoodEntry(
-            user_id=user_id,
-            date=date_val,
-            food_name=food_name_val,
-            quantity=quantity_val,
-            calories=calories_val,
-            meal_type=meal_type_val
-        )
-        db.session.add(food_entry)
-    db.session.commit()
-    return food_entry
+    upsert_user_food_entries([{
+        'user_id': user_id,
+        'date': date_val,
+        'food_name': food_name_val,
+        'quantity': quantity_val,
+        'calories': calories_val,
+        'meal_type': meal_type_val
+    }])
+    # populate_existing so a copy already in the session picks up the new values
+    return FoodEntry.query.filter_by(user_id=user_id, date=date_val, meal_type=meal_type_val)\
+        .order_by(FoodEntry.id.desc()).populate_existing().first()
 
 # --- Share Functions ---
 def create_share_entry(sharer_user_id: int, sharee_user_id: int, data_categories: str, time_range: str):
@@ -221,6 +381,8 @@ def create_share_entry(sharer_user_id: int, sharee_user_id: int, data_categories
         )
         db.session.add(new_share)
         db.session.commit()
+        invalidate_fragments('share-lists', sharer_user_id)
+        invalidate_fragments('share-lists', sharee_user_id)
         print(f"[DEBUG] New ShareEntry created (replaced inactive if one existed): {new_share.id}")
         return new_share
         
@@ -259,6 +421,9 @@ def revoke_share_entry(share_entry_id: int, current_user_id: int):
     if share_entry and share_entry.sharer_user_id == current_user_id:
         share_entry.is_active = False
         db.session.commit()
+        invalidate_share(share_entry_id)
+        invalidate_fragments('share-lists', share_entry.sharer_user_id)
+        invalidate_fragments('share-lists', share_entry.sharee_user_id)
         return True
     return False
 
@@ -290,60 +455,192 @@ def get_user_activity_data(user_id: int, data_categories_str: str, time_range_st
     if not user:
         return None # Or raise an error
 
+    # Windows are relative to today, so the date is part of the key. A profile-only request keys on
+    # share_version alone, so entry uploads (which move data_version) do not evict it
+    end_date = date.today()
     data_categories = [category.strip() for category in data_categories_str.split(',')]
-    results = {'user_id': user_id, 'username': user.username}
+    data_version = user.data_version if {'fitness_log', 'food_log'} & set(data_categories) else None
 
-    # Define time filters
-    end_date = date.today()
-    start_date = None
-
-    if time_range_str == "last_7_days":
-        start_date = end_date - timedelta(days=7)
-    elif time_range_str == "last_30_days":
-        start_date = end_date - timedelta(days=30)
-    # Add more time_range options as needed, e.g., "all_time" means start_date remains None
-
-    if 'basic_profile' in data_categories:
-        user_info = UserInfo.query.filter_by(user_id=user_id).order_by(UserInfo.date.desc()).first()
-        if user_info:
-            results['basic_profile'] = {
-                'gender': user_info.gender,
-                'age': user_info.age,
-                'height': user_info.height,
-                'weight': user_info.weight,
-                'last_updated': user_info.date.isoformat() if user_info.date else None
-            }
-
-    if 'fitness_log' in data_categories:
-        query = FitnessEntry.query.filter_by(user_id=user_id)
-        if start_date:
-            query = query.filter(FitnessEntry.date >= start_date)
-        query = query.filter(FitnessEntry.date <= end_date).order_by(FitnessEntry.date.desc())
-        fitness_entries = query.all()
-        results['fitness_log'] = [
-            {
-                'date': entry.date.isoformat(),
-                'activity_type': entry.activity_type,
-                'duration': entry.duration,
-                'calories_burned': entry.calories_burned,
-                'emotion': entry.emotion
-            } for entry in fitness_entries
-        ]
-
-    if 'food_log' in data_categories:
-        query = FoodEntry.query.filter_by(user_id=user_id)
-        if start_date:
-            query = query.filter(FoodEntry.date >= start_date)
-        query = query.filter(FoodEntry.date <= end_date).order_by(FoodEntry.date.desc(), FoodEntry.meal_type)
-        food_entries = query.all()
-        results['food_log'] = [
-            {
-                'date': entry.date.isoformat(),
-                'food_name': entry.food_name,
-                'quantity': entry.quantity,
-                'calories': entry.calories,
-                'meal_type': entry.meal_type
-            } for entry in food_entries
-        ]
-        
-    return results
\ No newline at end of file
+    def build():
+        results = {'user_id': user_id, 'username': user.username}
+
+        # Define time filters
+        start_date = None
+
+        if time_range_str == "last_7_days":
+            start_date = end_date - timedelta(days=7)
+        elif time_range_str == "last_30_days":
+            start_date = end_date - timedelta(days=30)
+        # Add more time_range options as needed, e.g., "all_time" means start_date remains None
+
+        if 'basic_profile' in data_categories:
+            user_info = UserInfo.query.filter_by(user_id=user_id).order_by(UserInfo.date.desc()).first()
+            if user_info:
+                results['basic_profile'] = {
+                    'gender': user_info.gender,
+                    'age': user_info.age,
+                    'height': user_info.height,
+                    'weight': user_info.weight,
+                    'last_updated': user_info.date.isoformat() if user_info.date else None
+                }
+
+        if 'fitness_log' in data_categories:
+            query = FitnessEntry.query.filter_by(user_id=user_id)
+            if start_date:
+                query = query.filter(FitnessEntry.date >= start_date)
+            query = query.filter(FitnessEntry.date <= end_date).order_by(FitnessEntry.date.desc())
+            fitness_entries = query.all()
+            results['fitness_log'] = [
+                {
+                    'date': entry.date.isoformat(),
+                    'activity_type': entry.activity_type,
+                    'duration': entry.duration,
+                    'calories_burned': entry.calories_burned,
+                    'emotion': entry.emotion
+                } for entry in fitness_entries
+            ]
+
+        if 'food_log' in data_categories:
+            query = FoodEntry.query.filter_by(user_id=user_id)
+            if start_date:
+                query = query.filter(FoodEntry.date >= start_date)
+            query = query.filter(FoodEntry.date <= end_date).order_by(FoodEntry.date.desc(), FoodEntry.meal_type)
+            food_entries = query.all()
+            results['food_log'] = [
+                {
+                    'date': entry.date.isoformat(),
+                    'food_name': entry.food_name,
+                    'quantity': entry.quantity,
+                    'calories': entry.calories,
+                    'meal_type': entry.meal_type
+                } for entry in food_entries
+            ]
+
+        return results
+
+    return cached_snapshot(
+        ('activity', user_id, data_categories_str, time_range_str, user.share_version, data_version, end_date), build
+    )
+
+# --- Paginated Entry Retrieval ---
+ENTRY_PAGE_COLUMNS = {
+    'fitness': (FitnessEntry, ('id', 'date', 'activity_type', 'duration', 'calories_burned', 'emotion')),
+    'food': (FoodEntry, ('id', 'date', 'food_name', 'quantity', 'calories', 'meal_type'))
+}
+
+def encode_entry_cursor(entry_date: date, entry_id: int):
+    """Encodes the (date, id) of the last entry on a page as an opaque cursor string."""
+    return base64.urlsafe_b64encode(f"{entry_date.isoformat()}|{entry_id}".encode()).decode()
+
+def decode_entry_cursor(cursor: str):
+    """
+    Decodes a cursor produced by encode_entry_cursor.
+    Returns:
+        tuple: (date, id)
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    try:
+        date_str, id_str = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return date.fromisoformat(date_str), int(id_str)
+    except (ValueError, UnicodeDecodeError, binascii.Error) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+def _entry_page_statement(entry_type: str, user_id: int, start_date: Optional[date], end_date: Optional[date],
+                          cursor: Optional[str], limit: int):
+    """Builds the keyset page query shared by get_entry_page and get_entry_page_json, with one look-ahead row."""
+    if entry_type not in ENTRY_PAGE_COLUMNS:
+        raise ValueError(f"Invalid entry type: {entry_type}")
+    model, columns = ENTRY_PAGE_COLUMNS[entry_type]
+
+    stmt = select(*[getattr(model, column) for column in columns]).where(
+        model.user_id == user_id,
+        model.date.isnot(None)
+    )
+    if start_date:
+        stmt = stmt.where(model.date >= start_date)
+    if end_date:
+        stmt = stmt.where(model.date <= end_date)
+    if cursor:
+        cursor_date, cursor_id = decode_entry_cursor(cursor)
+        stmt = stmt.where(or_(
+            model.date < cursor_date,
+            and_(model.date == cursor_date, model.id < cursor_id)
+        ))
+
+    # One extra row tells us whether another page follows; the (user_id, date) index serves this order
+    return stmt.order_by(model.date.desc(), model.id.desc()).limit(limit + 1)
+
+def get_entry_page(entry_type: str, user_id: int, start_date: Optional[date] = None, end_date: Optional[date] = None,
+                   cursor: Optional[str] = None, limit: int = 200):
+    """
+    Retrieves one page of a user's entries, newest first, using keyset pagination on (date, id).
+    Args:
+        entry_type (str): 'fitness' or 'food'.
+        user_id (int): The ID of the user whose entries are read.
+        start_date (date, optional): Inclusive lower bound on the entry date.
+        end_date (date, optional): Inclusive upper bound on the entry date.
+        cursor (str, optional): The next_cursor returned with the previous page.
+        limit (int): Maximum number of entries on the page.
+    Returns:
+        tuple: (list of entry dicts, next_cursor or None when this is the last page)
+    Raises:
+        ValueError: If entry_type or cursor is invalid.
+    """
+    stmt = _entry_page_statement(entry_type, user_id, start_date, end_date, cursor, limit)
+    columns = ENTRY_PAGE_COLUMNS[entry_type][1]
+    rows = db.session.execute(stmt).all()
+    next_cursor = encode_entry_cursor(rows[limit - 1].date, rows[limit - 1].id) if len(rows) > limit else None
+
+    entries = []
+    for row in rows[:limit]:
+        entry = dict(zip(columns, row))
+        entry['date'] = row.date.isoformat()
+        entries.append(entry)
+    return entries, next_cursor
+
+def get_entry_page_json(entry_type: str, user_id: int, start_date: Optional[date] = None, end_date: Optional[date] = None,
+                        cursor: Optional[str] = None, limit: int = 200):
+    """
+    Same page as get_entry_page, serialized from the cursor for a <script> block (see serializers.py).
+    Returns:
+        tuple: (Markup JSON array of entries, next_cursor or None when this is the last page)
+    Raises:
+        ValueError: If entry_type or cursor is invalid.
+    """
+    result = db.session.execute(_entry_page_statement(entry_type, user_id, start_date, end_date, cursor, limit))
+    entries = rows_to_script_json(result, limit=limit)
+    following = result.fetchone()
+    result.close()
+    # Cursors are exclusive bounds; ids are integers, so (date, id + 1) of the first row of the
+    # next page selects the same rows as (date, id) of the last row of this one
+    next_cursor = encode_entry_cursor(following.date, following.id + 1) if following else None
+    return entries, next_cursor
+
+def stream_entries(entry_type: str, user_id: int, start_date: Optional[date] = None, end_date: Optional[date] = None,
+                   batch_size: int = 1000):
+    """
+    Opens a streaming read of a user's entries, oldest first, for exports.
+    Rows are fetched from the cursor batch_size at a time (yield_per), so memory does not grow with the history.
+    Args:
+        entry_type (str): 'fitness' or 'food'.
+        user_id (int): The ID of the user whose entries are read.
+        start_date (date, optional): Inclusive lower bound on the entry date.
+        end_date (date, optional): Inclusive upper bound on the entry date.
+        batch_size (int): Rows buffered per fetch.
+    Returns:
+        Result: A result with keys() and fetchmany() over the ENTRY_PAGE_COLUMNS of the type.
+    Raises:
+        ValueError: If entry_type is invalid.
+    """
+    if entry_type not in ENTRY_PAGE_COLUMNS:
+        raise ValueError(f"Invalid entry type: {entry_type}")
+    model, columns = ENTRY_PAGE_COLUMNS[entry_type]
+
+    stmt = select(*[getattr(model, column) for column in columns]).where(model.user_id == user_id)
+    if start_date:
+        stmt = stmt.where(model.date >= start_date)
+    if end_date:
+        stmt = stmt.where(model.date <= end_date)
+    stmt = stmt.order_by(model.date, model.id).execution_options(yield_per=batch_size)
+    return db.session.execute(stmt)
@@ -0,0 +1,53 @@
+# fragment_cache.py
+# Caches rendered pieces of templates, so markup that rarely changes is not re-rendered on every request.
+# A template wraps the piece in a call block with an explicit key:
+#     {% call cached_fragment('share-lists', current_user.id, share_lists_version) %}...{% endcall %}
+# The body only runs on a miss, so anything it alone needs (e.g. a loader passed in by the view) can be
+# fetched lazily. Keys should carry a version read from the database where the content depends on data,
+# since invalidate_fragments() only reaches the current process; it drops superseded entries straight away.
+
+from flask import current_app
+from markupsafe import Markup
+from app.kvstore import SizedMemoryStore
+
+_cache = None
+
+def _get_cache():
+    global _cache
+    if _cache is None:
+        _cache = SizedMemoryStore(current_app.config['FRAGMENT_CACHE_BYTES'])
+    return _cache
+
+def cached_fragment(*key, caller):
+    """
+    Jinja call-block helper returning the block's HTML, rendering it only when key is not cached.
+    Args:
+        *key: Hashable parts identifying the fragment; the first names it, e.g. 'share-lists'.
+        caller: The call block's body, supplied by Jinja.
+    Returns:
+        Markup: The rendered fragment.
+    """
+    if not current_app.config['FRAGMENT_CACHE_BYTES']:
+        return caller()
+    cache = _get_cache()
+    html = cache.get(key)
+    if html is None:
+        rendered = caller()
+        cache.set(key, rendered.encode('utf-8'))
+        return rendered
+    return Markup(html.decode('utf-8'))
+
+def invalidate_fragments(*key_prefix):
+    """
+    Drops every cached fragment whose key starts with key_prefix, e.g. ('share-lists', user_id).
+    Returns:
+        int: How many fragments were dropped.
+    """
+    if _cache is None:
+        return 0
+    return _cache.pop_matching(lambda key: key[:len(key_prefix)] == key_prefix)
+
+def clear():
+    """Drops every cached fragment."""
+    if _cache is not None:
+        _cache.clear()
@@ -0,0 +1,188 @@
+# importer.py
+# Bulk CSV import of historical fitness and food entries.
+# The file is read with pandas in fixed-size chunks, so memory depends on the chunk size rather than the file size.
+# Each chunk is validated with vectorized column operations, written with one executemany INSERT (fitness) or one
+# ON CONFLICT upsert (food) plus the daily rollups, and committed on its own; bad rows are reported, not fatal.
+
+import re
+import time
+import warnings
+from bisect import bisect_right
+from types import SimpleNamespace
+import pandas as pd
+from flask import current_app
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+from app import db
+from app.models import FitnessEntry
+from app.rollups import track_entries
+from app.database import upsert_user_food_entries
+
+# entry type -> (required text columns, optional numeric columns, optional text columns), matching /api/export headers
+IMPORT_COLUMNS = {
+    'fitness': (('activity_type',), ('duration', 'calories_burned'), ('emotion',)),
+    'food': (('food_name',), ('quantity', 'calories'), ('meal_type',))
+}
+# Longest value each text column holds (see the String lengths in models.py)
+MAX_LENGTHS = {'activity_type': 64, 'emotion': 32, 'food_name': 64, 'meal_type': 32}
+MAX_REPORTED_ERRORS = 100  # Per-row errors kept in the report; error_count still counts every one
+
+_SKIPPED_LINE = re.compile(r'Skipping line (\d+): ([^\n]+)')
+
+
+class ImportFormatError(ValueError):
+    """The file cannot be imported at all, e.g. a required column is missing."""
+
+
+def _file_line(row, skipped_lines):
+    """Maps a 0-based parsed data row to its file line, stepping over the header and any malformed lines."""
+    line = row + 2
+    while True:
+        candidate = row + 2 + bisect_right(skipped_lines, line)
+        if candidate == line:
+            return line
+        line = candidate
+
+def _validate(chunk, entry_type):
+    """
+    Coerces a chunk of string columns to entry values.
+    Returns:
+        tuple: (DataFrame of valid rows, Series of error messages indexed by the invalid rows)
+    """
+    required, numeric, optional = IMPORT_COLUMNS[entry_type]
+    errors = pd.Series('', index=chunk.index, dtype=object)
+
+    def flag(mask, message):
+        # Keep the first problem found for each row
+        errors[mask & (errors == '')] = message
+
+    values = pd.DataFrame(index=chunk.index)
+    raw_dates = chunk['date'].str.strip()
+    # strptime alone would also take unpadded dates such as 2025-1-3
+    values['date'] = pd.to_datetime(raw_dates.where(raw_dates.str.fullmatch(r'\d{4}-\d{2}-\d{2}')),
+                                    format='%Y-%m-%d', errors='coerce')
+    flag(values['date'].isna(), 'date must be formatted as YYYY-MM-DD')
+    for column in required + optional:
+        text = chunk[column].str.strip()
+        if column in required:
+            flag(text == '', f'{column} is required')
+        flag(text.str.len() > MAX_LENGTHS[column], f'{column} is longer than {MAX_LENGTHS[column]} characters')
+        values[column] = text.where(text != '', None)
+    for column in numeric:
+        text = chunk[column].str.strip()
+        number = pd.to_numeric(text, errors='coerce')
+        flag((text != '') & number.isna(), f'{column} must be a number')
+        flag(number < 0, f'{column} must not be negative')
+        values[column] = number
+
+    invalid = errors != ''
+    return values[~invalid], errors[invalid]
+
+def _records(values, user_id):
+    """Turns validated rows into insert dicts with date objects and None for missing numbers."""
+    values = values.astype(object).where(values.notna(), None)
+    values['date'] = [timestamp.date() for timestamp in values['date']]
+    values['user_id'] = user_id
+    return values.to_dict('records')
+
+def _write_chunk(entry_type, rows):
+    """
+    Writes and commits one chunk.
+    Returns:
+        tuple: (entries written, earlier food entries replaced); a meal repeated within the chunk
+            is written once.
+    """
+    written, replaced = len(rows), []
+    if entry_type == 'fitness':
+        db.session.execute(insert(FitnessEntry), rows)
+        track_entries(fitness_entries=[SimpleNamespace(**row) for row in rows])
+    else:
+        # A row for an existing (date, meal type) replaces that meal, as on the upload form
+        written, replaced = upsert_user_food_entries(rows, commit=False)
+    db.session.commit()
+    return written, len(replaced)
+
+def import_entries_csv(user_id, stream, entry_type, chunk_size=5000):
+    """
+    Imports a CSV of fitness or food entries for a user, one committed chunk at a time.
+    Columns are matched by header name; others (such as the id column of an export) are ignored.
+    Args:
+        user_id (int): The user the entries belong to.
+        stream (file-like): The CSV, opened in binary or text mode.
+        entry_type (str): 'fitness' (date, activity_type, duration, calories_burned, emotion)
+            or 'food' (date, food_name, quantity, calories, meal_type).
+        chunk_size (int): Rows parsed, validated and written per chunk.
+    Returns:
+        dict: imported, replaced (food entries that overwrote an earlier meal) and error_count totals,
+            errors (the first MAX_REPORTED_ERRORS as {line, error}),
+            seconds and rows_per_second (rows read, valid or not, per second).
+    Raises:
+        ImportFormatError: If the type is unknown or the header lacks a required column.
+    """
+    if entry_type not in IMPORT_COLUMNS:
+        raise ImportFormatError(f"Invalid entry type: {entry_type}")
+    required, numeric, optional = IMPORT_COLUMNS[entry_type]
+    expected = ('date',) + required + numeric + optional
+
+    started = time.perf_counter()
+    report = {'imported': 0, 'replaced': 0, 'error_count': 0, 'errors': []}
+    skipped_lines = []
+    rows_read = 0
+
+    def add_error(line, message):
+        report['error_count'] += 1
+        if len(report['errors']) < MAX_REPORTED_ERRORS:
+            report['errors'].append({'line': int(line), 'error': message})
+
+    try:
+        # Every column is read as text so coercion errors can be reported per row
+        # (no usecols: with it, pandas stops noticing lines with too many fields)
+        reader = pd.read_csv(stream, chunksize=chunk_size, dtype=str, keep_default_na=False, encoding='utf-8-sig',
+                             on_bad_lines='warn')
+        chunks = iter(reader)
+        while True:
+            with warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter('always', pd.errors.ParserWarning)
+                chunk = next(chunks, None)
+            for warning in caught:
+                for line, message in _SKIPPED_LINE.findall(str(warning.message)):
+                    skipped_lines.append(int(line))
+                    add_error(line, message)
+            if chunk is None:
+                break
+
+            chunk.columns = [str(column).strip() for column in chunk.columns]
+            missing = [column for column in ('date',) + required if column not in chunk.columns]
+            if missing:
+                raise ImportFormatError(f"Missing required column(s): {', '.join(missing)}")
+            # Optional columns the file leaves out read as empty
+            chunk = chunk.reindex(columns=list(expected), fill_value='')
+            chunk.index = pd.RangeIndex(rows_read, rows_read + len(chunk))
+            rows_read += len(chunk)
+
+            valid, errors = _validate(chunk, entry_type)
+            for row, message in errors.items():
+                add_error(_file_line(row, skipped_lines), message)
+            if valid.empty:
+                continue
+            rows = _records(valid, user_id)
+            try:
+                written, replaced = _write_chunk(entry_type, rows)
+                report['imported'] += written
+                report['replaced'] += replaced
+            except SQLAlchemyError:
+                db.session.rollback()
+                current_app.logger.exception(f"Database error importing rows {valid.index[0] + 1}-{valid.index[-1] + 1}")
+                for row in valid.index:
+                    add_error(_file_line(row, skipped_lines), 'database error; row not imported')
+    except pd.errors.EmptyDataError:
+        raise ImportFormatError("The file is empty")
+    except (pd.errors.ParserError, UnicodeDecodeError) as e:
+        # Unrecoverable mid-file (e.g. an unterminated quote); earlier chunks stay imported
+        current_app.logger.warning(f"Import stopped after {rows_read} rows: {e}")
+        add_error(rows_read + len(skipped_lines) + 2, f"Could not parse the rest of the file: {e}")
+
+    elapsed = time.perf_counter() - started
+    report['seconds'] = round(elapsed, 3)
+    report['rows_per_second'] = round((rows_read + len(skipped_lines)) / elapsed, 1) if elapsed else 0.0
+    return report
@@ -0,0 +1,99 @@
+# instrumentation.py
+# Opt-in per-request timing: wall time, SQL statement count and time, and template render time.
+# Enable with REQUEST_TIMING=1; results go to a Server-Timing header and one JSON log line per request.
+
+import json
+import logging
+import time
+from flask import g, request, has_request_context, before_render_template, template_rendered
+from sqlalchemy import event
+
+
+def _timing():
+    # None outside a request, or when timing is switched off for this request
+    if has_request_context():
+        return g.get('request_timing')
+    return None
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    timing = _timing()
+    if timing is not None:
+        conn.info.setdefault('request_timing_started', []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    timing = _timing()
+    if timing is not None and conn.info.get('request_timing_started'):
+        timing['sql_time'] += time.perf_counter() - conn.info['request_timing_started'].pop()
+        timing['sql_count'] += 1
+        timing['sql_statements'].add(statement)
+
+def _before_render(sender, template, context, **extra):
+    timing = _timing()
+    if timing is not None:
+        timing['render_started'].append(time.perf_counter())
+
+def _after_render(sender, template, context, **extra):
+    timing = _timing()
+    if timing is not None and timing['render_started']:
+        elapsed = time.perf_counter() - timing['render_started'].pop()
+        # Only count the outermost render so included/nested templates are not double counted
+        if not timing['render_started']:
+            timing['template_time'] += elapsed
+
+def init_instrumentation(app, db):
+    """
+    Registers the timing hooks. They stay inert unless app.config['REQUEST_TIMING'] is true.
+    Args:
+        app (Flask): The application.
+        db (SQLAlchemy): The Flask-SQLAlchemy extension whose engine is measured.
+    """
+    # The timing lines are logged at INFO; only lower an unset level when timing is switched on
+    if app.config.get('REQUEST_TIMING') and app.logger.level == logging.NOTSET:
+        app.logger.setLevel(logging.INFO)
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(db.engine, 'after_cursor_execute', _after_cursor_execute)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_after_render, app)
+
+    @app.before_request
+    def start_request_timing():
+        if app.config.get('REQUEST_TIMING'):
+            g.request_timing = {
+                'started': time.perf_counter(),
+                'sql_count': 0,
+                'sql_time': 0.0,
+                'sql_statements': set(),
+                'template_time': 0.0,
+                'render_started': []
+            }
+
+    @app.after_request
+    def report_request_timing(response):
+        timing = g.pop('request_timing', None)
+        if timing is None:
+            return response
+
+        total_ms = (time.perf_counter() - timing['started']) * 1000
+        sql_ms = timing['sql_time'] * 1000
+        template_ms = timing['template_time'] * 1000
+        response.headers['Server-Timing'] = ', '.join([
+            f'app;dur={total_ms:.1f}',
+            f'db;dur={sql_ms:.1f};desc="{timing["sql_count"]} queries"',
+            f'tpl;dur={template_ms:.1f}'
+        ])
+        app.logger.info(json.dumps({
+            'event': 'request_timing',
+            'method': request.method,
+            'path': request.path,
+            'endpoint': request.endpoint,
+            'status': response.status_code,
+            'duration_ms': round(total_ms, 2),
+            'sql_count': timing['sql_count'],
+            # Many more statements than distinct ones is the signature of an N+1 loop
+            'sql_distinct': len(timing['sql_statements']),
+            'sql_ms': round(sql_ms, 2),
+            'template_ms': round(template_ms, 2)
+        }))
+        return response
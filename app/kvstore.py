@@ -0,0 +1,272 @@
+# kvstore.py
+# Small expiring key-value stores for short-lived state such as pending registrations
+# and verification codes. Both backends behave like a dict (store[key], get, pop, in),
+# drop expired entries lazily on read and in a periodic sweep, and cap their size.
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class KeyValueStore:
+    """Dict-style access on top of get/set/pop; backends implement those plus sweep and clear."""
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self.set(key, value)
+
+    def __delitem__(self, key):
+        if self.pop(key, _MISSING) is _MISSING:
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+
+class MemoryStore(KeyValueStore):
+    """A thread-safe in-process LRU whose entries also expire after ttl seconds."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            value, expires_at = item
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + (ttl or self.ttl))
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            item = self._data.pop(key, None)
+        if item is None or item[1] <= time.monotonic():
+            return default
+        return item[0]
+
+    def sweep(self):
+        now = time.monotonic()
+        with self._lock:
+            expired = [key for key, (_, expires_at) in self._data.items() if expires_at <= now]
+            for key in expired:
+                del self._data[key]
+        return len(expired)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+
+class SizedMemoryStore(KeyValueStore):
+    """
+    A thread-safe in-process LRU of bytes values, capped by their total size rather than their count.
+    Entries do not expire; callers put whatever makes an entry stale into its key.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if len(value) > self.max_bytes:
+            # Would evict everything else and still not fit
+            self.pop(key)
+            return
+        with self._lock:
+            previous = self._data.pop(key, None)
+            if previous is not None:
+                self.nbytes -= len(previous)
+            self._data[key] = value
+            self.nbytes += len(value)
+            while self.nbytes > self.max_bytes:
+                _, evicted = self._data.popitem(last=False)
+                self.nbytes -= len(evicted)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            value = self._data.pop(key, None)
+            if value is None:
+                return default
+            self.nbytes -= len(value)
+            return value
+
+    def pop_matching(self, predicate):
+        """Removes every entry whose key satisfies predicate; returns how many were removed."""
+        with self._lock:
+            keys = [key for key in self._data if predicate(key)]
+            for key in keys:
+                self.nbytes -= len(self._data.pop(key))
+        return len(keys)
+
+    def sweep(self):
+        return 0
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.nbytes = 0
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+
+class SQLiteStore(KeyValueStore):
+    """
+    A store in a SQLite file, shared by every worker process on the host.
+    Values are stored as JSON, so they must be JSON-serializable (e.g. dates as ISO strings).
+    When full, the entries closest to expiry are evicted first.
+    """
+
+    def __init__(self, path, namespace, maxsize, ttl):
+        self.path = path
+        self.namespace = namespace
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS kv_entries (namespace TEXT NOT NULL, key TEXT NOT NULL, "
+                "value BLOB NOT NULL, expires_at REAL NOT NULL, PRIMARY KEY (namespace, key))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_kv_entries_expires_at ON kv_entries (namespace, expires_at)")
+
+    def _connection(self):
+        # sqlite3 connections must stay on the thread that opened them
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key, default=None):
+        conn = self._connection()
+        row = conn.execute(
+            "SELECT value, expires_at FROM kv_entries WHERE namespace = ? AND key = ?", (self.namespace, key)
+        ).fetchone()
+        if row is None:
+            return default
+        if row[1] <= time.time():
+            with conn:
+                conn.execute(
+                    "DELETE FROM kv_entries WHERE namespace = ? AND key = ? AND expires_at <= ?",
+                    (self.namespace, key, time.time())
+                )
+            return default
+        return json.loads(row[0])
+
+    def set(self, key, value, ttl=None):
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO kv_entries (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                (self.namespace, key, json.dumps(value), time.time() + (ttl or self.ttl))
+            )
+            overflow = conn.execute(
+                "SELECT COUNT(*) FROM kv_entries WHERE namespace = ?", (self.namespace,)
+            ).fetchone()[0] - self.maxsize
+            if overflow > 0:
+                conn.execute(
+                    "DELETE FROM kv_entries WHERE rowid IN (SELECT rowid FROM kv_entries WHERE namespace = ? "
+                    "ORDER BY expires_at LIMIT ?)", (self.namespace, overflow)
+                )
+
+    def pop(self, key, default=None):
+        value = self.get(key, _MISSING)
+        with self._connection() as conn:
+            conn.execute("DELETE FROM kv_entries WHERE namespace = ? AND key = ?", (self.namespace, key))
+        return default if value is _MISSING else value
+
+    def sweep(self):
+        with self._connection() as conn:
+            return conn.execute(
+                "DELETE FROM kv_entries WHERE namespace = ? AND expires_at <= ?", (self.namespace, time.time())
+            ).rowcount
+
+    def clear(self):
+        with self._connection() as conn:
+            conn.execute("DELETE FROM kv_entries WHERE namespace = ?", (self.namespace,))
+
+    def __len__(self):
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM kv_entries WHERE namespace = ? AND expires_at > ?", (self.namespace, time.time())
+        ).fetchone()[0]
+
+
+def create_store(config, namespace, ttl):
+    """
+    Builds a store for the configured backend.
+    Args:
+        config (dict): The app config (KV_STORE_BACKEND, KV_STORE_PATH, KV_STORE_MAX_ENTRIES).
+        namespace (str): Keeps this store's keys apart from other stores sharing the backend.
+        ttl (int): Seconds before an entry expires.
+    Returns:
+        KeyValueStore: A MemoryStore or SQLiteStore.
+    """
+    backend = config['KV_STORE_BACKEND']
+    if backend == 'memory':
+        return MemoryStore(config['KV_STORE_MAX_ENTRIES'], ttl)
+    if backend == 'sqlite':
+        os.makedirs(os.path.dirname(config['KV_STORE_PATH']), exist_ok=True)
+        return SQLiteStore(config['KV_STORE_PATH'], namespace, config['KV_STORE_MAX_ENTRIES'], ttl)
+    raise ValueError(f"Unknown KV_STORE_BACKEND: {backend}")
+
+def start_sweeper(stores, interval):
+    """
+    Purges expired entries from the given stores every interval seconds on a daemon thread.
+    Args:
+        stores (list[KeyValueStore]): Stores to sweep.
+        interval (float): Seconds between sweeps.
+    Returns:
+        threading.Event: Set it to stop the sweeper.
+    """
+    stop = threading.Event()
+
+    def run():
+        while not stop.wait(interval):
+            for store in stores:
+                try:
+                    store.sweep()
+                except Exception as e:
+                    print(f"Error sweeping expired store entries: {str(e)}")
+
+    threading.Thread(target=run, name='kvstore-sweeper', daemon=True).start()
+    return stop
@@ -3,9 +3,11 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import date, time, datetime
 from app import db
-from werkzeug.security import generate_password_hash, check_password_hash
+from app.passwords import hash_password, verify_password
 from flask_login import UserMixin
 from sqlalchemy.sql import func
+from sqlalchemy import event
+from sqlalchemy.orm import Session
 
 # User model for authentication and linking entries
 class User(db.Model, UserMixin):
@@ -15,6 +17,11 @@ class User(db.Model, UserMixin):
     username = db.Column(db.String(80), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
     password_hash = db.Column(db.String(256), nullable=False)
+    # Bumped whenever the user's entries or shares change; the visualisation APIs derive ETags from it
+    data_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Bumped only when the user's shares or profile change, so caches of share lists and shared profiles
+    # survive the entry uploads that move data_version
+    share_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
     # One-to-many relationships
     fitness_entries = db.relationship('FitnessEntry', backref='user', lazy=True)
@@ -25,11 +32,12 @@ class User(db.Model, UserMixin):
 
     # Relationships for ShareEntry (as sharer and sharee) are handled by backrefs
 
+    # Both run on the bounded hashing pool and may raise PasswordHashingBusy
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password, method='pbkdf2:sha256')
+        self.password_hash = hash_password(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return verify_password(self.password_hash, password)
 
     def __repr__(self):
         return f'<User {self.username}>'
@@ -63,6 +71,10 @@ class FitnessEntry(db.Model):
     calories_burned = db.Column(db.Float, nullable=True)  
     emotion = db.Column(db.String(32), nullable=True) # Made nullable for consistency
 
+    # Every hot read filters by user and a date range
+    __table_args__ = (
+        db.Index('ix_fitness_entries_user_id_date', 'user_id', 'date'),
+    )
 
     def __repr__(self):
         return f'<FitnessEntry {self.date} - {self.activity_type}>'
@@ -80,6 +92,10 @@ class FoodEntry(db.Model):
     calories = db.Column(db.Float, nullable=True) 
     meal_type = db.Column(db.String(32), nullable=True) # Made nullable for consistency
 
+    # Covers date range reads and is the conflict target of the (user, date, meal type) upsert
+    __table_args__ = (
+        db.Index('ix_food_entries_user_id_date_meal_type', 'user_id', 'date', 'meal_type', unique=True),
+    )
 
     def __repr__(self):
         return f'<FoodEntry {self.date} - {self.food_name}>'
@@ -100,7 +116,119 @@ class ShareEntry(db.Model):
     sharer = db.relationship('User', foreign_keys=[sharer_user_id], backref=db.backref('shares_made', lazy='dynamic'))
     sharee = db.relationship('User', foreign_keys=[sharee_user_id], backref=db.backref('shares_received', lazy='dynamic'))
 
+    # One row per shared category, kept in step with data_categories by sync_share_categories
+    categories = db.relationship('ShareCategory', backref='share', lazy='selectin', cascade='all, delete-orphan')
+
     __table_args__ = (db.UniqueConstraint('sharer_user_id', 'sharee_user_id', 'data_categories', 'time_range', name='_sharer_sharee_data_time_uc'),)
 
+    @property
+    def category_names(self):
+        """The shared category keys, sorted, read from share_categories rather than re-split from data_categories."""
+        return sorted(category.category for category in self.categories)
+
+    def __repr__(self):
+        return f'<ShareEntry SharerID:{self.sharer_user_id} -> ShareeID:{self.sharee_user_id} ({self.data_categories})>'
+
+# Normalized share categories. sharee_user_id, is_active and sharer_user_id are copied from the share
+# so "who shares <category> with me" is a single index seek.
+class ShareCategory(db.Model):
+    __tablename__ = 'share_categories'
+
+    share_id = db.Column(db.Integer, db.ForeignKey('share_entries.id'), primary_key=True)
+    category = db.Column(db.String(64), primary_key=True)
+    sharee_user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    sharer_user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    is_active = db.Column(db.Boolean, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_share_categories_sharee_active_category', 'sharee_user_id', 'is_active', 'category', 'sharer_user_id'),
+    )
+
+    def __repr__(self):
+        return f'<ShareCategory {self.share_id} - {self.category}>'
+
+@event.listens_for(Session, 'before_flush')
+def sync_share_categories(session, flush_context, instances):
+    """Rewrites share_categories rows for every new or changed ShareEntry before it is flushed."""
+    for share in list(session.new) + list(session.dirty):
+        if not isinstance(share, ShareEntry):
+            continue
+        wanted = {category.strip() for category in (share.data_categories or '').split(',') if category.strip()}
+        is_active = True if share.is_active is None else share.is_active  # Column default not applied yet
+        for row in list(share.categories):
+            if row.category not in wanted:
+                share.categories.remove(row)
+        existing = {row.category for row in share.categories}
+        for category in sorted(wanted - existing):
+            share.categories.append(ShareCategory(category=category))
+        for row in share.categories:
+            row.sharee_user_id = share.sharee_user_id
+            row.sharer_user_id = share.sharer_user_id
+            row.is_active = is_active
+
+def _bump_user_versions(session, user_ids, *columns):
+    # One UPDATE incrementing each named users column, in the session's current transaction
+    user_ids = sorted({user_id for user_id in user_ids if user_id is not None})
+    if user_ids:
+        users = User.__table__
+        session.connection().execute(
+            users.update().where(users.c.id.in_(user_ids)).values({column: users.c[column] + 1 for column in columns})
+        )
+
+def bump_data_versions(session, user_ids):
+    """
+    Increments data_version for the given users in the session's current transaction.
+    Args:
+        session (Session): The session whose transaction the bump joins.
+        user_ids (iterable): IDs of the users whose data changed.
+    """
+    _bump_user_versions(session, user_ids, 'data_version')
+
+@event.listens_for(Session, 'before_flush')
+def bump_share_data_versions(session, flush_context, instances):
+    """Bumps both parties' data_version and share_version when a share is created, changed or deleted."""
+    user_ids = set()
+    for share in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(share, ShareEntry) and (share in session.new or share in session.deleted or session.is_modified(share)):
+            user_ids.update((share.sharer_user_id, share.sharee_user_id))
+    _bump_user_versions(session, user_ids, 'data_version', 'share_version')
+
+@event.listens_for(Session, 'before_flush')
+def bump_profile_share_versions(session, flush_context, instances):
+    """Bumps a user's share_version when their profile (shared as basic_profile) is created, changed or deleted."""
+    user_ids = set()
+    for info in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(info, UserInfo) and (info in session.new or info in session.deleted or session.is_modified(info)):
+            user_ids.add(info.user_id)
+    _bump_user_versions(session, user_ids, 'share_version')
+
+# Per-user daily totals, maintained alongside every entry write
+class DailyUserStats(db.Model):
+    __tablename__ = 'daily_user_stats'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    date = db.Column(db.Date, primary_key=True)
+
+    calories_burned = db.Column(db.Float, nullable=False, default=0.0)
+    calories_consumed = db.Column(db.Float, nullable=False, default=0.0)
+    workout_minutes = db.Column(db.Float, nullable=False, default=0.0)
+    fitness_entry_count = db.Column(db.Integer, nullable=False, default=0)
+    food_entry_count = db.Column(db.Integer, nullable=False, default=0)
+    activity_counts = db.Column(db.JSON, nullable=False, default=dict) # {activity_type: count}
+
+    def __repr__(self):
+        return f'<DailyUserStats {self.user_id} - {self.date}>'
+
+class LeaderboardTotals(db.Model):
+    __tablename__ = 'leaderboard_totals'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    period = db.Column(db.String(10), primary_key=True) # 'week', 'month' or 'year'
+    window_start = db.Column(db.Date, nullable=False) # Totals cover entries dated on or after this day
+
+    calories_burned = db.Column(db.Float, nullable=False, default=0.0)
+    duration = db.Column(db.Float, nullable=False, default=0.0)
+    activity_count = db.Column(db.Integer, nullable=False, default=0)
+
     def __repr__(self):
-        return f'<ShareEntry SharerID:{self.sharer_user_id} -> ShareeID:{self.sharee_user_id} ({self.data_categories})>'
\ No newline at end of file
+        return f'<LeaderboardTotals {self.user_id} - {self.period}>'
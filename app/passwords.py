@@ -0,0 +1,76 @@
+# passwords.py
+# Password hashing on a bounded worker pool. PBKDF2 releases the GIL, so a few worker threads
+# keep login bursts from pinning every request thread, and callers beyond the queue limit
+# get PasswordHashingBusy (served as a 503) instead of waiting.
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class PasswordHashingBusy(Exception):
+    """Raised when the hashing pool and its queue are full."""
+
+
+_pool = None
+_slots = None
+_pool_lock = threading.Lock()
+
+def _submit(func, *args):
+    global _pool, _slots
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                workers = current_app.config['PASSWORD_HASH_WORKERS']
+                _slots = threading.BoundedSemaphore(workers + current_app.config['PASSWORD_HASH_QUEUE'])
+                _pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+    if not _slots.acquire(blocking=False):
+        raise PasswordHashingBusy()
+    try:
+        future = _pool.submit(func, *args)
+    except Exception:
+        _slots.release()
+        raise
+    future.add_done_callback(lambda _: _slots.release())
+    return future.result()
+
+def _method():
+    return f"pbkdf2:sha256:{current_app.config['PASSWORD_HASH_ITERATIONS']}"
+
+def hash_password(password):
+    """
+    Hashes a password with the configured PBKDF2 work factor on the hashing pool.
+    Args:
+        password (str): The plain-text password.
+    Returns:
+        str: A werkzeug password hash.
+    Raises:
+        PasswordHashingBusy: If the pool and its queue are full.
+    """
+    return _submit(generate_password_hash, password, _method())
+
+def verify_password(password_hash, password):
+    """
+    Checks a password against a stored hash on the hashing pool.
+    Args:
+        password_hash (str): The stored werkzeug hash.
+        password (str): The plain-text password.
+    Returns:
+        bool: True if the password matches.
+    Raises:
+        PasswordHashingBusy: If the pool and its queue are full.
+    """
+    return _submit(check_password_hash, password_hash, password)
+
+def needs_rehash(password_hash):
+    """
+    Tells whether a stored hash uses a different method or work factor than the current setting.
+    Args:
+        password_hash (str): The stored werkzeug hash.
+    Returns:
+        bool: True if the hash should be regenerated.
+    """
+    method = password_hash.split('$', 1)[0]
+    # Werkzeug writes the iteration count into the method, e.g. 'pbkdf2:sha256:600000'
+    return method != _method()
@@ -0,0 +1,413 @@
+# rollups.py
+# Keeps the per-user daily_user_stats and leaderboard_totals rows (and users.data_version) in step with fitness
+# and food entry writes.
+# Callers fold their changes in before committing so rollups share the entry transaction.
+# Totals are only ever changed by single UPDATE/upsert statements that add to the stored value
+# (col = col + :delta), never by reading a value into Python and writing it back, so concurrent
+# writers cannot lose each other's changes or race to insert the same row.
+
+from datetime import date, timedelta
+from sqlalchemy import insert, select, and_, bindparam, literal
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from app import db
+from app.models import User, DailyUserStats, LeaderboardTotals, FitnessEntry, FoodEntry, bump_data_versions
+
+# Ranking windows: entries dated on or after today minus this many days
+LEADERBOARD_WINDOWS = {'week': 7, 'month': 30, 'year': 365}
+# daily_user_stats columns that deltas add to
+DAILY_TOTAL_COLUMNS = ('calories_burned', 'calories_consumed', 'workout_minutes', 'fitness_entry_count', 'food_entry_count')
+LEADERBOARD_TOTAL_COLUMNS = ('calories_burned', 'duration', 'activity_count')
+
+
+def _empty_delta():
+    return {
+        'calories_burned': 0.0,
+        'calories_consumed': 0.0,
+        'workout_minutes': 0.0,
+        'fitness_entry_count': 0,
+        'food_entry_count': 0,
+        'activity_counts': {}
+    }
+
+# Entries without a date belong to no day; rebuild_daily_user_stats leaves them out too
+
+def _fold_fitness(deltas, entries, sign):
+    for entry in entries:
+        if entry.date is None:
+            continue
+        delta = deltas.setdefault((entry.user_id, entry.date), _empty_delta())
+        delta['calories_burned'] += sign * (entry.calories_burned or 0)
+        delta['workout_minutes'] += sign * (entry.duration or 0)
+        delta['fitness_entry_count'] += sign
+        if entry.activity_type:
+            counts = delta['activity_counts']
+            counts[entry.activity_type] = counts.get(entry.activity_type, 0) + sign
+
+def _fold_food(deltas, entries, sign):
+    for entry in entries:
+        if entry.date is None:
+            continue
+        delta = deltas.setdefault((entry.user_id, entry.date), _empty_delta())
+        delta['calories_consumed'] += sign * (entry.calories or 0)
+        delta['food_entry_count'] += sign
+
+def track_entries(fitness_entries=(), food_entries=(), removed_fitness_entries=(), removed_food_entries=()):
+    """
+    Folds added and removed entries into their users' daily rollups.
+    Args:
+        fitness_entries (iterable): FitnessEntry objects (or anything with the same attributes) being added.
+        food_entries (iterable): FoodEntry objects (or anything with the same attributes) being added.
+        removed_fitness_entries (iterable): Fitness entries being deleted, or old values being replaced.
+        removed_food_entries (iterable): Food entries being deleted, or old values being replaced.
+    The session is flushed but not committed; the caller commits with its own writes.
+    """
+    deltas = {}
+    _fold_fitness(deltas, fitness_entries, 1)
+    _fold_fitness(deltas, removed_fitness_entries, -1)
+    _fold_food(deltas, food_entries, 1)
+    _fold_food(deltas, removed_food_entries, -1)
+    apply_daily_deltas(deltas)
+
+def _upsert_statement(table, key_columns, assignments, where=None):
+    """
+    Builds a dialect-specific INSERT that applies assignments to the stored row on a key conflict.
+    Args:
+        table (Table): The table written to.
+        key_columns (tuple): Names of the primary key columns the conflict is detected on.
+        assignments (callable): Takes the proposed row (excluded/inserted) and returns {column: expression}.
+        where (callable, optional): Takes the proposed row; only conflicting rows it matches are updated.
+            MySQL has no such filter and updates every conflicting row.
+    Returns:
+        The statement, or None when the dialect has no such INSERT.
+    """
+    dialect_name = db.session.get_bind().dialect.name
+    if dialect_name in ('sqlite', 'postgresql'):
+        stmt = (sqlite_insert if dialect_name == 'sqlite' else postgresql_insert)(table)
+        return stmt.on_conflict_do_update(
+            index_elements=list(key_columns),
+            set_=assignments(stmt.excluded),
+            where=where(stmt.excluded) if where else None
+        )
+    if dialect_name in ('mysql', 'mariadb'):
+        stmt = mysql_insert(table)
+        return stmt.on_duplicate_key_update(assignments(stmt.inserted))
+    return None
+
+def _expire_loaded(*models):
+    # Rollup rows change through Core statements, so copies the session already holds are stale
+    for instance in list(db.session.identity_map.values()):
+        if isinstance(instance, models):
+            db.session.expire(instance)
+
+def apply_daily_deltas(deltas):
+    """
+    Adds per-day deltas to daily_user_stats, creating rows as needed and
+    dropping rows that no longer have any entries behind them.
+    Args:
+        deltas (dict): {(user_id, date): delta dict as built by track_entries}
+    """
+    if not deltas:
+        return
+
+    apply_leaderboard_deltas(deltas)
+
+    table = DailyUserStats.__table__
+    bump_data_versions(db.session, {user_id for user_id, _ in deltas})
+    values = [
+        dict({column: delta[column] for column in DAILY_TOTAL_COLUMNS}, user_id=user_id, date=day, activity_counts={})
+        for (user_id, day), delta in deltas.items()
+    ]
+    statement = _upsert_statement(
+        table, ('user_id', 'date'), lambda new: {column: table.c[column] + new[column] for column in DAILY_TOTAL_COLUMNS}
+    )
+    if statement is not None:
+        db.session.execute(statement, values)
+    else:
+        # No upsert: add to the rows that exist, insert the rest
+        update = table.update().where(
+            table.c.user_id == bindparam('key_user_id'), table.c.date == bindparam('key_date')
+        ).values({column: table.c[column] + bindparam(f'delta_{column}') for column in DAILY_TOTAL_COLUMNS})
+        for row in values:
+            params = {f'delta_{column}': row[column] for column in DAILY_TOTAL_COLUMNS}
+            if db.session.execute(update, dict(params, key_user_id=row['user_id'], key_date=row['date'])).rowcount == 0:
+                db.session.execute(insert(table), row)
+
+    # The statement above holds these rows' write locks until commit, so merging the
+    # JSON activity counts in Python cannot interleave with another writer
+    counted = {key: delta['activity_counts'] for key, delta in deltas.items() if delta['activity_counts']}
+    if counted:
+        stored = db.session.execute(
+            select(table.c.user_id, table.c.date, table.c.activity_counts).where(
+                table.c.user_id.in_({user_id for user_id, _ in counted}),
+                table.c.date.in_({day for _, day in counted})
+            )
+        )
+        updates = []
+        for user_id, day, activity_counts in stored:
+            changes = counted.get((user_id, day))
+            if changes is None:
+                continue
+            counts = dict(activity_counts or {})
+            for activity_type, change in changes.items():
+                counts[activity_type] = counts.get(activity_type, 0) + change
+                if counts[activity_type] <= 0:
+                    counts.pop(activity_type)
+            updates.append({'key_user_id': user_id, 'key_date': day, 'counts': counts})
+        if updates:
+            db.session.execute(
+                table.update().where(table.c.user_id == bindparam('key_user_id'), table.c.date == bindparam('key_date'))
+                .values(activity_counts=bindparam('counts', type_=table.c.activity_counts.type)),
+                updates
+            )
+
+    shrinking = [
+        {'key_user_id': user_id, 'key_date': day} for (user_id, day), delta in deltas.items()
+        if delta['fitness_entry_count'] <= 0 and delta['food_entry_count'] <= 0
+    ]
+    if shrinking:
+        db.session.execute(
+            table.delete().where(
+                table.c.user_id == bindparam('key_user_id'), table.c.date == bindparam('key_date'),
+                table.c.fitness_entry_count <= 0, table.c.food_entry_count <= 0
+            ),
+            shrinking
+        )
+    _expire_loaded(DailyUserStats)
+
+def rebuild_daily_user_stats(user_ids=None):
+    """
+    Recomputes daily_user_stats from the raw entry tables.
+    Args:
+        user_ids (list[int], optional): Only rebuild these users; all users when omitted.
+    Returns:
+        int: The number of rollup rows written.
+    """
+    delete_query = DailyUserStats.query
+    fitness_query = db.session.query(
+        FitnessEntry.user_id,
+        FitnessEntry.date,
+        db.func.coalesce(db.func.sum(FitnessEntry.calories_burned), 0.0),
+        db.func.coalesce(db.func.sum(FitnessEntry.duration), 0.0),
+        db.func.count(FitnessEntry.id)
+    ).filter(FitnessEntry.date.isnot(None)).group_by(FitnessEntry.user_id, FitnessEntry.date)
+    activity_query = db.session.query(
+        FitnessEntry.user_id,
+        FitnessEntry.date,
+        FitnessEntry.activity_type,
+        db.func.count(FitnessEntry.id)
+    ).filter(
+        FitnessEntry.date.isnot(None),
+        FitnessEntry.activity_type.isnot(None),
+        FitnessEntry.activity_type != ''
+    ).group_by(FitnessEntry.user_id, FitnessEntry.date, FitnessEntry.activity_type)
+    food_query = db.session.query(
+        FoodEntry.user_id,
+        FoodEntry.date,
+        db.func.coalesce(db.func.sum(FoodEntry.calories), 0.0),
+        db.func.count(FoodEntry.id)
+    ).filter(FoodEntry.date.isnot(None)).group_by(FoodEntry.user_id, FoodEntry.date)
+
+    leaderboard_query = LeaderboardTotals.query
+
+    if user_ids is not None:
+        delete_query = delete_query.filter(DailyUserStats.user_id.in_(user_ids))
+        leaderboard_query = leaderboard_query.filter(LeaderboardTotals.user_id.in_(user_ids))
+        fitness_query = fitness_query.filter(FitnessEntry.user_id.in_(user_ids))
+        activity_query = activity_query.filter(FitnessEntry.user_id.in_(user_ids))
+        food_query = food_query.filter(FoodEntry.user_id.in_(user_ids))
+
+    rows = {}
+    for user_id, day, calories_burned, minutes, count in fitness_query:
+        row = rows.setdefault((user_id, day), _empty_delta())
+        row['calories_burned'] = calories_burned
+        row['workout_minutes'] = minutes
+        row['fitness_entry_count'] = count
+    for user_id, day, activity_type, count in activity_query:
+        rows[(user_id, day)]['activity_counts'][activity_type] = count
+    for user_id, day, calories, count in food_query:
+        row = rows.setdefault((user_id, day), _empty_delta())
+        row['calories_consumed'] = calories
+        row['food_entry_count'] = count
+
+    try:
+        delete_query.delete(synchronize_session=False)
+        # Leaderboard rows are rebuilt from the new daily rows the next time they are read
+        leaderboard_query.delete(synchronize_session=False)
+        if rows:
+            db.session.execute(
+                insert(DailyUserStats),
+                [dict(values, user_id=user_id, date=day) for (user_id, day), values in rows.items()]
+            )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return len(rows)
+
+def summarize_daily_stats(user_id, start_date=None, end_date=None):
+    """
+    Totals a user's daily rollups over an inclusive date window.
+    Args:
+        user_id (int): The ID of the user.
+        start_date (date, optional): First day of the window; unbounded when omitted.
+        end_date (date, optional): Last day of the window; unbounded when omitted.
+    Returns:
+        dict: Totals plus activity_counts ({activity_type: count}) in first-seen order.
+    """
+    query = DailyUserStats.query.filter(DailyUserStats.user_id == user_id)
+    if start_date:
+        query = query.filter(DailyUserStats.date >= start_date)
+    if end_date:
+        query = query.filter(DailyUserStats.date <= end_date)
+
+    summary = _empty_delta()
+    summary['active_days'] = 0
+    for day in query.order_by(DailyUserStats.date):
+        summary['calories_burned'] += day.calories_burned
+        summary['calories_consumed'] += day.calories_consumed
+        summary['workout_minutes'] += day.workout_minutes
+        summary['fitness_entry_count'] += day.fitness_entry_count
+        summary['food_entry_count'] += day.food_entry_count
+        if day.fitness_entry_count:
+            summary['active_days'] += 1
+        for activity_type, count in (day.activity_counts or {}).items():
+            summary['activity_counts'][activity_type] = summary['activity_counts'].get(activity_type, 0) + count
+    return summary
+
+def _current_leaderboard_rows(user_ids, period, today):
+    """
+    Loads leaderboard rows for a period, rolling each one forward to today's window.
+    Rows that moved a few days are rolled by subtracting the daily rows that fell out
+    of the window; missing rows, and rows a whole window or more out of date, are
+    totalled from daily_user_stats. Either way the work is bounded by the window length,
+    and each step is one statement, so a concurrent entry write is never lost.
+    Args:
+        user_ids (iterable[int]): Users to load.
+        period (str): A LEADERBOARD_WINDOWS key.
+        today (date): The day the window ends on.
+    Returns:
+        dict: {user_id: LeaderboardTotals}
+    """
+    user_ids = set(user_ids)
+    window_days = LEADERBOARD_WINDOWS[period]
+    window_start = today - timedelta(days=window_days)
+    oldest_rollable = window_start - timedelta(days=window_days)
+    table = LeaderboardTotals.__table__
+    daily = DailyUserStats.__table__
+
+    def load():
+        return {
+            row.user_id: row
+            for row in LeaderboardTotals.query.filter(
+                LeaderboardTotals.user_id.in_(user_ids),
+                LeaderboardTotals.period == period
+            ).populate_existing()
+        }
+
+    rows = load()
+    rolling = {user_id for user_id, row in rows.items() if oldest_rollable < row.window_start < window_start}
+    stale = {
+        user_id for user_id in user_ids
+        if user_id not in rolling and (user_id not in rows or rows[user_id].window_start != window_start)
+    }
+    if not rolling and not stale:
+        return rows
+
+    if rolling:
+        def dropped(column):
+            # The daily totals between the row's old window start and the new one (correlated to the row)
+            return select(db.func.coalesce(db.func.sum(column), 0)).where(
+                daily.c.user_id == table.c.user_id,
+                daily.c.date >= table.c.window_start,
+                daily.c.date < window_start
+            ).scalar_subquery()
+
+        db.session.execute(
+            table.update().where(
+                table.c.user_id.in_(rolling),
+                table.c.period == period,
+                # Re-checked by the statement, so a row another request rolled meanwhile is left alone
+                table.c.window_start > oldest_rollable,
+                table.c.window_start < window_start
+            ).values(
+                calories_burned=table.c.calories_burned - dropped(daily.c.calories_burned),
+                duration=table.c.duration - dropped(daily.c.workout_minutes),
+                activity_count=table.c.activity_count - dropped(daily.c.fitness_entry_count),
+                window_start=window_start
+            )
+        )
+
+    if stale:
+        users = User.__table__
+        totals = select(
+            users.c.id,
+            literal(period),
+            literal(window_start),
+            db.func.coalesce(db.func.sum(daily.c.calories_burned), 0.0),
+            db.func.coalesce(db.func.sum(daily.c.workout_minutes), 0.0),
+            db.func.coalesce(db.func.sum(daily.c.fitness_entry_count), 0)
+        ).select_from(
+            users.outerjoin(daily, and_(daily.c.user_id == users.c.id, daily.c.date >= window_start))
+        ).where(users.c.id.in_(stale)).group_by(users.c.id)
+        columns = ['user_id', 'period', 'window_start'] + list(LEADERBOARD_TOTAL_COLUMNS)
+        statement = _upsert_statement(
+            table, ('user_id', 'period'),
+            lambda new: {column: new[column] for column in ('window_start',) + LEADERBOARD_TOTAL_COLUMNS},
+            # A row another request already moved to this window may have taken entry writes since
+            where=lambda new: table.c.window_start != new.window_start
+        )
+        if statement is not None:
+            db.session.execute(statement.from_select(columns, totals))
+        else:
+            db.session.execute(table.delete().where(table.c.user_id.in_(stale), table.c.period == period))
+            db.session.execute(insert(table).from_select(columns, totals))
+
+    return load()
+
+def apply_leaderboard_deltas(deltas):
+    """
+    Adds the fitness part of per-day deltas to every leaderboard window they fall in.
+    Users without a row for a period are skipped; their row is totalled from
+    daily_user_stats, which by then includes these deltas, when it is first read.
+    Args:
+        deltas (dict): {(user_id, date): delta dict as built by track_entries}
+    """
+    values = [
+        {
+            'key_user_id': user_id,
+            'key_date': day,
+            'delta_calories_burned': delta['calories_burned'],
+            'delta_duration': delta['workout_minutes'],
+            'delta_activity_count': delta['fitness_entry_count']
+        }
+        for (user_id, day), delta in deltas.items() if delta['fitness_entry_count']
+    ]
+    if not values:
+        return
+
+    table = LeaderboardTotals.__table__
+    db.session.execute(
+        table.update().where(
+            table.c.user_id == bindparam('key_user_id'),
+            table.c.window_start <= bindparam('key_date')
+        ).values({column: table.c[column] + bindparam(f'delta_{column}') for column in LEADERBOARD_TOTAL_COLUMNS}),
+        values
+    )
+    _expire_loaded(LeaderboardTotals)
+
+def get_leaderboard(user_ids, period, today=None):
+    """
+    Returns leaderboard totals for a set of users, rolling stale windows forward first.
+    Args:
+        user_ids (iterable[int]): Users to rank.
+        period (str): 'week', 'month' or 'year'.
+        today (date, optional): Defaults to date.today().
+    Returns:
+        list[LeaderboardTotals]: Rows for users with at least one activity in the window.
+    The session is flushed but not committed; the caller commits to keep any rollover.
+    """
+    rows = _current_leaderboard_rows(user_ids, period, today or date.today())
+    db.session.flush()
+    return [row for row in rows.values() if row.activity_count > 0]
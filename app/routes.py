@@ -1,17 +1,27 @@
 # routes.py
 from datetime import datetime, timedelta, date
-from flask import render_template, request, session, redirect, url_for, flash, jsonify, abort
-from app import app, db, login_manager
+from flask import render_template, request, session, redirect, url_for, flash, jsonify, abort, Response, stream_with_context
+from app import app, db
 from flask_login import login_user as flask_login_user, logout_user, login_required, current_user
 import random
 from urllib.parse import urlencode
-from app.models import User, UserInfo, ShareEntry, FitnessEntry, FoodEntry
+from app.models import User, UserInfo, ShareEntry, ShareCategory, FitnessEntry, FoodEntry
+from app.rollups import track_entries, summarize_daily_stats, get_leaderboard, LEADERBOARD_WINDOWS
+from app.analytics import dashboard_metrics, load_entry_frames
+from app.serializers import iter_csv_rows, iter_ndjson_rows, iter_gzip
+from app.share_cache import cached_snapshot, invalidate_share
+from app.fragment_cache import invalidate_fragments
+from app import columnar
+from sqlalchemy.exc import SQLAlchemyError
+from app.passwords import PasswordHashingBusy, hash_password
+from app.kvstore import create_store, start_sweeper
 from app.forms import RegistrationForm
 import os
 from werkzeug.utils import secure_filename
 import re
-import sqlite3
-import pandas as pd
+import hashlib
+from sqlalchemy import text
+from sqlalchemy.orm import joinedload, load_only, lazyload
 
 # Database helpers
 from app.database import (
@@ -21,20 +31,18 @@ from app.database import (
     find_user_by_username, 
     reset_password as db_reset_password,
     create_share_entry,
-    get_shares_by_sharer,
     revoke_share_entry,
     get_share_entry_by_id,
-    get_user_activity_data
+    get_user_activity_data,
+    get_entry_page,
+    get_entry_page_json,
+    stream_entries
 )
 
-# Temporary in-memory user storage
-temp_users = {}  # Temporary unverified users
-verification_codes = {}  # Temporary in-memory store for verification codes
-
-# User loader for Flask-Login
-@login_manager.user_loader
-def load_user(user_id):
-    return User.query.get(int(user_id))
+# Expiring stores shared across worker processes (see KV_STORE_BACKEND)
+temp_users = create_store(app.config, 'pending_registrations', app.config['PENDING_REGISTRATION_TTL'])  # Temporary unverified users
+verification_codes = create_store(app.config, 'verification_codes', app.config['VERIFICATION_CODE_TTL'])  # Password reset codes
+start_sweeper([temp_users, verification_codes], app.config['KV_STORE_SWEEP_INTERVAL'])
 
 # Route for the Introduction/Home page
 @app.route('/')
@@ -80,27 +88,84 @@ def get_share_window(share_entry_time_range: str, share_creation_date: date):
 
     return start_date_obj.isoformat() if start_date_obj else None, end_date_obj.isoformat()
 
+def summary_payload(summary):
+    """Trims a summarize_daily_stats result to the numbers the visualise summary card shows."""
+    return {
+        'calories_burned': round(summary['calories_burned'], 2),
+        'calories_consumed': round(summary['calories_consumed'], 2),
+        'workout_minutes': round(summary['workout_minutes'], 2),
+        'workouts': summary['fitness_entry_count']
+    }
+
+def parse_date_arg(name):
+    """Reads an optional YYYY-MM-DD query argument; raises ValueError if it is malformed."""
+    value = request.args.get(name)
+    return date.fromisoformat(value) if value else None
+
+def entry_window_owner(share_id, start_date, end_date):
+    """
+    Resolves whose entries a request reads, clamping the window to the share's time range when share_id is given.
+    Args:
+        share_id (int or None): An active share made to the current user, or None for their own entries.
+        start_date (date or None): Requested first day.
+        end_date (date or None): Requested last day.
+    Returns:
+        tuple: (owner user ID, start date, end date, the ShareEntry or None)
+    Raises:
+        PermissionError: If the share does not exist, is inactive or was made to someone else.
+    """
+    if share_id is None:
+        return current_user.id, start_date, end_date, None
+    share_entry = db.session.get(ShareEntry, share_id)
+    if not share_entry or share_entry.sharee_user_id != current_user.id or not share_entry.is_active:
+        raise PermissionError(share_id)
+    window_start_str, window_end_str = get_share_window(share_entry.time_range, share_entry.shared_at.date())
+    # Clamp the requested range to what was shared
+    window_end = date.fromisoformat(window_end_str)
+    end_date = min(end_date, window_end) if end_date else window_end
+    if window_start_str:
+        window_start = date.fromisoformat(window_start_str)
+        start_date = max(start_date, window_start) if start_date else window_start
+    return share_entry.sharer_user_id, start_date, end_date, share_entry
+
+def data_etag(*parts):
+    """Hashes data versions and request parameters into an ETag value."""
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+def user_data_versions(user_ids):
+    """Returns sorted (user_id, data_version) pairs; a primary-key read that never touches the entry tables."""
+    return sorted(db.session.query(User.id, User.data_version).filter(User.id.in_(user_ids)).all())
+
+def cached_json(payload, etag):
+    """jsonify() with an ETag, and a Cache-Control that makes the browser revalidate before reuse."""
+    response = jsonify(payload)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def not_modified(etag):
+    """Returns a 304 response if the client's If-None-Match already has etag, otherwise None."""
+    # Weak comparison, since compressed responses carry the tag as W/"..."
+    if not request.if_none_match.contains_weak(etag):
+        return None
+    response = app.response_class(status=304)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
 # Route for Data Visualisation page (placeholder)
 @app.route('/visualise')
 @login_required
 def visualise():
+    # Only the first page of the default 7 day window ships with the page, serialized straight from the cursor;
+    # visualise.js pages in the rest
+    end_date = date.today()
+    start_date = end_date - timedelta(days=6)
+    page_size = app.config['ENTRIES_PAGE_SIZE']
     try:
-        conn = sqlite3.connect("instance/fitness.db")
-
-        fitness_df = pd.read_sql_query(
-            "SELECT id, user_id, date, activity_type, duration, calories_burned, emotion FROM fitness_entries WHERE user_id = ?", 
-            conn, params=(current_user.id,))
-        
-        food_df = pd.read_sql_query(
-            "SELECT id, user_id, date, food_name, quantity, calories, meal_type FROM food_entries WHERE user_id = ?", 
-            conn, params=(current_user.id,))
-
-        fitness_data = fitness_df.to_dict(orient='records')
-        food_data = food_df.to_dict(orient='records')
-
-        conn.close()
-
-        print(f"Fetched {len(fitness_data)} fitness entries and {len(food_data)} food entries for user {current_user.username}")
+        fitness_data, fitness_cursor = get_entry_page_json('fitness', current_user.id, start_date, end_date, limit=page_size)
+        food_data, food_cursor = get_entry_page_json('food', current_user.id, start_date, end_date, limit=page_size)
+        summary = summarize_daily_stats(current_user.id, start_date, end_date)
 
     except Exception as e:
         print(f"Error fetching data: {e}")
@@ -111,42 +176,175 @@ def visualise():
         username=current_user.username,
         fitness_data=fitness_data,
         food_data=food_data,
+        entry_window={'start': start_date.isoformat(), 'end': end_date.isoformat()},
+        entry_cursors={'fitness': fitness_cursor, 'food': food_cursor},
+        entry_summary=summary_payload(summary),
         is_viewing_shared_data=False, # Default for own data view
         show_activity_log=True, # Default for own data view
         show_meal_log=True # Default for own data view
     )
 
+@app.route('/api/entries')
+@login_required
+def list_entries():
+    """
+    Keyset-paginated entries, newest first.
+    Query args: type (fitness|food), start_date, end_date, cursor, limit,
+    and share_id to read a sharer's entries within the share window.
+    """
+    entry_type = request.args.get('type', 'fitness')
+    cursor = request.args.get('cursor')
+    limit = max(1, min(request.args.get('limit', default=app.config['ENTRIES_PAGE_SIZE'], type=int),
+                       app.config['ENTRIES_MAX_PAGE_SIZE']))
+    share_id = request.args.get('share_id', type=int)
+
+    try:
+        start_date = parse_date_arg('start_date')
+        end_date = parse_date_arg('end_date')
+    except ValueError:
+        return jsonify({'error': 'Dates must be formatted as YYYY-MM-DD'}), 400
+
+    try:
+        owner_id, start_date, end_date, _ = entry_window_owner(share_id, start_date, end_date)
+    except PermissionError:
+        return jsonify({'error': 'Not authorized to view this shared data'}), 403
+
+    try:
+        entries, next_cursor = get_entry_page(entry_type, owner_id, start_date, end_date, cursor=cursor, limit=limit)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({'type': entry_type, 'entries': entries, 'next_cursor': next_cursor})
+
+# Share category a sharee needs for each exportable entry type
+EXPORT_CATEGORIES = {'fitness': 'activity_log', 'food': 'meal_log'}
+EXPORT_FORMATS = {'csv': ('text/csv', iter_csv_rows), 'ndjson': ('application/x-ndjson', iter_ndjson_rows)}
+
+@app.route('/api/export')
+@login_required
+def export_entries():
+    """
+    Streams entries, oldest first, as a CSV or NDJSON download without holding the history in memory.
+    Query args: type (fitness|food), format (csv|ndjson), start_date, end_date, gzip=1 for a .gz file,
+    and share_id to export a sharer's entries within the share window, if the share includes that log.
+    """
+    entry_type = request.args.get('type', 'fitness')
+    export_format = request.args.get('format', 'csv')
+    if entry_type not in EXPORT_CATEGORIES:
+        return jsonify({'error': f'Invalid entry type: {entry_type}'}), 400
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': f'Invalid export format: {export_format}'}), 400
+    share_id = request.args.get('share_id', type=int)
+
+    try:
+        start_date = parse_date_arg('start_date')
+        end_date = parse_date_arg('end_date')
+    except ValueError:
+        return jsonify({'error': 'Dates must be formatted as YYYY-MM-DD'}), 400
+
+    try:
+        owner_id, start_date, end_date, share_entry = entry_window_owner(share_id, start_date, end_date)
+    except PermissionError:
+        return jsonify({'error': 'Not authorized to view this shared data'}), 403
+    if share_entry is not None and EXPORT_CATEGORIES[entry_type] not in share_entry.category_names:
+        return jsonify({'error': 'This share does not include that data'}), 403
+
+    mimetype, serialize = EXPORT_FORMATS[export_format]
+    batch_size = app.config['EXPORT_BATCH_SIZE']
+
+    def generate():
+        result = stream_entries(entry_type, owner_id, start_date, end_date, batch_size=batch_size)
+        try:
+            yield from serialize(result, batch_size=batch_size)
+        except SQLAlchemyError as e:
+            # Headers are already sent; re-raising cuts the download short instead of ending it cleanly
+            app.logger.error(f"Error streaming export: {str(e)}")
+            raise
+        finally:
+            result.close()
+
+    chunks = generate()
+    filename = f'{entry_type}-entries.{export_format}'
+    if request.args.get('gzip', '').lower() in ('1', 'true', 'yes'):
+        chunks = iter_gzip(chunks, app.config['COMPRESS_LEVEL'])
+        mimetype = 'application/gzip'
+        filename += '.gz'
+
+    response = Response(stream_with_context(chunks), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response.headers['Cache-Control'] = 'private, no-store'
+    return response
+
+@app.route('/api/visualisation/dashboard')
+@login_required
+def dashboard_metrics_api():
+    """
+    Every number the visualise charts draw, computed server-side for one window.
+    Query args: start_date and end_date (default: the last 7 days), and share_id to read a sharer's entries.
+    """
+    try:
+        start_date = parse_date_arg('start_date')
+        end_date = parse_date_arg('end_date')
+    except ValueError:
+        return jsonify({'error': 'Dates must be formatted as YYYY-MM-DD'}), 400
+    end_date = end_date or date.today()
+    start_date = start_date or end_date - timedelta(days=6)
+    share_id = request.args.get('share_id', type=int)
+
+    try:
+        owner_id, start_date, end_date, _ = entry_window_owner(share_id, start_date, end_date)
+    except PermissionError:
+        return jsonify({'error': 'Not authorized to view this shared data'}), 403
+
+    versions = user_data_versions([owner_id])
+    etag = data_etag('dashboard', versions, start_date, end_date)
+    cached = not_modified(etag)
+    if cached:
+        return cached
+
+    try:
+        version = versions[0][1] if versions else None
+        metrics = dashboard_metrics(*load_entry_frames(owner_id, start_date, end_date, version))
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        app.logger.error(f"Error in dashboard metrics API: {str(e)}")
+        return jsonify({'error': 'Failed to retrieve dashboard data', 'details': str(e)}), 500
+    metrics['start_date'] = start_date.isoformat()
+    metrics['end_date'] = end_date.isoformat()
+    return cached_json(metrics, etag)
+
 @app.route('/api/delete_entry/<string:entry_type>/<int:entry_id>', methods=['DELETE'])
 @login_required
 def delete_entry(entry_type, entry_id):
-    conn = None
     try:
-        conn = sqlite3.connect("instance/fitness.db")
-        cursor = conn.cursor()
-
         if entry_type == 'fitness':
-            cursor.execute("DELETE FROM fitness_entries WHERE id = ? AND user_id = ?", (entry_id, current_user.id))
+            entry = FitnessEntry.query.filter_by(id=entry_id, user_id=current_user.id).first()
         elif entry_type == 'food':
-            cursor.execute("DELETE FROM food_entries WHERE id = ? AND user_id = ?", (entry_id, current_user.id))
+            entry = FoodEntry.query.filter_by(id=entry_id, user_id=current_user.id).first()
         else:
             return jsonify({'error': 'Invalid entry type'}), 400
 
-        conn.commit()
+        if entry is None:
+            return jsonify({'error': 'Entry not found or not authorized to delete'}), 404
 
-        if cursor.rowcount > 0:
-            return jsonify({'message': 'Entry deleted successfully'}), 200
+        # Remove the entry and its share of the daily rollup in one transaction
+        if entry_type == 'fitness':
+            track_entries(removed_fitness_entries=[entry])
         else:
-            return jsonify({'error': 'Entry not found or not authorized to delete'}), 404
+            track_entries(removed_food_entries=[entry])
+        db.session.delete(entry)
+        db.session.commit()
+        columnar.invalidate(current_user.id, entry_type)
+        return jsonify({'message': 'Entry deleted successfully'}), 200
 
-    except sqlite3.Error as e:
-        print(f"SQLite error during delete operation: {e}")
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        print(f"Database error during delete operation: {e}")
         return jsonify({'error': 'Database error during deletion', 'details': str(e)}), 500
     except Exception as e:
+        db.session.rollback()
         print(f"Unexpected error during delete operation: {e}")
         return jsonify({'error': 'An unexpected error occurred', 'details': str(e)}), 500
-    finally:
-        if conn:
-            conn.close()
 
 # Route for Data Sharing page
 @app.route('/share', methods=['GET', 'POST'])
@@ -199,7 +397,7 @@ def share():
         ).first()
 
         if existing_active_share:
-            current_categories_in_db_set = set(existing_active_share.data_categories.split(','))
+            current_categories_in_db_set = set(existing_active_share.category_names)
             new_categories_from_form_set = set(data_categories_list_from_form)
             current_time_range_in_db = existing_active_share.time_range
 
@@ -218,6 +416,9 @@ def share():
                 existing_active_share.time_range = new_time_range_key
                 existing_active_share.shared_at = datetime.utcnow()
                 db.session.commit()
+                invalidate_share(existing_active_share.id)
+                invalidate_fragments('share-lists', current_user.id)
+                invalidate_fragments('share-lists', recipient.id)
 
                 update_messages = []
                 if actually_added_category_keys:
@@ -246,55 +447,64 @@ def share():
         
         return redirect(url_for('share'))
 
-    share_entries = get_shares_by_sharer(current_user.id)
-    current_shares = []
-    for entry in share_entries:
-        sharee_name = entry.sharee.username if hasattr(entry.sharee, 'username') else str(entry.sharee_user_id)
-        categories_keys = entry.data_categories.split(',')
-        categories_display = [category_map.get(cat, cat.replace('_', ' ').title()) for cat in categories_keys if cat]
-        time_range_display = time_map.get(entry.time_range, entry.time_range.replace('_', ' ').title())
-        current_shares.append({
-            'sharee_name': sharee_name,
-            'data_categories': categories_display,
-            'time_range': time_range_display,
-            'share_id': entry.id
-        })
-
-    shares_with_user = ShareEntry.query.filter_by(sharee_user_id=current_user.id, is_active=True).all()
-    shared_with_you_data = []
-    for entry in shares_with_user:
-        sharer_name = entry.sharer.username if hasattr(entry.sharer, 'username') else str(entry.sharer_user_id)
-        categories_keys = entry.data_categories.split(',')
-        categories_display = [category_map.get(cat, cat.replace('_', ' ').title()) for cat in categories_keys if cat]
-        time_range_display = time_map.get(entry.time_range, entry.time_range.replace('_', ' ').title())
-        shared_with_you_data.append({
-            'sharer_name': sharer_name,
-            'data_categories': categories_display,
-            'time_range': time_range_display,
-            'shared_at': entry.shared_at.strftime('%Y-%m-%d %H:%M'),
-            'share_id': entry.id
-        })
-
-    share_history_entries = ShareEntry.query.filter(
-        ((ShareEntry.sharer_user_id == current_user.id) | (ShareEntry.sharee_user_id == current_user.id)) & (ShareEntry.is_active == False)
-    ).order_by(ShareEntry.shared_at.desc()).all()
-    share_history_data = []
-    for entry in share_history_entries:
-        sharer_name = entry.sharer.username if hasattr(entry.sharer, 'username') else str(entry.sharer_user_id)
-        sharee_name = entry.sharee.username if hasattr(entry.sharee, 'username') else str(entry.sharee_user_id)
-        categories_keys = entry.data_categories.split(',')
-        categories_display = [category_map.get(cat, cat.replace('_', ' ').title()) for cat in categories_keys if cat]
-        time_range_display = time_map.get(entry.time_range, entry.time_range.replace('_', ' ').title())
-        share_history_data.append({
-            'sharer_name': sharer_name,
-            'sharee_name': sharee_name,
-            'data_categories': categories_display,
-            'time_range': time_range_display,
-            'shared_at': entry.shared_at.strftime('%Y-%m-%d %H:%M'),
-            'status': 'Revoked'
-        })
-
-    return render_template('share.html', current_shares=current_shares, username=current_user.username, shared_with_you=shared_with_you_data, share_history=share_history_data)
+    def load_share_lists():
+        # One query for every share the user is part of, with both usernames joined in (and not the
+        # joined UserInfo the User mapper would add), plus one selectin query for their categories
+        user_columns = (load_only(User.id, User.username), lazyload(User.info))
+        share_entries = ShareEntry.query.filter(
+            (ShareEntry.sharer_user_id == current_user.id) | (ShareEntry.sharee_user_id == current_user.id)
+        ).options(
+            joinedload(ShareEntry.sharer).options(*user_columns),
+            joinedload(ShareEntry.sharee).options(*user_columns)
+        ).order_by(ShareEntry.id).all()
+
+        current_shares = []
+        shared_with_you_data = []
+        share_history_entries = []
+        for entry in share_entries:
+            categories_display = [category_map.get(cat, cat.replace('_', ' ').title()) for cat in entry.category_names]
+            time_range_display = time_map.get(entry.time_range, entry.time_range.replace('_', ' ').title())
+            if not entry.is_active:
+                share_history_entries.append((entry, categories_display, time_range_display))
+            elif entry.sharer_user_id == current_user.id:
+                sharee_name = entry.sharee.username if hasattr(entry.sharee, 'username') else str(entry.sharee_user_id)
+                current_shares.append({
+                    'sharee_name': sharee_name,
+                    'data_categories': categories_display,
+                    'time_range': time_range_display,
+                    'share_id': entry.id
+                })
+            else:
+                sharer_name = entry.sharer.username if hasattr(entry.sharer, 'username') else str(entry.sharer_user_id)
+                shared_with_you_data.append({
+                    'sharer_name': sharer_name,
+                    'data_categories': categories_display,
+                    'time_range': time_range_display,
+                    'shared_at': entry.shared_at.strftime('%Y-%m-%d %H:%M'),
+                    'share_id': entry.id
+                })
+
+        share_history_entries.sort(key=lambda item: item[0].shared_at, reverse=True)
+        share_history_data = []
+        for entry, categories_display, time_range_display in share_history_entries:
+            sharer_name = entry.sharer.username if hasattr(entry.sharer, 'username') else str(entry.sharer_user_id)
+            sharee_name = entry.sharee.username if hasattr(entry.sharee, 'username') else str(entry.sharee_user_id)
+            share_history_data.append({
+                'sharer_name': sharer_name,
+                'sharee_name': sharee_name,
+                'data_categories': categories_display,
+                'time_range': time_range_display,
+                'shared_at': entry.shared_at.strftime('%Y-%m-%d %H:%M'),
+                'status': 'Revoked'
+            })
+
+        return {'current_shares': current_shares, 'shared_with_you': shared_with_you_data, 'share_history': share_history_data}
+
+    # The lists are a cached fragment of share.html, built only on a miss. Every share change bumps both
+    # users' share_version, and entry uploads do not, so one primary-key read tells whether the cached
+    # lists are still current.
+    share_lists_version = db.session.query(User.share_version).filter(User.id == current_user.id).scalar()
+    return render_template('share.html', share_lists=load_share_lists, share_lists_version=share_lists_version, username=current_user.username)
 
 @app.route('/view_shared_data/<int:share_id>')
 @login_required
@@ -315,54 +525,46 @@ def view_shared_data(share_id):
         share_entry.shared_at.date()
     )
 
-    fitness_data = []
-    food_data = []
+    start_date = date.fromisoformat(effective_start_date_str) if effective_start_date_str else None
+    end_date = date.fromisoformat(effective_end_date_str)
+    page_size = app.config['ENTRIES_PAGE_SIZE']
 
-    try:
-        conn = sqlite3.connect("instance/fitness.db")
-        fitness_query = "SELECT id, user_id, date, activity_type, duration, calories_burned, emotion FROM fitness_entries WHERE user_id = ?"
-        params = [sharer.id]
-
-        if effective_start_date_str and share_entry.time_range != 'all_time':
-            fitness_query += " AND date >= ?"
-            params.append(effective_start_date_str)
-        fitness_query += " AND date <= ?"
-        params.append(effective_end_date_str)
-        
-        fitness_df = pd.read_sql_query(fitness_query, conn, params=tuple(params))
-        fitness_df['date'] = pd.to_datetime(fitness_df['date']).dt.strftime('%Y-%m-%d')
-
-        food_query = "SELECT id, user_id, date, food_name, quantity, calories, meal_type FROM food_entries WHERE user_id = ?"
-        food_params = [sharer.id]
-
-        if effective_start_date_str and share_entry.time_range != 'all_time':
-            food_query += " AND date >= ?"
-            food_params.append(effective_start_date_str)
-        food_query += " AND date <= ?"
-        food_params.append(effective_end_date_str)
-
-        food_df = pd.read_sql_query(food_query, conn, params=tuple(food_params))
-        food_df['date'] = pd.to_datetime(food_df['date']).dt.strftime('%Y-%m-%d')
+    def load_snapshot():
+        fitness_data, fitness_cursor = get_entry_page_json('fitness', sharer.id, start_date, end_date, limit=page_size)
+        food_data, food_cursor = get_entry_page_json('food', sharer.id, start_date, end_date, limit=page_size)
+        summary = summarize_daily_stats(sharer.id, start_date, end_date)
 
-        conn.close()
-
-        actual_min_date_fitness = fitness_df['date'].min() if not fitness_df.empty else None
-        actual_min_date_food = food_df['date'].min() if not food_df.empty else None
-        
-        all_actual_min_dates = [d for d in [actual_min_date_fitness, actual_min_date_food] if d]
         final_effective_start_date = effective_start_date_str
         if share_entry.time_range == 'all_time':
+            # Earliest shared entry, answered from the (user_id, date) indexes
+            params = {'user_id': sharer.id, 'end_date': effective_end_date_str}
+            all_actual_min_dates = [
+                str(min_date) for min_date in (
+                    db.session.execute(text("SELECT MIN(date) FROM fitness_entries WHERE user_id = :user_id AND date <= :end_date"), params).scalar(),
+                    db.session.execute(text("SELECT MIN(date) FROM food_entries WHERE user_id = :user_id AND date <= :end_date"), params).scalar()
+                ) if min_date
+            ]
             final_effective_start_date = min(all_actual_min_dates) if all_actual_min_dates else effective_end_date_str
+        return {
+            'fitness_data': fitness_data, 'fitness_cursor': fitness_cursor,
+            'food_data': food_data, 'food_cursor': food_cursor,
+            'summary': summary_payload(summary),
+            'final_effective_start_date': final_effective_start_date
+        }
 
-        fitness_data = fitness_df.to_dict(orient='records')
-        food_data = food_df.to_dict(orient='records')
-
+    try:
+        # Every sharee of a popular sharer sees the same data until the sharer's data_version moves on
+        snapshot = cached_snapshot(
+            ('share', share_entry.id, share_entry.data_categories, share_entry.time_range, sharer.data_version),
+            load_snapshot
+        )
     except Exception as e:
         print(f"Error fetching shared data: {e}")
         flash('Could not load shared data due to a database error.', 'danger')
         return redirect(url_for('share'))
+    final_effective_start_date = snapshot['final_effective_start_date']
 
-    shared_categories = set(share_entry.data_categories.split(','))
+    shared_categories = set(share_entry.category_names)
 
     show_basic_profile = 'basic_profile' in shared_categories
     show_activity_summary = 'activity_summary' in shared_categories
@@ -374,8 +576,13 @@ def view_shared_data(share_id):
     return render_template(
         'visualise.html',
         username=current_user.username,
-        fitness_data=fitness_data,
-        food_data=food_data,
+        fitness_data=snapshot['fitness_data'],
+        food_data=snapshot['food_data'],
+        entry_window={'start': final_effective_start_date if share_entry.time_range == 'all_time' else effective_start_date_str,
+                      'end': effective_end_date_str},
+        entry_cursors={'fitness': snapshot['fitness_cursor'], 'food': snapshot['food_cursor']},
+        entry_summary=snapshot['summary'],
+        share_id=share_entry.id,
         is_viewing_shared_data=True,
         sharer_username=sharer.username,
         effective_start_date_str=final_effective_start_date if share_entry.time_range == 'all_time' else effective_start_date_str,
@@ -436,9 +643,10 @@ def register():
         password = form.password.data
 
         code = str(random.randint(100000, 999999))
+        # Only the hash is kept while the link is pending, since the store may be a file on disk
         temp_users[email] = {
             'username': username,
-            'password': password,
+            'password_hash': hash_password(password),
             'code': code
         }
         verification_link = url_for('verify_email', email=email, code=code, _external=True)
@@ -469,7 +677,8 @@ def verify_email():
         registered_user = db_register_user(
             username=user_data['username'],
             email=email,
-            password=user_data['password'],
+            password=None,
+            password_hash=user_data['password_hash'],
             gender=None,
             age=None,
             height=None,
@@ -493,7 +702,7 @@ def forgot_password():
             code = str(random.randint(100000, 999999))
             verification_codes[email] = {
                 'code': code,
-                'timestamp': datetime.now()
+                'timestamp': datetime.now().isoformat()
             }
             session['reset_email'] = email
             print(f"🔐 Verification code for {email}: {code}")
@@ -516,7 +725,7 @@ def verify_code():
             flash("❌ Verification code not found. Please request again.", "danger")
             return redirect(url_for('forgot_password'))
 
-        sent_time = record.get('timestamp')
+        sent_time = datetime.fromisoformat(record['timestamp'])
         if datetime.now() - sent_time > timedelta(minutes=2):
             verification_codes.pop(email, None)
             session.pop('code_sent_time', None)
@@ -600,6 +809,12 @@ def terms_of_service():
 def inject_current_year():
     return {'current_year': datetime.now().year}
 
+@app.errorhandler(PasswordHashingBusy)
+def password_hashing_busy(e):
+    # Shed login/registration bursts quickly instead of queueing them behind the hashing pool
+    db.session.rollback()
+    return "Too many sign-in requests right now. Please try again in a moment.", 503, {'Retry-After': '1'}
+
 @app.route('/api/visualisation/ranking')
 @login_required
 def fitness_ranking():
@@ -607,72 +822,58 @@ def fitness_ranking():
         time_range = request.args.get('time_range', 'week')
         sort_by = request.args.get('sort_by', 'calories')
         
-        today = datetime.today().date()
-        if time_range == 'week':
-            start_date = today - timedelta(days=7)
-        elif time_range == 'month':
-            start_date = today - timedelta(days=30)
-        elif time_range == 'year':
-            start_date = today - timedelta(days=365)
-        else:
-            start_date = today - timedelta(days=7)
+        period = time_range if time_range in LEADERBOARD_WINDOWS else 'week'
 
-        sharer_ids_who_shared_ranking = db.session.query(ShareEntry.sharer_user_id)\
-            .filter(ShareEntry.sharee_user_id == current_user.id)\
-            .filter(ShareEntry.is_active == True)\
-            .filter(ShareEntry.data_categories.contains('fitness_ranking'))\
+        # Index seek on share_categories (sharee_user_id, is_active, category, sharer_user_id)
+        sharer_ids_who_shared_ranking = db.session.query(ShareCategory.sharer_user_id)\
+            .filter(ShareCategory.sharee_user_id == current_user.id)\
+            .filter(ShareCategory.is_active == True)\
+            .filter(ShareCategory.category == 'fitness_ranking')\
             .distinct().all()
 
         allowed_sharer_ids = [item[0] for item in sharer_ids_who_shared_ranking]
         user_ids_for_ranking = list(set([current_user.id] + allowed_sharer_ids))
 
-        fitness_entries_query = db.session.query(
-            User.username,
-            User.id.label('user_id'),
-            db.func.sum(FitnessEntry.calories_burned).label('total_calories'),
-            db.func.sum(FitnessEntry.duration).label('total_duration'),
-            db.func.count(FitnessEntry.id).label('activity_count')
-        ).join(
-            FitnessEntry, User.id == FitnessEntry.user_id
-        ).filter(
-            User.id.in_(user_ids_for_ranking)
-        ).filter(
-            FitnessEntry.date >= start_date
-        ).group_by(
-            User.username, User.id
+        # Windows are relative to today, so the date is part of the tag alongside every visible user's version
+        etag = data_etag('ranking', user_data_versions(user_ids_for_ranking), date.today(), time_range, sort_by)
+        cached = not_modified(etag)
+        if cached:
+            return cached
+
+        # Precomputed per-user totals; keep any window rollover the lookup performed
+        leaderboard = get_leaderboard(user_ids_for_ranking, period)
+        db.session.commit()
+        usernames = dict(
+            db.session.query(User.id, User.username)
+            .filter(User.id.in_([row.user_id for row in leaderboard]))
         )
-        
+
         if sort_by == 'duration':
-            fitness_entries = fitness_entries_query.order_by(
-                db.func.sum(FitnessEntry.duration).desc()
-            ).all()
+            leaderboard.sort(key=lambda row: row.duration, reverse=True)
         elif sort_by == 'activity_count':
-            fitness_entries = fitness_entries_query.order_by(
-                db.func.count(FitnessEntry.id).desc()
-            ).all()
+            leaderboard.sort(key=lambda row: row.activity_count, reverse=True)
         else:
-            fitness_entries = fitness_entries_query.order_by(
-                db.func.sum(FitnessEntry.calories_burned).desc()
-            ).all()
+            leaderboard.sort(key=lambda row: row.calories_burned, reverse=True)
 
         ranking_data = []
-        for i, (username, user_id_in_ranking, total_calories, total_duration, activity_count) in enumerate(fitness_entries, 1):
+        for i, row in enumerate(leaderboard, 1):
             ranking_data.append({
                 'rank': i,
-                'username': username,
-                'total_calories_burned': round(total_calories, 2) if total_calories else 0,
-                'total_duration': round(total_duration, 2) if total_duration else 0,
-                'activity_count': activity_count,
-                'is_current_user': (user_id_in_ranking == current_user.id)
+                'username': usernames.get(row.user_id),
+                'total_calories_burned': round(row.calories_burned, 2) if row.calories_burned else 0,
+                'total_duration': round(row.duration, 2) if row.duration else 0,
+                'activity_count': row.activity_count,
+                'is_current_user': (row.user_id == current_user.id)
             })
 
-        return jsonify({
+        return cached_json({
             'ranking': ranking_data, 
             'time_range': time_range,
             'sort_by': sort_by
-        })
+        }, etag)
     
     except Exception as e:
+        db.session.rollback()
         app.logger.error(f"Error in fitness ranking API: {str(e)}")
         return jsonify({'error': 'Failed to retrieve ranking data', 'details': str(e)}), 500
 
@@ -684,56 +885,68 @@ def fitness_visualization():
         days = request.args.get('days', default=30, type=int)
         end_date = datetime.today().date()
         start_date = end_date - timedelta(days=days)
-        
-        fitness_entries = FitnessEntry.query.filter(
-            FitnessEntry.user_id == user_id,
-            FitnessEntry.date >= start_date,
-            FitnessEntry.date <= end_date
-        ).order_by(FitnessEntry.date).all()
-        
-        food_entries = FoodEntry.query.filter(
-            FoodEntry.user_id == user_id,
-            FoodEntry.date >= start_date,
-            FoodEntry.date <= end_date
-        ).order_by(FoodEntry.date).all()
-        
-        fitness_data = []
-        for entry in fitness_entries:
-            fitness_data.append({
-                'date': entry.date.isoformat(),
-                'activity_type': entry.activity_type,
-                'duration': entry.duration,
-                'calories_burned': entry.calories_burned,
-                'emotion': entry.emotion
-            })
-        
-        food_data = []
-        for entry in food_entries:
-            food_data.append({
-                'date': entry.date.isoformat(),
-                'food_name': entry.food_name,
-                'quantity': entry.quantity,
-                'calories': entry.calories,
-                'meal_type': entry.meal_type
-            })
-        
-        total_calories_burned = sum(entry.calories_burned for entry in fitness_entries if entry.calories_burned)
-        total_workout_minutes = sum(entry.duration for entry in fitness_entries if entry.duration)
-        total_calories_consumed = sum(entry.calories for entry in food_entries if entry.calories)
+
+        versions = user_data_versions([user_id])
+        etag = data_etag('fitness', versions, end_date, days)
+        cached = not_modified(etag)
+        if cached:
+            return cached
+
+        if columnar.is_enabled():
+            # Both windows are slices of the user's memory-mapped columns, in the same (date, id) order
+            version = versions[0][1] if versions else None
+            fitness_data = columnar.load_columns(user_id, 'fitness', version).window(start_date, end_date).records(
+                ('date', 'activity_type', 'duration', 'calories_burned', 'emotion'))
+            food_data = columnar.load_columns(user_id, 'food', version).window(start_date, end_date).records(
+                ('date', 'food_name', 'quantity', 'calories', 'meal_type'))
+        else:
+            fitness_entries = FitnessEntry.query.filter(
+                FitnessEntry.user_id == user_id,
+                FitnessEntry.date >= start_date,
+                FitnessEntry.date <= end_date
+            ).order_by(FitnessEntry.date, FitnessEntry.id).all()
+
+            food_entries = FoodEntry.query.filter(
+                FoodEntry.user_id == user_id,
+                FoodEntry.date >= start_date,
+                FoodEntry.date <= end_date
+            ).order_by(FoodEntry.date, FoodEntry.id).all()
+
+            fitness_data = []
+            for entry in fitness_entries:
+                fitness_data.append({
+                    'date': entry.date.isoformat(),
+                    'activity_type': entry.activity_type,
+                    'duration': entry.duration,
+                    'calories_burned': entry.calories_burned,
+                    'emotion': entry.emotion
+                })
+
+            food_data = []
+            for entry in food_entries:
+                food_data.append({
+                    'date': entry.date.isoformat(),
+                    'food_name': entry.food_name,
+                    'quantity': entry.quantity,
+                    'calories': entry.calories,
+                    'meal_type': entry.meal_type
+                })
+
+        # Summary comes from the per-day rollups: at most days + 1 rows instead of every entry
+        summary = summarize_daily_stats(user_id, start_date, end_date)
+        total_calories_burned = summary['calories_burned']
+        total_workout_minutes = summary['workout_minutes']
+        total_calories_consumed = summary['calories_consumed']
         
         avg_daily_calories_burned = total_calories_burned / days if days > 0 else 0
         avg_daily_workout_minutes = total_workout_minutes / days if days > 0 else 0
         avg_daily_calories_consumed = total_calories_consumed / days if days > 0 else 0
         
-        activity_types = {}
-        for entry in fitness_entries:
-            if entry.activity_type:
-                activity_types[entry.activity_type] = activity_types.get(entry.activity_type, 0) + 1
-        
+        activity_types = summary['activity_counts']
         sorted_activities = sorted(activity_types.items(), key=lambda x: x[1], reverse=True)
         top_activities = [{'type': k, 'count': v} for k, v in sorted_activities[:5]]
         
-        return jsonify({
+        return cached_json({
             'fitness_entries': fitness_data,
             'food_entries': food_data,
             'summary': {
@@ -751,7 +964,7 @@ def fitness_visualization():
                 'end_date': end_date.isoformat(),
                 'days': days
             }
-        })
+        }, etag)
     
     except Exception as e:
         app.logger.error(f"Error in fitness visualization API: {str(e)}")
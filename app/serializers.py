@@ -0,0 +1,114 @@
+# serializers.py
+# Turns DB cursor rows straight into JSON, NDJSON or CSV text, without building a DataFrame or a list of dicts.
+
+import csv
+import io
+import json
+import zlib
+from datetime import date, datetime
+from markupsafe import Markup
+
+# Same escaping as Flask's |tojson so the output can be embedded in a <script> block
+_HTML_SAFE = str.maketrans({
+    '<': '\\u003c',
+    '>': '\\u003e',
+    '&': '\\u0026',
+    "'": '\\u0027'
+})
+
+def _default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def iter_json_rows(result, html_safe=False, batch_size=500, limit=None):
+    """
+    Yields a JSON array of records for a cursor result, a batch of rows at a time.
+    Args:
+        result: A SQLAlchemy CursorResult (or anything with keys() and fetchmany()).
+        html_safe (bool): Escape <, >, & and ' for embedding in HTML.
+        batch_size (int): Rows encoded per chunk; bounds memory while keeping the C encoder busy.
+        limit (int, optional): Stop after this many rows, leaving any others unread in the result.
+    Yields:
+        str: Chunks that join into a JSON array of {column: value} objects.
+    """
+    columns = list(result.keys())
+    encode = json.JSONEncoder(default=_default, separators=(', ', ': ')).encode
+    separator = '['
+    remaining = limit
+    while remaining is None or remaining > 0:
+        rows = result.fetchmany(batch_size if remaining is None else min(batch_size, remaining))
+        if not rows:
+            break
+        if remaining is not None:
+            remaining -= len(rows)
+        # Encode the batch as one array and strip its brackets so batches splice together
+        chunk = separator + encode([dict(zip(columns, row)) for row in rows])[1:-1]
+        yield chunk.translate(_HTML_SAFE) if html_safe else chunk
+        separator = ', '
+    yield '[]' if separator == '[' else ']'
+
+def rows_to_json(result, html_safe=False, limit=None):
+    """Serializes a whole cursor result (or its first limit rows) to a JSON array string."""
+    return ''.join(iter_json_rows(result, html_safe=html_safe, limit=limit))
+
+def rows_to_script_json(result, limit=None):
+    """Serializes a cursor result (or its first limit rows) for direct use inside a template <script> block."""
+    return Markup(rows_to_json(result, html_safe=True, limit=limit))
+
+def iter_ndjson_rows(result, batch_size=500):
+    """
+    Yields newline-delimited JSON, one {column: value} object per row, a batch of rows at a time.
+    Args:
+        result: A SQLAlchemy result (or anything with keys() and fetchmany()).
+        batch_size (int): Rows encoded per chunk.
+    Yields:
+        str: Chunks of complete lines.
+    """
+    columns = list(result.keys())
+    encode = json.JSONEncoder(default=_default, separators=(', ', ': ')).encode
+    while True:
+        rows = result.fetchmany(batch_size)
+        if not rows:
+            break
+        yield ''.join(encode(dict(zip(columns, row))) + '\n' for row in rows)
+
+def iter_csv_rows(result, batch_size=500):
+    """
+    Yields CSV text with a header line, a batch of rows at a time. NULL becomes an empty field.
+    Args:
+        result: A SQLAlchemy result (or anything with keys() and fetchmany()).
+        batch_size (int): Rows written per chunk.
+    Yields:
+        str: Chunks of complete lines.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(result.keys())
+    while True:
+        rows = result.fetchmany(batch_size)
+        if not rows:
+            break
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # The header alone when there are no rows
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def iter_gzip(chunks, level=6):
+    """
+    Compresses text chunks into one gzip stream as they are produced.
+    Args:
+        chunks (iterable[str]): Text to encode as UTF-8 and compress.
+        level (int): zlib compression level, 1 (fastest) to 9 (smallest).
+    Yields:
+        bytes: Compressed chunks; empty ones are skipped.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 31 writes a gzip header and trailer
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
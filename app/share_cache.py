@@ -0,0 +1,49 @@
+# share_cache.py
+# In-process cache of the data a sharee sees for a share, so many sharees opening the same popular
+# sharer's page do not each re-read the same entries. Payloads are stored pickled in a byte-budgeted LRU.
+# Keys carry the sharer's users.data_version, which every entry write and share change bumps, so a
+# stale snapshot is never served; payloads without entries (profiles) key on users.share_version instead,
+# which only share and profile changes bump. Revoking or updating a share also drops its snapshots right away.
+
+import pickle
+from flask import current_app
+from app.kvstore import SizedMemoryStore
+
+_cache = None
+
+def _get_cache():
+    global _cache
+    if _cache is None:
+        _cache = SizedMemoryStore(current_app.config['SHARE_SNAPSHOT_CACHE_BYTES'])
+    return _cache
+
+def cached_snapshot(key, build):
+    """
+    Returns the payload cached under key, building and caching it on a miss.
+    Args:
+        key (tuple): Everything the payload depends on, including the data owner's data_version
+            or share_version.
+            Share snapshots start with ('share', share_id).
+        build (callable): Computes the payload; it must pickle.
+    Returns:
+        The payload. Each call unpickles a fresh copy, so callers may modify it.
+    """
+    if not current_app.config['SHARE_SNAPSHOT_CACHE_BYTES']:
+        return build()
+    cache = _get_cache()
+    data = cache.get(key)
+    if data is None:
+        payload = build()
+        cache.set(key, pickle.dumps(payload, pickle.HIGHEST_PROTOCOL))
+        return payload
+    return pickle.loads(data)
+
+def invalidate_share(share_id):
+    """Drops every snapshot of a share; call after committing a revoke or update."""
+    if _cache is not None:
+        _cache.pop_matching(lambda key: key[:2] == ('share', share_id))
+
+def clear():
+    """Drops every cached snapshot."""
+    if _cache is not None:
+        _cache.clear()
@@ -1,8 +1,13 @@
 # upload.py
-from flask import Blueprint, request, render_template, redirect, url_for, flash
+from flask import Blueprint, request, render_template, redirect, url_for, flash, jsonify, current_app
 from flask_login import login_required, current_user
 from app import db
-from app.models import UserInfo, FitnessEntry, FoodEntry
+from app.models import UserInfo, FitnessEntry
+from app.rollups import track_entries
+from app.database import upsert_user_food_entries
+from app.importer import import_entries_csv, ImportFormatError
+from app.user_cache import invalidate_user
+from app import columnar
 from datetime import datetime, date
 
 upload_bp = Blueprint('upload', __name__)
@@ -49,9 +54,10 @@ def upload_page():
             burned = request.form.getlist('calories_burned')
             emotions = request.form.getlist('emotion')
 
+            new_fitness_entries = []
             for i in range(len(activity_types)):
                 if activity_types[i]:
-                    db.session.add(FitnessEntry(
+                    new_fitness_entries.append(FitnessEntry(
                         user_id=user_id,
                         date=date_obj,
                         activity_type=activity_types[i],
@@ -66,19 +72,29 @@ def upload_page():
             calories = request.form.getlist('food_calories')
             meal_types = request.form.getlist('meal_type')
 
+            food_rows = []
             for i in range(len(food_names)):
                 if food_names[i]:
-                    db.session.add(FoodEntry(
-                        user_id=user_id,
-                        date=date_obj,
-                        food_name=food_names[i],
-                        quantity=float(quantities[i]) if quantities[i] else None,
-                        calories=float(calories[i]) if calories[i] else None,
-                        meal_type=meal_types[i]
-                    ))
+                    food_rows.append({
+                        'user_id': user_id,
+                        'date': date_obj,
+                        'food_name': food_names[i],
+                        'quantity': float(quantities[i]) if quantities[i] else None,
+                        'calories': float(calories[i]) if calories[i] else None,
+                        'meal_type': meal_types[i] or None  # "Select Meal Type" must not count as a meal
+                    })
 
+            db.session.add_all(new_fitness_entries)
+            track_entries(fitness_entries=new_fitness_entries)
+            # One meal per (date, meal type): a repeated meal replaces the earlier entry
+            _, replaced = upsert_user_food_entries(food_rows, commit=False)
             db.session.commit()
+            invalidate_user(user_id)
+            columnar.append_entries(user_id, food_rows)
             flash("✅ Upload successful!", "success")
+            for _, meal_date, meal_type in replaced:
+                flash(f"{meal_type.capitalize()} on {meal_date.isoformat()} replaced the earlier entry; "
+                      f"one food entry is kept per meal and day.", "info")
             return redirect(url_for('upload.upload_page'))
 
         except Exception as e:
@@ -108,3 +124,38 @@ def upload_page():
         username=current_user.username,
         active_page='upload.upload_page'
     )
+
+@upload_bp.route('/upload/import', methods=['POST'])
+@login_required
+def import_entries():
+    """
+    Imports a CSV file of fitness or food entries (form fields: file, type).
+    Answers with the JSON report for API clients, otherwise flashes a summary and redirects to the upload page.
+    """
+    wants_json = request.accept_mimetypes.best_match(['text/html', 'application/json']) == 'application/json'
+    upload = request.files.get('file')
+    entry_type = request.form.get('type', 'fitness')
+
+    try:
+        if upload is None or not upload.filename:
+            raise ImportFormatError("Choose a CSV file to import")
+        # upload.stream is Werkzeug's spooled temporary file, read here a chunk at a time
+        report = import_entries_csv(current_user.id, upload.stream, entry_type,
+                                    chunk_size=current_app.config['IMPORT_CHUNK_SIZE'])
+    except ImportFormatError as e:
+        if wants_json:
+            return jsonify({'error': str(e)}), 400
+        flash(f"❌ Import failed: {str(e)}", "danger")
+        return redirect(url_for('upload.upload_page'))
+    # Imported history is usually back-dated, so the columnar table is rebuilt rather than appended to
+    columnar.invalidate(current_user.id, entry_type)
+
+    if wants_json:
+        return jsonify(report)
+    flash(f"✅ Imported {report['imported']} {entry_type} entries ({report['error_count']} rows skipped, "
+          f"{report['rows_per_second']:,.0f} rows/s).", "success" if report['imported'] else "warning")
+    if report['replaced']:
+        flash(f"{report['replaced']} imported meals replaced an entry already logged for the same meal and day.", "info")
+    for error in report['errors'][:5]:
+        flash(f"Line {error['line']}: {error['error']}", "warning")
+    return redirect(url_for('upload.upload_page'))
@@ -0,0 +1,78 @@
+# user_cache.py
+# Flask-Login user loader backed by a small in-process cache, so authenticated
+# requests that only need the user's id or name never touch the users table.
+
+from flask import current_app
+from flask_login import UserMixin, user_logged_in
+from app import db
+from app.models import User
+from app.kvstore import MemoryStore
+
+
+class CachedUser(UserMixin):
+    """
+    Stands in for current_user. id, username and email come from the cache;
+    any other attribute loads the full User row once for the rest of the request.
+    """
+    # Not a column; templates read it and /upload_avatar sets it for the current request only
+    avatar_url = None
+
+    def __init__(self, user_id, username, email):
+        self.id = user_id
+        self.username = username
+        self.email = email
+
+    def _row(self):
+        row = self.__dict__.get('_user_row')
+        if row is None:
+            row = db.session.get(User, self.id)
+            self.__dict__['_user_row'] = row
+        return row
+
+    def __getattr__(self, name):
+        # Only called for attributes not set above
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return getattr(self._row(), name)
+
+    def __repr__(self):
+        return f'<User {self.username}>'
+
+
+_cache = None
+
+def _get_cache():
+    global _cache
+    if _cache is None:
+        _cache = MemoryStore(current_app.config['USER_CACHE_SIZE'], current_app.config['USER_CACHE_TTL'])
+    return _cache
+
+def load_user(user_id):
+    """
+    Flask-Login user loader.
+    Args:
+        user_id (str): The id stored in the session.
+    Returns:
+        CachedUser: The user, or None if the id no longer exists.
+    """
+    user_id = int(user_id)
+    cache = _get_cache()
+    snapshot = cache.get(user_id)
+    if snapshot is None:
+        # Only the cached columns; skips the joined UserInfo load User.query.get would do
+        snapshot = db.session.query(User.id, User.username, User.email).filter(User.id == user_id).first()
+        if snapshot is None:
+            return None
+        snapshot = tuple(snapshot)
+        cache.set(user_id, snapshot)
+    return CachedUser(*snapshot)
+
+def invalidate_user(user_id):
+    """Drops a user's cache entry; call after committing a change to the user or their profile."""
+    if _cache is not None:
+        _cache.pop(int(user_id))
+
+@user_logged_in.connect
+def _remember_logged_in_user(sender, user):
+    # Logging in always refreshes the entry, so a stale snapshot never outlives a new session
+    _get_cache().set(user.id, (user.id, user.username, user.email))
@@ -1,8 +1,23 @@
+"""
+Seeds fitness and food entries for development and load testing.
+
+Run without arguments for the interactive prompts, or pass flags to load
+non-interactively in large batches:
+
+    python batch_insert_data.py --user-id 1 --start 2025-01-01 --end 2025-06-30
+    python batch_insert_data.py --sample-users --rows-per-day 3 --seed 42
+"""
+import argparse
 import datetime
 import random
+import sys
+import time
+from types import SimpleNamespace
+from sqlalchemy import insert
 from app import app, db
-from app.models import UserInfo, User
-from app.database import add_user_fitness_entry, upsert_user_food_entry, register_user
+from app.models import UserInfo, User, FitnessEntry
+from app.database import register_user, upsert_user_food_entries
+from app.rollups import track_entries
 
 # Sample data for generation
 sample_activities = [
@@ -19,92 +34,180 @@ sample_foods = [
 ]
 sample_meal_types = ["Breakfast", "Lunch", "Dinner", "Snack"]
 
+sample_usernames = ["David", "Emma", "Lucas", "Olivia", "Mason"]
+
+def generate_day(user_id, day, rng, rows_per_day=None):
+    """
+    Generates one day of entries for a user.
+    Args:
+        user_id (int): The ID of the user.
+        day (date): The entry date.
+        rng (random.Random): Source of randomness, seeded for repeatable loads.
+        rows_per_day (int, optional): Fitness entries per day; 1 to 3 at random when omitted.
+    Returns:
+        tuple: (fitness rows, food rows) as lists of column dicts. Food rows use
+        distinct meal types (2 to 4 per day), matching the (user, date, meal type) upsert key.
+    """
+    fitness_rows = []
+    for _ in range(rows_per_day or rng.randint(1, 3)):
+        fitness_rows.append({
+            'user_id': user_id,
+            'date': day,
+            'activity_type': rng.choice(sample_activities),
+            'duration': round(rng.uniform(15.0, 120.0), 1),  # Duration in minutes
+            'calories_burned': round(rng.uniform(50.0, 800.0), 1),
+            'emotion': rng.choice(sample_emotions)
+        })
+
+    food_rows = []
+    for meal_type in rng.sample(sample_meal_types, rng.randint(2, 4)):
+        food_rows.append({
+            'user_id': user_id,
+            'date': day,
+            'food_name': rng.choice(sample_foods),
+            'quantity': round(rng.uniform(50.0, 600.0), 1),  # Quantity in grams or ml
+            'calories': round(rng.uniform(50.0, 1000.0), 1),  # Calories for the food item
+            'meal_type': meal_type
+        })
+    return fitness_rows, food_rows
+
+def _write_batch(fitness_rows, food_rows):
+    # One executemany INSERT for fitness rows and one ON CONFLICT upsert for food rows
+    if fitness_rows:
+        db.session.execute(insert(FitnessEntry), fitness_rows)
+        track_entries(fitness_entries=[SimpleNamespace(**row) for row in fitness_rows])
+    _, replaced = upsert_user_food_entries(food_rows, commit=False)
+    written = len(fitness_rows) + len(food_rows)
+    fitness_rows.clear()
+    food_rows.clear()
+    return written, len(replaced)
+
+def bulk_load(user_ids, start_date, end_date, rows_per_day=None, seed=None, batch_size=5000, verbose=True):
+    """
+    Inserts generated entries for several users in large executemany batches.
+    Each user is loaded in one transaction, with daily rollups updated once per batch.
+    Food rows that hit an existing (user, date, meal type) entry replace it, as upsert_user_food_entry does.
+    Args:
+        user_ids (list[int]): Users to load; unknown IDs are reported and skipped.
+        start_date (date): First day to generate.
+        end_date (date): Last day to generate (inclusive).
+        rows_per_day (int, optional): Fitness entries per day; 1 to 3 at random when omitted.
+        seed (int, optional): RNG seed for a repeatable data set.
+        batch_size (int): Rows per executemany batch.
+        verbose (bool): Print a line per loaded user.
+    Returns:
+        tuple: (rows written, elapsed seconds)
+    """
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    total = 0
+
+    for user_id in user_ids:
+        if db.session.get(User, user_id) is None:
+            print(f"Error: User with ID {user_id} not found in the 'users' table. Skipping.")
+            continue
+
+        fitness_rows, food_rows = [], []
+        written = replaced = 0
+        try:
+            day = start_date
+            while day <= end_date:
+                day_fitness, day_food = generate_day(user_id, day, rng, rows_per_day)
+                fitness_rows.extend(day_fitness)
+                food_rows.extend(day_food)
+                if len(fitness_rows) + len(food_rows) >= batch_size:
+                    batch_written, batch_replaced = _write_batch(fitness_rows, food_rows)
+                    written += batch_written
+                    replaced += batch_replaced
+                day += datetime.timedelta(days=1)
+            batch_written, batch_replaced = _write_batch(fitness_rows, food_rows)
+            written += batch_written
+            replaced += batch_replaced
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error loading entries for user {user_id}: {e}")
+            continue
+
+        total += written
+        if verbose:
+            print(f"  User {user_id}: {written} rows ({replaced} meals replaced an earlier entry)")
+
+    return total, time.perf_counter() - started
+
+def report(total, elapsed):
+    rate = total / elapsed if elapsed else 0
+    print(f"Wrote {total} rows in {elapsed:.2f}s ({rate:,.0f} rows/s).")
+
 def create_batch_data(target_user_id, start_date, end_date):
     """
     Generates and inserts batch data for fitness and food entries for a specific user
     over a defined date range.
     """
     with app.app_context():
-        # Check if the target user exists in the User table
-        target_user_record = User.query.get(target_user_id)
-        if not target_user_record:
-            print(f"Error: User with ID {target_user_id} not found in the 'users' table.")
-            print("Please ensure a user with this ID exists in the 'users' table before running the script.")
-            return
-
-        print(f"Starting batch data insertion for User ID: {target_user_id} (Username: {target_user_record.username})")
-
-        delta = datetime.timedelta(days=1)
-        current_date = start_date
-        while current_date <= end_date:
-            print(f"Processing data for date: {current_date.strftime('%Y-%m-%d')}")
-
-            # 1. Add Fitness Entries (1 to 3 per day)
-            num_fitness_entries = random.randint(1, 3)
-            for i in range(num_fitness_entries):
-                activity = random.choice(sample_activities)
-                duration = round(random.uniform(15.0, 120.0), 1)  # Duration in minutes
-                calories_burned = round(random.uniform(50.0, 800.0), 1)
-                emotion = random.choice(sample_emotions)
-                
-                try:
-                    entry = add_user_fitness_entry(
-                        user_id=target_user_id,
-                        date_val=current_date,
-                        activity_type_val=activity,
-                        duration_val=duration,
-                        calories_burned_val=calories_burned,
-                        emotion_val=emotion
-                    )
-                    # print(f"  Added Fitness: {activity}, {duration}min, {calories_burned}kcal, Emotion: {emotion}")
-                except Exception as e:
-                    db.session.rollback()
-                    print(f"  Error adding fitness entry for {current_date}, {activity}: {e}")
-
-            # 2. Add Food Entries (2 to 4 per day, trying unique meal types)
-            num_food_entries = random.randint(2, 4)
-            
-            # Ensure we try to use distinct meal types for the day if possible
-            meal_types_for_day = random.sample(sample_meal_types, min(num_food_entries, len(sample_meal_types)))
-            
-            for i in range(num_food_entries):
-                if i >= len(meal_types_for_day):  # In case num_food_entries > len(sample_meal_types)
-                    meal_type = random.choice(sample_meal_types)  # Fallback to random if we need more entries than unique types
-                else:
-                    meal_type = meal_types_for_day[i]
-                
-                food_name = random.choice(sample_foods)
-                quantity = round(random.uniform(50.0, 600.0), 1)  # Quantity in grams or ml
-                calories = round(random.uniform(50.0, 1000.0), 1)  # Calories for the food item
-                
-                try:
-                    upsert_user_food_entry(
-                        user_id=target_user_id,
-                        date_val=current_date,
-                        food_name_val=food_name,
-                        quantity_val=quantity,
-                        calories_val=calories,
-                        meal_type_val=meal_type
-                    )
-                    # print(f"  Upserted Food: {meal_type} - {food_name}, {quantity}g/ml, {calories}kcal")
-                except Exception as e:
-                    db.session.rollback()
-                    print(f"  Error upserting food entry for {current_date}, {meal_type}, {food_name}: {e}")
-            
-            current_date += delta
-        
-        # The individual DB functions (add_user_fitness_entry, upsert_user_food_entry)
-        # already commit the session. So, a final commit here is not strictly necessary
-        # unless there are other operations outside those calls that need committing.
-        # However, it's good practice if you modify those functions later.
-        try:
-            db.session.commit()  # Commit any other potential changes if any
-            print("\nBatch data insertion process completed successfully.")
-        except Exception as e:
-            db.session.rollback()
-            print(f"\nAn error occurred during the final commit: {e}")
+        print(f"Starting batch data insertion for User ID: {target_user_id} ({start_date} to {end_date})")
+        report(*bulk_load([target_user_id], start_date, end_date))
+
+def ensure_sample_users():
+    """
+    Creates the sharing test users if they do not exist yet.
+    Returns:
+        list[User]: The sample users that exist after the call.
+    """
+    share_users = []
+    for uname in sample_usernames:
+        email = f"{uname.lower()}@example.com"
+        user = User.query.filter_by(username=uname).first()
+        if not user:
+            user = register_user(
+                username=uname,
+                email=email,
+                password="test1234",
+                gender="Other",
+                age=25,
+                height=170.0,
+                weight=65.0
+            )
+            if user:
+                print(f"Created user: ID: {user.id}  Username: {user.username}  Email: {user.email}")
+            else:
+                print(f"Failed to create user: {uname}")
+                continue
+        else:
+            print(f"User already exists: ID: {user.id}  Username: {user.username}  Email: {user.email}")
+        share_users.append(user)
+    return share_users
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--user-id', type=int, action='append', default=[], help='Load data for this user (repeatable).')
+    parser.add_argument('--sample-users', action='store_true', help='Create the sharing test users and load data for them too.')
+    parser.add_argument('--start', type=datetime.date.fromisoformat, default=datetime.date(2025, 1, 1), help='First day, YYYY-MM-DD (default: 2025-01-01).')
+    parser.add_argument('--end', type=datetime.date.fromisoformat, default=datetime.date(2025, 6, 30), help='Last day, YYYY-MM-DD (default: 2025-06-30).')
+    parser.add_argument('--rows-per-day', type=int, help='Fitness entries per user per day (default: 1 to 3 at random).')
+    parser.add_argument('--seed', type=int, help='RNG seed for a repeatable data set.')
+    parser.add_argument('--batch-size', type=int, default=5000, help='Rows per executemany batch (default: 5000).')
+    args = parser.parse_args(argv)
+    if not args.user_id and not args.sample_users:
+        parser.error('pass --user-id and/or --sample-users')
+    if args.end < args.start:
+        parser.error('--end must not be before --start')
+    return args
+
+def main(argv):
+    args = parse_args(argv)
+    with app.app_context():
+        user_ids = list(args.user_id)
+        if args.sample_users:
+            user_ids += [user.id for user in ensure_sample_users() if user.id not in user_ids]
+        print(f"Inserting data for users {user_ids} from {args.start} to {args.end} ...")
+        total, elapsed = bulk_load(user_ids, args.start, args.end, args.rows_per_day, args.seed, args.batch_size)
+        report(total, elapsed)
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        main(sys.argv[1:])
+        sys.exit(0)
     print("Script execution started...")
     with app.app_context():
         # Ask if user wants to insert data for an existing user
@@ -154,39 +257,10 @@ if __name__ == "__main__":
         # Ask if user wants to create sharing test users
         create_share_case = input("Do you want to create sharing test users and inject data? (Y/N): ").strip().lower()
         if create_share_case == 'y':
-            share_usernames = ["David", "Emma", "Lucas", "Olivia", "Mason"]
-            share_users = []
-            for uname in share_usernames:
-                email = f"{uname.lower()}@example.com"
-                user = User.query.filter_by(username=uname).first()
-                if not user:
-                    user = register_user(
-                        username=uname,
-                        email=email,
-                        password="test1234",
-                        gender="Other",
-                        age=25,
-                        height=170.0,
-                        weight=65.0
-                    )
-                    if user:
-                        print(f"Created user: ID: {user.id}  Username: {user.username}  Email: {user.email}")
-                    else:
-                        print(f"Failed to create user: {uname}")
-                        continue
-                else:
-                    print(f"User already exists: ID: {user.id}  Username: {user.username}  Email: {user.email}")
-                share_users.append(user)
-            year = 2025
-            for user in share_users:
-                for month in range(1, 7):
-                    start_date = datetime.date(year, month, 1)
-                    if month == 12:
-                        end_date = datetime.date(year, 12, 31)
-                    else:
-                        end_date = datetime.date(year, month + 1, 1) - datetime.timedelta(days=1)
-                    print(f"Injecting data for {user.username} from {start_date} to {end_date} ...")
-                    create_batch_data(user.id, start_date, end_date)
+            share_users = ensure_sample_users()
+            start_date, end_date = datetime.date(2025, 1, 1), datetime.date(2025, 6, 30)
+            print(f"Injecting data for {len(share_users)} users from {start_date} to {end_date} ...")
+            report(*bulk_load([user.id for user in share_users], start_date, end_date))
             print("Sharing test users and data injection completed.")
             print("User IDs and emails:")
             for user in share_users:
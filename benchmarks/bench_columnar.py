@@ -0,0 +1,127 @@
+"""
+Columnar cache against the SQL path for the analytics reads.
+
+Seeds a scratch SQLite file with --years of entries for one user (a fixed
+seed, so runs are comparable), then times, for several date windows:
+
+- frames: load_entry_frames(), the dashboard's input, from SQL and from
+  the memory-mapped columns;
+- records: the fitness API's entry lists, from ORM rows and from the
+  columns.
+
+It also reports a full cache build (the first read after a data_version
+change) and the append after an upload. Times are the median of --repeat
+runs with a warm cache and warm SQLite page cache.
+
+Usage:
+    python benchmarks/bench_columnar.py [--years 3] [--rows-per-day 3] [--repeat 20]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+# Allow imports from parent directory
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+scratch = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(scratch, 'bench.db')
+os.environ['COLUMNAR_CACHE_DIR'] = os.path.join(scratch, 'columnar')
+
+from app import app, db, columnar
+from app.analytics import load_entry_frames
+from app.models import User, FitnessEntry, FoodEntry
+from app.rollups import track_entries
+from batch_insert_data import bulk_load
+
+WINDOWS = [7, 30, 365, None]  # days; None is all time
+
+
+def median_ms(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def sql_records(user_id, start, end):
+    # The fitness API's ORM path
+    filters = lambda model: [model.user_id == user_id, model.date <= end] + ([model.date >= start] if start else [])
+    fitness = [
+        {'date': entry.date.isoformat(), 'activity_type': entry.activity_type, 'duration': entry.duration,
+         'calories_burned': entry.calories_burned, 'emotion': entry.emotion}
+        for entry in FitnessEntry.query.filter(*filters(FitnessEntry)).order_by(FitnessEntry.date, FitnessEntry.id)
+    ]
+    food = [
+        {'date': entry.date.isoformat(), 'food_name': entry.food_name, 'quantity': entry.quantity,
+         'calories': entry.calories, 'meal_type': entry.meal_type}
+        for entry in FoodEntry.query.filter(*filters(FoodEntry)).order_by(FoodEntry.date, FoodEntry.id)
+    ]
+    db.session.expunge_all()
+    return fitness, food
+
+
+def cached_records(user_id, start, end):
+    return (columnar.load_columns(user_id, 'fitness').window(start, end).records(
+                ('date', 'activity_type', 'duration', 'calories_burned', 'emotion')),
+            columnar.load_columns(user_id, 'food').window(start, end).records(
+                ('date', 'food_name', 'quantity', 'calories', 'meal_type')))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--years', type=int, default=3, help='Years of history for the user.')
+    parser.add_argument('--rows-per-day', type=int, default=3, help='Fitness entries per day.')
+    parser.add_argument('--repeat', type=int, default=20, help='Timed runs per measurement.')
+    args = parser.parse_args()
+
+    with app.app_context():
+        db.create_all()
+        user = User(username='bench', email='bench@example.com', password_hash='x')
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+        end = date.today()
+        total, _ = bulk_load([user_id], end - timedelta(days=365 * args.years - 1), end,
+                             rows_per_day=args.rows_per_day, seed=42, verbose=False)
+        print(f"Seeded {total} rows over {args.years} years\n")
+
+        app.config['COLUMNAR_CACHE'] = True
+        started = time.perf_counter()
+        columnar.load_columns(user_id, 'fitness')
+        columnar.load_columns(user_id, 'food')
+        build_ms = (time.perf_counter() - started) * 1000
+
+        print(f"{'window':<8} | {'read':<8} | {'sql ms':>8} | {'cache ms':>8} | {'speedup':>7}")
+        print('-' * 52)
+        for days in WINDOWS:
+            start = end - timedelta(days=days - 1) if days else None
+            label = f'{days}d' if days else 'all'
+            for read, run in (
+                ('frames', lambda cached: load_entry_frames(user_id, start, end)),
+                ('records', lambda cached: (cached_records if cached else sql_records)(user_id, start, end))
+            ):
+                app.config['COLUMNAR_CACHE'] = False
+                sql_ms = median_ms(lambda: run(False), args.repeat)
+                app.config['COLUMNAR_CACHE'] = True
+                cache_ms = median_ms(lambda: run(True), args.repeat)
+                print(f"{label:<8} | {read:<8} | {sql_ms:>8.2f} | {cache_ms:>8.2f} | {sql_ms / cache_ms:>6.1f}x")
+
+        # One upload's worth of rows, committed the way /upload does, then appended
+        entry = FitnessEntry(user_id=user_id, date=end, activity_type='Running', duration=30, calories_burned=300, emotion='Happy')
+        db.session.add(entry)
+        track_entries(fitness_entries=[entry])
+        db.session.commit()
+        started = time.perf_counter()
+        columnar.append_entries(user_id)
+        append_ms = (time.perf_counter() - started) * 1000
+        print(f"\nFull build (both tables): {build_ms:.1f} ms; append after an upload: {append_ms:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Transfer size and CPU cost of response compression on a one-year dataset.
+
+Seeds a scratch SQLite file with a year of entries for one user (a fixed
+seed, so runs are comparable), fetches the heaviest pages uncompressed,
+then compresses each body with every gzip level in --levels (and brotli
+qualities in --brotli when the brotli package is installed). Reported per
+page and setting: bytes on the wire, ratio against identity, and the
+median milliseconds of CPU spent compressing.
+
+Usage:
+    python benchmarks/bench_compression.py [--rows-per-day 3] [--levels 1,6,9] [--brotli 4,11] [--repeat 20]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+# Allow imports from parent directory
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+scratch = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(scratch, 'bench.db')
+
+from app import app, db, compression
+from app.models import User
+from batch_insert_data import bulk_load
+
+PAGES = [
+    '/visualise',
+    '/api/visualisation/fitness?days=365',
+    '/api/visualisation/ranking?time_range=year',
+    '/api/entries?type=fitness&limit=1000',
+]
+
+
+def cpu_ms(data, encoding, level, repeat):
+    config = dict(app.config, COMPRESS_LEVEL=level, COMPRESS_BROTLI_QUALITY=level)
+    samples = []
+    for _ in range(repeat):
+        started = time.process_time()
+        body = compression._compress(data, encoding, config)
+        samples.append((time.process_time() - started) * 1000)
+    return len(body), statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows-per-day', type=int, default=3, help='Fitness entries per day.')
+    parser.add_argument('--levels', default='1,6,9', help='Comma-separated gzip levels.')
+    parser.add_argument('--brotli', default='4,11', help='Comma-separated brotli qualities (needs brotli).')
+    parser.add_argument('--repeat', type=int, default=20, help='Compressions timed per setting.')
+    args = parser.parse_args()
+
+    app.config['WTF_CSRF_ENABLED'] = False
+    app.config['PASSWORD_HASH_ITERATIONS'] = 1000
+    with app.app_context():
+        db.create_all()
+        user = User(username='bench', email='bench@example.com')
+        user.set_password('Bench@1234')
+        db.session.add(user)
+        db.session.commit()
+        end = date.today()
+        total, _ = bulk_load([user.id], end - timedelta(days=364), end, rows_per_day=args.rows_per_day, seed=42)
+    print(f"Seeded {total} rows over 365 days\n")
+
+    settings = [('gzip', int(level)) for level in args.levels.split(',')]
+    if compression.brotli is not None:
+        settings += [('br', int(quality)) for quality in args.brotli.split(',')]
+    else:
+        print("brotli is not installed; gzip only\n")
+
+    client = app.test_client()
+    client.post('/login', data={'email': 'bench@example.com', 'password': 'Bench@1234'})
+    print(f"{'page':<44} | {'encoding':<8} | {'bytes':>9} | {'ratio':>6} | {'cpu ms':>7}")
+    print('-' * 86)
+    for page in PAGES:
+        data = client.get(page, headers={'Accept-Encoding': 'identity'}).get_data()
+        print(f"{page:<44} | {'identity':<8} | {len(data):>9} | {1:>6.2f} | {0:>7.2f}")
+        for encoding, level in settings:
+            size, ms = cpu_ms(data, encoding, level, args.repeat)
+            print(f"{'':<44} | {f'{encoding}-{level}':<8} | {size:>9} | {len(data) / size:>6.2f} | {ms:>7.2f}")
+
+
+if __name__ == '__main__':
+    main()
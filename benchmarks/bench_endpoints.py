@@ -0,0 +1,301 @@
+"""
+Endpoint benchmark suite over seeded datasets at several scales.
+
+Seeds a deterministic SQLite dataset: users with 1 to --years years of
+fitness and food entries each, plus a random share graph (some shares
+revoked). The seeded file is cached under instance/benchmarks/ (ignored by
+git and rebuilt from the seed when missing) and copied to a scratch file
+for every run, so the upload and delete requests of one run never leak
+into the next. Logged-in test clients for a sample of
+users that have incoming shares then drive every route through
+app.test_client(). Reported per route: p50/p95/p99 latency, SQL
+statements per request and the process's peak RSS once the route has run.
+Peak RSS includes seeding when the dataset was built in the same run, so
+compare RSS between runs on a cached dataset.
+
+Scales (users, max years per user):
+    small   10 users, up to 3 years      (seconds to seed)
+    medium  1000 users, up to 3 years    (a few minutes)
+    large   50000 users, up to 3 years   (hours and tens of GB; pass --years 1 to trim it)
+
+Usage:
+    python benchmarks/bench_endpoints.py [--scale small] [--requests 50] [--viewers 20]
+        [--output results.json] [--compare baseline.json] [--reseed]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+# Allow imports from parent directory
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+scratch = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(scratch, 'bench.db')
+
+from sqlalchemy import event, insert, text
+from werkzeug.security import generate_password_hash
+
+from app import app, db
+from app.models import User, ShareEntry
+from app.routes import category_map, time_map
+from batch_insert_data import bulk_load
+
+SCALES = {'small': (10, 3), 'medium': (1000, 3), 'large': (50000, 3)}
+PASSWORD = 'Bench@1234'
+HASH_ITERATIONS = 1000  # Login cost is bench_login.py's job; keep it out of these numbers
+CACHE_DIR = os.path.join(ROOT, 'instance', 'benchmarks')
+
+
+def seed_dataset(users, max_years, seed):
+    rng = random.Random(seed)
+    today = date.today()
+    password_hash = generate_password_hash(PASSWORD, f'pbkdf2:sha256:{HASH_ITERATIONS}')
+    db.create_all()
+    db.session.execute(insert(User), [
+        {'id': i, 'username': f'user{i}', 'email': f'user{i}@example.com', 'password_hash': password_hash}
+        for i in range(1, users + 1)
+    ])
+    db.session.commit()
+
+    rows = 0
+    for user_id in range(1, users + 1):
+        start = today - timedelta(days=365 * rng.randint(1, max_years) - 1)
+        rows += bulk_load([user_id], start, today, seed=seed * 1000003 + user_id, verbose=False)[0]
+        if user_id % 100 == 0:
+            print(f"  {user_id}/{users} users, {rows} rows")
+
+    # Up to 3 outgoing shares per user, a tenth of them revoked
+    shares, pairs = [], set()
+    for sharer in range(1, users + 1):
+        for _ in range(rng.randint(0, 3)):
+            sharee = rng.randint(1, users)
+            if sharee == sharer or (sharer, sharee) in pairs:
+                continue
+            pairs.add((sharer, sharee))
+            shares.append(ShareEntry(
+                sharer_user_id=sharer, sharee_user_id=sharee,
+                data_categories=','.join(sorted(rng.sample(list(category_map), rng.randint(1, len(category_map))))),
+                time_range=rng.choice(list(time_map)), shared_at=datetime.now(), is_active=rng.random() > 0.1
+            ))
+        if len(shares) >= 5000:
+            db.session.add_all(shares)
+            db.session.commit()
+            shares = []
+    db.session.add_all(shares)
+    db.session.commit()
+    return rows, len(pairs)
+
+
+def prepare_database(args, users, max_years):
+    """Copies the cached seed for this scale into the scratch database, seeding it first if needed."""
+    scratch_db = os.path.join(scratch, 'bench.db')
+    cached = os.path.join(CACHE_DIR, f'endpoints-{args.scale}-{users}u-{max_years}y-seed{args.seed}.db')
+    with app.app_context():
+        if args.reseed or not os.path.exists(cached):
+            print(f"Seeding {users} users (up to {max_years} years each) into {cached}")
+            started = time.perf_counter()
+            rows, shares = seed_dataset(users, max_years, args.seed)
+            print(f"Seeded {rows} entries and {shares} shares in {time.perf_counter() - started:.1f}s")
+            # Fold the WAL into the main file so a plain copy is complete
+            db.session.execute(text('PRAGMA wal_checkpoint(TRUNCATE)'))
+            db.session.commit()
+            db.session.remove()
+            db.engine.dispose()
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            shutil.copyfile(scratch_db, cached)
+        else:
+            db.engine.dispose()
+            shutil.copyfile(cached, scratch_db)
+        counts = {
+            table: db.session.execute(text(f'SELECT COUNT(*) FROM {table}')).scalar()
+            for table in ('users', 'fitness_entries', 'food_entries', 'share_entries')
+        }
+        db.session.remove()
+    return counts
+
+
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class Viewer:
+    """A logged-in test client plus the IDs its requests need."""
+
+    def __init__(self, user_id, incoming_shares, fitness_ids):
+        self.user_id = user_id
+        self.incoming_shares = incoming_shares
+        self.fitness_ids = fitness_ids
+        self.client = app.test_client()
+        response = self.client.post('/login', data={'email': f'user{user_id}@example.com', 'password': PASSWORD})
+        if response.status_code != 302:
+            raise RuntimeError(f"Login failed for user{user_id}: {response.status_code}")
+
+
+def pick_viewers(count, requests, seed):
+    rng = random.Random(seed)
+    with app.app_context():
+        incoming = {}
+        for share_id, sharee in db.session.execute(text(
+                'SELECT id, sharee_user_id FROM share_entries WHERE is_active = 1 ORDER BY id')):
+            incoming.setdefault(sharee, []).append(share_id)
+        chosen = rng.sample(sorted(incoming), min(count, len(incoming)))
+        per_viewer = requests // max(1, len(chosen)) + 2
+        fitness_ids = {
+            user_id: [row[0] for row in db.session.execute(text(
+                'SELECT id FROM fitness_entries WHERE user_id = :user_id ORDER BY date DESC LIMIT :limit'
+            ), {'user_id': user_id, 'limit': per_viewer})]
+            for user_id in chosen
+        }
+        db.session.remove()
+    return [Viewer(user_id, incoming[user_id], fitness_ids[user_id]) for user_id in chosen]
+
+
+def upload_form(rng):
+    return {
+        'date': (date.today() - timedelta(days=rng.randint(0, 29))).isoformat(), 'time': '07:30',
+        'gender': 'Other', 'age': '30', 'height': '175', 'weight': '70',
+        'activity_type': ['Running', 'Yoga'], 'duration': ['30', '20'], 'calories_burned': ['300', '80'],
+        'emotion': ['Happy', 'Relaxed'],
+        'food_name': ['Oatmeal'], 'food_quantity': ['100'], 'food_calories': ['250'],
+        'meal_type': [rng.choice(['Breakfast', 'Lunch', 'Dinner', 'Snack'])]
+    }
+
+
+def routes(rng):
+    """(name, function(viewer) -> response) for every route under test."""
+    return [
+        ('GET /visualise', lambda v: v.client.get('/visualise')),
+        ('GET /view_shared_data/<id>', lambda v: v.client.get(f'/view_shared_data/{rng.choice(v.incoming_shares)}')),
+        ('GET /api/visualisation/fitness', lambda v: v.client.get('/api/visualisation/fitness?days=30')),
+        ('GET /api/visualisation/dashboard', lambda v: v.client.get('/api/visualisation/dashboard')),
+        ('GET /api/visualisation/ranking', lambda v: v.client.get('/api/visualisation/ranking?time_range=month')),
+        ('GET /share', lambda v: v.client.get('/share')),
+        ('POST /upload', lambda v: v.client.post('/upload', data=upload_form(rng))),
+        ('DELETE /api/delete_entry', lambda v: v.client.delete(f'/api/delete_entry/fitness/{v.fitness_ids.pop()}')),
+    ]
+
+
+def run_route(name, call, viewers, args, statements):
+    latencies, queries, errors = [], [], 0
+    for i in range(args.warmup + args.requests):
+        viewer = viewers[i % len(viewers)]
+        before = statements[0]
+        started = time.perf_counter()
+        response = call(viewer)
+        elapsed = time.perf_counter() - started
+        if i < args.warmup:
+            continue
+        latencies.append(elapsed * 1000)
+        queries.append(statements[0] - before)
+        if response.status_code >= 400:
+            errors += 1
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'p50_ms': round(percentile(latencies, 0.50), 3),
+        'p95_ms': round(percentile(latencies, 0.95), 3),
+        'p99_ms': round(percentile(latencies, 0.99), 3),
+        'mean_ms': round(statistics.fmean(latencies), 3),
+        'queries_median': statistics.median(queries),
+        'queries_max': max(queries),
+        # ru_maxrss is KiB on Linux
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results, baseline):
+    header = f"{'route':<32} | {'p50 ms':>8} | {'p95 ms':>8} | {'p99 ms':>8} | {'queries':>7} | {'rss MB':>7} | {'errors':>6}"
+    if baseline:
+        header += f" | {'p95 vs base':>11}"
+    print(header)
+    print('-' * len(header))
+    for name, row in results['routes'].items():
+        line = (f"{name:<32} | {row['p50_ms']:>8.2f} | {row['p95_ms']:>8.2f} | {row['p99_ms']:>8.2f} | "
+                f"{row['queries_median']:>7g} | {row['peak_rss_mb']:>7.1f} | {row['errors']:>6}")
+        base = baseline['routes'].get(name) if baseline else None
+        if base:
+            line += f" | {(row['p95_ms'] / base['p95_ms'] - 1) * 100:>+10.1f}%"
+        elif baseline:
+            line += f" | {'n/a':>11}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small', help='Dataset size.')
+    parser.add_argument('--users', type=int, help='Override the number of users for the scale.')
+    parser.add_argument('--years', type=int, help='Override the maximum years of entries per user.')
+    parser.add_argument('--seed', type=int, default=42, help='Dataset and request RNG seed.')
+    parser.add_argument('--viewers', type=int, default=20, help='Logged-in users the requests rotate through.')
+    parser.add_argument('--requests', type=int, default=50, help='Measured requests per route.')
+    parser.add_argument('--warmup', type=int, default=3, help='Unmeasured requests per route.')
+    parser.add_argument('--routes', help='Comma-separated substrings; only matching routes run.')
+    parser.add_argument('--output', help='Write the results as JSON to this path.')
+    parser.add_argument('--compare', help='A previous --output file to compare p95 against.')
+    parser.add_argument('--reseed', action='store_true', help='Rebuild the cached dataset.')
+    args = parser.parse_args()
+
+    users, max_years = SCALES[args.scale]
+    users, max_years = args.users or users, args.years or max_years
+    app.config['WTF_CSRF_ENABLED'] = False
+    app.config['PASSWORD_HASH_ITERATIONS'] = HASH_ITERATIONS
+    counts = prepare_database(args, users, max_years)
+    print(f"Dataset: {counts}\n")
+
+    statements = [0]
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements[0] += 1
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', count_statement)
+
+    viewers = pick_viewers(args.viewers, args.warmup + args.requests, args.seed)
+    rng = random.Random(args.seed)
+    selected = [pattern.strip() for pattern in args.routes.split(',')] if args.routes else None
+    results = {
+        'meta': {
+            'scale': args.scale, 'users': users, 'max_years': max_years, 'seed': args.seed, 'dataset': counts,
+            'viewers': len(viewers), 'requests': args.requests, 'warmup': args.warmup, 'commit': git_commit(),
+            'python': platform.python_version(), 'platform': platform.platform(),
+            'started_at': datetime.now().isoformat(timespec='seconds')
+        },
+        'routes': {}
+    }
+    for name, call in routes(rng):
+        if selected and not any(pattern in name for pattern in selected):
+            continue
+        results['routes'][name] = run_route(name, call, viewers, args, statements)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nWrote {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Throughput and memory of the streaming CSV import.
+
+Writes a --rows line fitness CSV to a scratch directory (a fixed seed, with
+--error-rate of the rows deliberately invalid), then imports it for one
+user through import_entries_csv() with --chunk-size rows per chunk.
+Reported: file size, rows imported and rejected, rows per second, and the
+process's peak RSS before and after the import. The growth stays near one
+chunk's worth of objects whatever the file size. The wal SQLite profile's
+page cache and mmap also count towards RSS as the database grows, so run
+with SQLITE_PROFILE=default to see the importer's share alone.
+
+Usage:
+    SQLITE_PROFILE=default python benchmarks/bench_import.py [--rows 1000000] [--chunk-size 5000] [--error-rate 0.01]
+"""
+import argparse
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+# Allow imports from parent directory
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+scratch = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(scratch, 'bench.db')
+
+from app import app, db
+from app.importer import import_entries_csv
+from app.models import User
+from batch_insert_data import sample_activities, sample_emotions
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def write_csv(path, rows, error_rate, seed):
+    rng = random.Random(seed)
+    first_day = date.today() - timedelta(days=3649)
+    with open(path, 'w') as f:
+        f.write('date,activity_type,duration,calories_burned,emotion\n')
+        for i in range(rows):
+            day = (first_day + timedelta(days=i * 3650 // rows)).isoformat()  # Ten years in date order, like an export
+            duration = str(rng.randint(10, 120))
+            if rng.random() < error_rate:
+                duration = 'n/a'
+            f.write(f"{day},{rng.choice(sample_activities)},{duration},{rng.randint(50, 900)},{rng.choice(sample_emotions)}\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000, help='Data rows in the generated CSV.')
+    parser.add_argument('--chunk-size', type=int, default=5000, help='Rows per import chunk.')
+    parser.add_argument('--error-rate', type=float, default=0.01, help='Share of rows with an invalid duration.')
+    parser.add_argument('--seed', type=int, default=42, help='RNG seed for the generated file.')
+    args = parser.parse_args()
+
+    path = os.path.join(scratch, 'import.csv')
+    write_csv(path, args.rows, args.error_rate, args.seed)
+    print(f"Generated {args.rows} rows, {os.path.getsize(path) / 1e6:.1f} MB")
+
+    with app.app_context():
+        db.create_all()
+        user = User(username='bench', email='bench@example.com', password_hash='x')
+        db.session.add(user)
+        db.session.commit()
+
+        rss_before = peak_rss_mb()
+        started = time.perf_counter()
+        with open(path, 'rb') as f:
+            report = import_entries_csv(user.id, f, 'fitness', chunk_size=args.chunk_size)
+        elapsed = time.perf_counter() - started
+
+    print(f"Imported {report['imported']} rows, rejected {report['error_count']}, in {elapsed:.1f}s "
+          f"({report['rows_per_second']:,.0f} rows/s)")
+    print(f"Peak RSS {rss_before:.0f} MB before the import, {peak_rss_mb():.0f} MB after")
+
+
+if __name__ == '__main__':
+    main()
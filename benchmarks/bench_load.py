@@ -0,0 +1,353 @@
+"""
+Concurrent load generator with a mixed read/write traffic profile.
+
+Starts the app in a separate process on a threaded werkzeug server, using
+the cached bench_endpoints.py dataset for --scale (seeded on first use),
+then drives it over HTTP from --clients simulated users. Each simulated
+user logs in as one of the seeded accounts, then picks actions at random
+by the --mix weights and waits an exponentially distributed think time
+between them. Uploads and deletes write to the same SQLite file that the
+dashboard reads come from, so write-path contention shows up as latency,
+errors and "database is locked" timeouts.
+
+Reported: throughput and p50/p95/p99 latency per action, HTTP error rate,
+lock timeouts and other database errors (counted inside the server process,
+since /upload turns failures into a flash and a redirect), and a timeline
+in --interval second buckets. --output saves everything as JSON.
+
+Actions: login, visualise, dashboard, ranking, share, shared (a
+/view_shared_data page), upload, delete. Clients beyond the number of
+seeded accounts share logins, so two of them may race to delete the same
+entry and one gets a 404.
+
+Usage:
+    python benchmarks/bench_load.py [--scale small] [--clients 16] [--seconds 30]
+        [--mix visualise=30,dashboard=15,ranking=10,share=10,shared=5,upload=20,delete=5,login=5]
+        [--think-ms 200] [--ramp 2] [--output load.json]
+"""
+import argparse
+import http.client
+import json
+import logging
+import math
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+from urllib.parse import urlencode
+
+DEFAULT_MIX = 'visualise=30,dashboard=15,ranking=10,share=10,shared=5,upload=20,delete=5,login=5'
+READY_PREFIX = 'READY '
+
+
+def serve(args):
+    """Server process: prepare the dataset, then serve the app until terminated."""
+    # Importing bench_endpoints points DATABASE_URL at a scratch copy of the cached dataset
+    import bench_endpoints
+    from sqlalchemy import event, text
+    from werkzeug.serving import make_server
+    from flask import jsonify
+
+    app, db = bench_endpoints.app, bench_endpoints.db
+    # One access log line per request would drown the report
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    users, max_years = bench_endpoints.SCALES[args.scale]
+    app.config['WTF_CSRF_ENABLED'] = False
+    app.config['PASSWORD_HASH_ITERATIONS'] = bench_endpoints.HASH_ITERATIONS
+    bench_endpoints.prepare_database(argparse.Namespace(scale=args.scale, seed=args.seed, reseed=False), users, max_years)
+
+    db_errors = Counter()
+    errors_lock = threading.Lock()
+
+    def count_db_error(context):
+        message = str(context.original_exception)
+        kind = 'locked' if 'database is locked' in message else type(context.original_exception).__name__
+        with errors_lock:
+            db_errors[kind] += 1
+
+    with app.app_context():
+        event.listen(db.engine, 'handle_error', count_db_error)
+        accounts = [row[0] for row in db.session.execute(text('SELECT id FROM users ORDER BY id'))]
+        shares = defaultdict(list)
+        for share_id, sharee in db.session.execute(text(
+                'SELECT id, sharee_user_id FROM share_entries WHERE is_active = 1 ORDER BY id')):
+            shares[sharee].append(share_id)
+        db.session.remove()
+
+    @app.route('/_bench/db-errors')
+    def bench_db_errors():
+        with errors_lock:
+            return jsonify(dict(db_errors))
+
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    print(READY_PREFIX + json.dumps({'port': server.server_port, 'accounts': accounts, 'shares': shares}), flush=True)
+    server.serve_forever()
+
+
+class Client:
+    """One simulated browser: a cookie jar over short-lived HTTP connections."""
+
+    def __init__(self, port, timeout):
+        self.port = port
+        self.timeout = timeout
+        self.cookies = {}
+
+    def request(self, method, path, form=None):
+        headers = {}
+        body = None
+        if form is not None:
+            body = urlencode(form, doseq=True)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f'{name}={value}' for name, value in self.cookies.items())
+        conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=self.timeout)
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            data = response.read()
+            for header in response.headers.get_all('Set-Cookie') or []:
+                name, _, rest = header.partition('=')
+                value = rest.split(';', 1)[0]
+                if value and 'Expires=Thu, 01 Jan 1970' not in header:
+                    self.cookies[name] = value
+                else:
+                    self.cookies.pop(name, None)
+            return response.status, data
+        finally:
+            conn.close()
+
+
+class SimulatedUser(threading.Thread):
+
+    def __init__(self, index, account, shares, port, mix, args, started_at, stop, samples):
+        super().__init__(daemon=True)
+        self.account = account
+        self.shares = shares
+        self.client = Client(port, args.timeout)
+        self.mix = mix
+        self.args = args
+        self.started_at = started_at
+        self.stop = stop
+        self.samples = samples
+        self.rng = random.Random(args.seed * 7919 + index)
+        self.entry_ids = []
+        self.delay = args.ramp * index / max(1, args.clients)
+
+    def timed(self, action, method, path, form=None):
+        started = time.perf_counter()
+        try:
+            status, data = self.client.request(method, path, form)
+        except (OSError, http.client.HTTPException):
+            status, data = 0, b''
+        finished = time.perf_counter()
+        # list.append is atomic, so threads share one list without a lock
+        self.samples.append((finished - self.started_at, action, (finished - started) * 1000, status))
+        return status, data
+
+    def login(self):
+        return self.timed('login', 'POST', '/login', {'email': f'user{self.account}@example.com', 'password': 'Bench@1234'})
+
+    def upload(self):
+        meal = self.rng.choice(['Breakfast', 'Lunch', 'Dinner', 'Snack'])
+        return self.timed('upload', 'POST', '/upload', {
+            'date': (date.today() - timedelta(days=self.rng.randint(0, 29))).isoformat(), 'time': '07:30',
+            'gender': 'Other', 'age': '30', 'height': '175', 'weight': '70',
+            'activity_type': ['Running'], 'duration': [str(self.rng.randint(15, 90))],
+            'calories_burned': [str(self.rng.randint(100, 700))], 'emotion': ['Happy'],
+            'food_name': ['Oatmeal'], 'food_quantity': ['100'], 'food_calories': [str(self.rng.randint(100, 600))],
+            'meal_type': [meal]
+        })
+
+    def delete(self):
+        if not self.entry_ids:
+            status, data = self.timed('entries', 'GET', '/api/entries?type=fitness&limit=50')
+            if status == 200:
+                self.entry_ids = [entry['id'] for entry in json.loads(data)['entries']]
+            if not self.entry_ids:
+                return
+        return self.timed('delete', 'DELETE', f'/api/delete_entry/fitness/{self.entry_ids.pop()}')
+
+    def act(self, action):
+        if action == 'login':
+            self.login()
+        elif action == 'visualise':
+            self.timed(action, 'GET', '/visualise')
+        elif action == 'dashboard':
+            self.timed(action, 'GET', '/api/visualisation/dashboard')
+        elif action == 'ranking':
+            period = self.rng.choice(['week', 'month', 'year'])
+            self.timed(action, 'GET', f'/api/visualisation/ranking?time_range={period}')
+        elif action == 'share':
+            self.timed(action, 'GET', '/share')
+        elif action == 'shared':
+            if self.shares:
+                self.timed(action, 'GET', f'/view_shared_data/{self.rng.choice(self.shares)}')
+        elif action == 'upload':
+            self.upload()
+        elif action == 'delete':
+            self.delete()
+
+    def run(self):
+        if self.stop.wait(self.delay):
+            return
+        self.login()
+        actions, weights = zip(*self.mix.items())
+        while not self.stop.is_set():
+            self.act(self.rng.choices(actions, weights)[0])
+            if self.args.think_ms:
+                self.stop.wait(self.rng.expovariate(1000 / self.args.think_ms))
+
+
+def poll_db_errors(port, interval, started_at, stop, timeline):
+    client = Client(port, 10)
+    while not stop.wait(interval):
+        try:
+            status, data = client.request('GET', '/_bench/db-errors')
+            if status == 200:
+                timeline.append((time.perf_counter() - started_at, json.loads(data)))
+        except (OSError, http.client.HTTPException):
+            pass
+
+
+def percentiles(latencies):
+    latencies = sorted(latencies)
+    pick = lambda fraction: latencies[min(len(latencies) - 1, max(0, round(fraction * len(latencies)) - 1))]
+    return pick(0.50), pick(0.95), pick(0.99)
+
+
+def summarize(samples, db_error_polls, seconds, interval):
+    is_error = lambda status: status == 0 or status >= 400
+    actions = {}
+    for action in sorted({sample[1] for sample in samples}):
+        rows = [sample for sample in samples if sample[1] == action]
+        p50, p95, p99 = percentiles([sample[2] for sample in rows])
+        statuses = Counter(sample[3] for sample in rows)
+        actions[action] = {
+            'requests': len(rows), 'rps': round(len(rows) / seconds, 2),
+            'p50_ms': round(p50, 2), 'p95_ms': round(p95, 2), 'p99_ms': round(p99, 2),
+            'errors': sum(count for status, count in statuses.items() if is_error(status)),
+            'statuses': {str(status): count for status, count in sorted(statuses.items())}
+        }
+
+    timeline = []
+    previous = {}
+    polls = iter(db_error_polls)
+    poll = next(polls, None)
+    for bucket in range(math.ceil(seconds / interval)):
+        start, end = bucket * interval, (bucket + 1) * interval
+        rows = [sample for sample in samples if start <= sample[0] < end]
+        # Cumulative server counters: the last poll inside this bucket gives the delta
+        current = previous
+        while poll is not None and poll[0] < end:
+            current = poll[1]
+            poll = next(polls, None)
+        timeline.append({
+            'second': round(start, 1), 'requests': len(rows),
+            'errors': sum(1 for sample in rows if is_error(sample[3])),
+            'p95_ms': round(percentiles([sample[2] for sample in rows])[1], 1) if rows else None,
+            'lock_timeouts': current.get('locked', 0) - previous.get('locked', 0)
+        })
+        previous = current
+    return actions, timeline
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--scale', default='small', help='bench_endpoints.py dataset scale.')
+    parser.add_argument('--seed', type=int, default=42, help='Dataset and traffic RNG seed.')
+    parser.add_argument('--clients', type=int, default=16, help='Concurrent simulated users.')
+    parser.add_argument('--seconds', type=float, default=30, help='Measured duration.')
+    parser.add_argument('--ramp', type=float, default=2, help='Seconds over which simulated users start.')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='action=weight pairs.')
+    parser.add_argument('--think-ms', type=float, default=200, help='Mean think time between actions (0 for none).')
+    parser.add_argument('--timeout', type=float, default=30, help='HTTP timeout per request, seconds.')
+    parser.add_argument('--interval', type=float, default=5, help='Timeline bucket, seconds.')
+    parser.add_argument('--output', help='Write the results as JSON to this path.')
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args)
+        return
+
+    mix = {}
+    for pair in args.mix.split(','):
+        action, _, weight = pair.partition('=')
+        mix[action.strip()] = float(weight or 1)
+
+    server = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), '--serve', '--scale', args.scale, '--seed', str(args.seed)],
+        stdout=subprocess.PIPE, text=True
+    )
+    try:
+        for line in server.stdout:
+            if line.startswith(READY_PREFIX):
+                ready = json.loads(line[len(READY_PREFIX):])
+                break
+            print(line, end='')
+        else:
+            raise SystemExit("Server process exited before it was ready")
+        shares = {int(user_id): ids for user_id, ids in ready['shares'].items()}
+        accounts = ready['accounts']
+
+        started_at = time.perf_counter()
+        stop = threading.Event()
+        samples, db_error_polls = [], []
+        users = [
+            SimulatedUser(i, accounts[i % len(accounts)], shares.get(accounts[i % len(accounts)], []),
+                          ready['port'], mix, args, started_at, stop, samples)
+            for i in range(args.clients)
+        ]
+        poller = threading.Thread(target=poll_db_errors, args=(ready['port'], args.interval, started_at, stop, db_error_polls), daemon=True)
+        for thread in users + [poller]:
+            thread.start()
+        time.sleep(args.seconds)
+        stop.set()
+        for thread in users:
+            thread.join(args.timeout)
+        db_errors = json.loads(Client(ready['port'], 10).request('GET', '/_bench/db-errors')[1])
+        # Errors raised since the last poll belong to the final bucket
+        db_error_polls.append((args.seconds - 1e-6, db_errors))
+    finally:
+        server.terminate()
+        server.wait()
+
+    samples = [sample for sample in samples if sample[0] <= args.seconds]
+    actions, timeline = summarize(samples, db_error_polls, args.seconds, args.interval)
+    total = sum(row['requests'] for row in actions.values())
+    errors = sum(row['errors'] for row in actions.values())
+
+    print(f"\n{args.clients} clients for {args.seconds:g}s, think {args.think_ms:g} ms, mix {args.mix}\n")
+    print(f"{'action':<10} | {'reqs':>6} | {'req/s':>7} | {'p50 ms':>8} | {'p95 ms':>8} | {'p99 ms':>8} | {'errors':>6}")
+    print('-' * 70)
+    for action, row in actions.items():
+        print(f"{action:<10} | {row['requests']:>6} | {row['rps']:>7.1f} | {row['p50_ms']:>8.1f} | "
+              f"{row['p95_ms']:>8.1f} | {row['p99_ms']:>8.1f} | {row['errors']:>6}")
+    print(f"\nThroughput {total / args.seconds:.1f} req/s, HTTP errors {errors / max(1, total):.2%}, "
+          f"lock timeouts {db_errors.get('locked', 0)}, database errors {db_errors}")
+
+    print(f"\n{'t (s)':>6} | {'reqs':>6} | {'errors':>6} | {'p95 ms':>8} | {'locked':>6}")
+    print('-' * 44)
+    for row in timeline:
+        p95 = f"{row['p95_ms']:>8.1f}" if row['p95_ms'] is not None else f"{'-':>8}"
+        print(f"{row['second']:>6g} | {row['requests']:>6} | {row['errors']:>6} | {p95} | {row['lock_timeouts']:>6}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'config': {key: value for key, value in vars(args).items() if key != 'serve'},
+                'throughput_rps': round(total / args.seconds, 2),
+                'error_rate': round(errors / max(1, total), 4),
+                'db_errors': db_errors,
+                'actions': actions,
+                'timeline': timeline
+            }, f, indent=2)
+        print(f"\nWrote {args.output}")
+
+
+if __name__ == '__main__':
+    main()
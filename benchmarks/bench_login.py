@@ -0,0 +1,119 @@
+"""
+Login throughput under concurrency, with and without a bounded hashing pool.
+
+Starts the app on a threaded local server against a scratch SQLite file,
+then runs concurrent clients posting to /login. A probe thread fetches a
+cheap page (/privacy-policy) throughout to show how much the login burst
+slows unrelated routes. 'unbounded' gives the pool a worker per client
+and a deep queue, which approximates hashing inline on every request
+thread. 'bounded' uses the configured PASSWORD_HASH_WORKERS and
+PASSWORD_HASH_QUEUE.
+
+Usage:
+    python benchmarks/bench_login.py [--clients 32] [--seconds 5] [--iterations 600000]
+"""
+import argparse
+import http.client
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlencode
+
+# Allow imports from parent directory
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+scratch = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(scratch, 'bench.db')
+
+from werkzeug.serving import make_server
+
+from app import app, db, passwords
+from app.models import User
+
+LOGIN_BODY = urlencode({'email': 'bench@example.com', 'password': 'Bench@1234'})
+
+
+def request(port, method, path, body=None):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    headers = {'Content-Type': 'application/x-www-form-urlencoded'} if body else {}
+    started = time.perf_counter()
+    conn.request(method, path, body=body, headers=headers)
+    status = conn.getresponse().status
+    conn.close()
+    return status, time.perf_counter() - started
+
+
+def client(port, stop, latencies, statuses):
+    while not stop.is_set():
+        status, elapsed = request(port, 'POST', '/login', LOGIN_BODY)
+        statuses.append(status)
+        if status == 302:
+            latencies.append(elapsed)
+        elif status == 503:
+            time.sleep(1)  # Honour Retry-After
+
+
+def probe(port, stop, latencies):
+    while not stop.is_set():
+        latencies.append(request(port, 'GET', '/privacy-policy')[1])
+        time.sleep(0.05)
+
+
+def p95(values):
+    return statistics.quantiles(values, n=20)[-1] * 1000 if len(values) >= 2 else float('nan')
+
+
+def run(mode, workers, queue, args):
+    # Start each mode with a fresh pool sized for it
+    passwords._pool = None
+    app.config['PASSWORD_HASH_WORKERS'] = workers
+    app.config['PASSWORD_HASH_QUEUE'] = queue
+
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_port
+
+    stop = threading.Event()
+    login_latencies, statuses, probe_latencies = [], [], []
+    threads = [threading.Thread(target=client, args=(port, stop, login_latencies, statuses)) for _ in range(args.clients)]
+    threads.append(threading.Thread(target=probe, args=(port, stop, probe_latencies)))
+    for thread in threads:
+        thread.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    server.shutdown()
+
+    print(f"{mode:<9} | {workers:>7} | {len(login_latencies) / args.seconds:>8.1f} | {p95(login_latencies):>12.1f} | "
+          f"{statuses.count(503):>5} | {p95(probe_latencies):>12.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=32, help='Concurrent login clients.')
+    parser.add_argument('--seconds', type=float, default=5, help='Duration of each run.')
+    parser.add_argument('--iterations', type=int, default=app.config['PASSWORD_HASH_ITERATIONS'], help='PBKDF2 work factor.')
+    args = parser.parse_args()
+
+    app.config['WTF_CSRF_ENABLED'] = False
+    app.config['PASSWORD_HASH_ITERATIONS'] = args.iterations
+    with app.app_context():
+        db.create_all()
+        user = User(username='bench', email='bench@example.com')
+        user.set_password('Bench@1234')
+        db.session.add(user)
+        db.session.commit()
+
+    configured = (app.config['PASSWORD_HASH_WORKERS'], app.config['PASSWORD_HASH_QUEUE'])
+    print(f"{'mode':<9} | {'workers':>7} | {'logins/s':>8} | {'login p95 ms':>12} | {'503s':>5} | {'probe p95 ms':>12}")
+    print('-' * 70)
+    run('unbounded', args.clients, args.clients * 4, args)
+    run('bounded', *configured, args)
+
+
+if __name__ == '__main__':
+    main()
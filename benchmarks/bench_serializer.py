@@ -0,0 +1,111 @@
+"""
+Micro-benchmark: pandas DataFrame path vs. the cursor row serializer used by
+/visualise and /view_shared_data.
+
+Both paths read the same fitness_entries rows from a scratch SQLite file and
+produce the JSON text that ends up in the page. Latency is wall time for one
+full serialization; peak memory is the tracemalloc high-water mark of a
+separate traced run.
+
+Usage:
+    python benchmarks/bench_serializer.py [--sizes 1000,100000,1000000]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+# Allow imports from parent directory
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+from app.serializers import rows_to_json
+
+QUERY = "SELECT id, user_id, date, activity_type, duration, calories_burned, emotion FROM fitness_entries WHERE user_id = :user_id"
+ACTIVITIES = ["Running", "Cycling", "Swimming", "Yoga", "Walking", "HIIT"]
+EMOTIONS = ["Happy", "Tired", "Energized", "Okay", "Stressed", "Relaxed"]
+
+
+def seed(engine, rows):
+    rng = random.Random(42)
+    start = date(2020, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE fitness_entries (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, date DATE, "
+            "activity_type VARCHAR(64), duration FLOAT, calories_burned FLOAT, emotion VARCHAR(32))"
+        ))
+        conn.execute(text("CREATE INDEX ix_fitness_entries_user_id_date ON fitness_entries (user_id, date)"))
+        batch = []
+        for i in range(rows):
+            batch.append({
+                'user_id': 1,
+                'date': (start + timedelta(days=i * 3650 // rows)).isoformat(),  # spread over ten years
+                'activity_type': rng.choice(ACTIVITIES),
+                'duration': round(rng.uniform(15, 120), 1),
+                'calories_burned': round(rng.uniform(50, 800), 1),
+                'emotion': rng.choice(EMOTIONS)
+            })
+            if len(batch) == 50000:
+                conn.execute(text(
+                    "INSERT INTO fitness_entries (user_id, date, activity_type, duration, calories_burned, emotion) "
+                    "VALUES (:user_id, :date, :activity_type, :duration, :calories_burned, :emotion)"), batch)
+                batch = []
+        if batch:
+            conn.execute(text(
+                "INSERT INTO fitness_entries (user_id, date, activity_type, duration, calories_burned, emotion) "
+                "VALUES (:user_id, :date, :activity_type, :duration, :calories_burned, :emotion)"), batch)
+
+
+def pandas_path(conn):
+    # What the routes did before: DataFrame, reparsed dates, list of dicts, then |tojson
+    df = pd.read_sql_query(text(QUERY), conn, params={'user_id': 1})
+    df['date'] = pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d')
+    return json.dumps(df.to_dict(orient='records'))
+
+
+def serializer_path(conn):
+    return rows_to_json(conn.execute(text(QUERY), {'user_id': 1}), html_safe=True)
+
+
+def measure(func, conn):
+    # Time without tracemalloc (it slows allocation-heavy code), then trace a second run for memory
+    started = time.perf_counter()
+    payload = func(conn)
+    elapsed = time.perf_counter() - started
+    size = len(payload)
+    del payload
+    tracemalloc.start()
+    func(conn)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='1000,100000,1000000', help='Comma-separated row counts.')
+    args = parser.parse_args()
+
+    print(f"{'rows':>9} | {'path':<10} | {'latency (s)':>11} | {'peak mem (MiB)':>14} | {'payload (MiB)':>13}")
+    print('-' * 70)
+    for rows in [int(size) for size in args.sizes.split(',')]:
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = create_engine('sqlite:///' + os.path.join(tmp, 'bench.db'))
+            seed(engine, rows)
+            with engine.connect() as conn:
+                for name, func in (('pandas', pandas_path), ('serializer', serializer_path)):
+                    func(conn)  # warm the page cache
+                    elapsed, peak, size = measure(func, conn)
+                    print(f"{rows:>9} | {name:<10} | {elapsed:>11.3f} | {peak / 2**20:>14.1f} | {size / 2**20:>13.1f}")
+            engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""
+Read/write concurrency benchmark for the SQLite engine profiles in config.py.
+
+Each profile gets a scratch database seeded with fitness_entries. Reader
+threads repeatedly run the visualise-style aggregate over one user's rows
+while writer threads insert single entries, each in its own transaction,
+the way /upload does. Reported per profile: throughput, p95 latency and
+the number of "database is locked" errors.
+
+Usage:
+    python benchmarks/bench_sqlite_profile.py [--profiles default,wal] [--rows 200000]
+        [--readers 4] [--writers 2] [--seconds 5]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+# Allow imports from parent directory
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import OperationalError
+
+from app import apply_sqlite_pragmas
+from config import Config
+
+USERS = 20
+READ_QUERY = (
+    "SELECT activity_type, SUM(calories_burned), SUM(duration), COUNT(*) FROM fitness_entries "
+    "WHERE user_id = :user_id AND date >= :start GROUP BY activity_type"
+)
+WRITE_QUERY = (
+    "INSERT INTO fitness_entries (user_id, date, activity_type, duration, calories_burned, emotion) "
+    "VALUES (:user_id, :date, 'Running', 30, 300, 'Happy')"
+)
+
+
+def make_engine(path, pragmas):
+    engine = create_engine('sqlite:///' + path, pool_size=16, max_overflow=0)
+    event.listen(engine, 'connect', lambda dbapi_connection, record: apply_sqlite_pragmas(dbapi_connection, pragmas))
+    return engine
+
+
+def seed(engine, rows):
+    rng = random.Random(42)
+    start = date(2024, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE fitness_entries (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, date DATE, "
+            "activity_type VARCHAR(64), duration FLOAT, calories_burned FLOAT, emotion VARCHAR(32))"
+        ))
+        conn.execute(text("CREATE INDEX ix_fitness_entries_user_id_date ON fitness_entries (user_id, date)"))
+        conn.execute(text(
+            "INSERT INTO fitness_entries (user_id, date, activity_type, duration, calories_burned, emotion) "
+            "VALUES (:user_id, :date, :activity_type, :duration, :calories_burned, 'Happy')"
+        ), [{
+            'user_id': i % USERS + 1,
+            'date': (start + timedelta(days=rng.randint(0, 364))).isoformat(),
+            'activity_type': rng.choice(['Running', 'Cycling', 'Swimming', 'Yoga']),
+            'duration': rng.uniform(15, 120),
+            'calories_burned': rng.uniform(50, 800)
+        } for i in range(rows)])
+
+
+def worker(engine, write, stop, latencies, errors):
+    rng = random.Random()
+    while not stop.is_set():
+        params = {'user_id': rng.randint(1, USERS), 'start': '2024-01-01', 'date': '2024-12-31'}
+        started = time.perf_counter()
+        try:
+            if write:
+                with engine.begin() as conn:
+                    conn.execute(text(WRITE_QUERY), params)
+            else:
+                with engine.connect() as conn:
+                    conn.execute(text(READ_QUERY), params).fetchall()
+        except OperationalError:
+            errors.append(1)
+            continue
+        latencies.append(time.perf_counter() - started)
+
+
+def p95(values):
+    return statistics.quantiles(values, n=20)[-1] * 1000 if len(values) >= 2 else float('nan')
+
+
+def run(profile, args):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_engine(os.path.join(tmp, 'bench.db'), Config.SQLITE_PROFILES[profile])
+        seed(engine, args.rows)
+        stop = threading.Event()
+        results = {'read': ([], []), 'write': ([], [])}
+        threads = [
+            threading.Thread(target=worker, args=(engine, False, stop) + results['read'])
+            for _ in range(args.readers)
+        ] + [
+            threading.Thread(target=worker, args=(engine, True, stop) + results['write'])
+            for _ in range(args.writers)
+        ]
+        for thread in threads:
+            thread.start()
+        time.sleep(args.seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        engine.dispose()
+
+    reads, read_errors = results['read']
+    writes, write_errors = results['write']
+    print(f"{profile:<8} | {len(reads) / args.seconds:>7.1f} | {p95(reads):>11.1f} | "
+          f"{len(writes) / args.seconds:>8.1f} | {p95(writes):>12.1f} | {len(read_errors) + len(write_errors):>6}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--profiles', default='default,wal', help='Comma-separated SQLITE_PROFILES names.')
+    parser.add_argument('--rows', type=int, default=200000, help='Seed rows per database.')
+    parser.add_argument('--readers', type=int, default=4, help='Concurrent reader threads.')
+    parser.add_argument('--writers', type=int, default=2, help='Concurrent writer threads.')
+    parser.add_argument('--seconds', type=float, default=5, help='Duration of each run.')
+    args = parser.parse_args()
+
+    print(f"{'profile':<8} | {'reads/s':>7} | {'read p95 ms':>11} | {'writes/s':>8} | {'write p95 ms':>12} | {'errors':>6}")
+    print('-' * 70)
+    for profile in args.profiles.split(','):
+        run(profile, args)
+
+
+if __name__ == '__main__':
+    main()
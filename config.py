@@ -8,4 +8,81 @@ instance_path = os.path.join(basedir, 'instance')
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or os.urandom(24)
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///' + os.path.join(instance_path, 'fitness.db')
-    SQLALCHEMY_TRACK_MODIFICATIONS = False
\ No newline at end of file
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Connection pool shared by the ORM and the raw SQL reads in routes.py
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.environ.get('DB_POOL_MAX_OVERFLOW', 10)),
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 30)),  # seconds to wait for a free connection
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),  # seconds before a connection is replaced
+        'pool_pre_ping': True
+    }
+    # Keyset pagination for /api/entries and the first page embedded in visualise.html
+    ENTRIES_PAGE_SIZE = 200
+    ENTRIES_MAX_PAGE_SIZE = 1000
+    # SQLite pragmas applied to every new pooled connection; pick a profile with SQLITE_PROFILE.
+    # 'wal' lets the visualise readers run alongside upload writers instead of locking them out.
+    SQLITE_PROFILES = {
+        'default': {},  # SQLite's own settings (rollback journal)
+        'wal': {
+            'busy_timeout': 5000,  # ms to wait on a locked database before raising "database is locked"
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',  # Safe with WAL; only the last commits can be lost on power failure
+            'mmap_size': 268435456,  # 256 MiB of the file read through memory mapping
+            'cache_size': -65536,  # Negative means KiB, so 64 MiB of page cache per connection
+            'temp_store': 'MEMORY'
+        },
+        'durable': {
+            'busy_timeout': 5000,
+            'journal_mode': 'WAL',
+            'synchronous': 'FULL',
+            'mmap_size': 268435456,
+            'cache_size': -65536,
+            'temp_store': 'MEMORY'
+        }
+    }
+    SQLITE_PROFILE = os.environ.get('SQLITE_PROFILE', 'wal')
+    SQLITE_PRAGMAS = SQLITE_PROFILES[SQLITE_PROFILE]
+    # PBKDF2-SHA256 work factor; stored hashes with another count are upgraded on the next login
+    PASSWORD_HASH_ITERATIONS = int(os.environ.get('PASSWORD_HASH_ITERATIONS', 600000))
+    # Hashing pool threads, and how many more requests may wait before login answers 503
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', os.cpu_count() or 2))
+    PASSWORD_HASH_QUEUE = int(os.environ.get('PASSWORD_HASH_QUEUE', 16))
+    # Expiring store for pending registrations and password reset codes. 'sqlite' is shared by
+    # every worker process on the host; 'memory' is per process.
+    KV_STORE_BACKEND = os.environ.get('KV_STORE_BACKEND', 'sqlite')
+    KV_STORE_PATH = os.environ.get('KV_STORE_PATH') or os.path.join(instance_path, 'kvstore.db')
+    KV_STORE_MAX_ENTRIES = int(os.environ.get('KV_STORE_MAX_ENTRIES', 10000))
+    KV_STORE_SWEEP_INTERVAL = int(os.environ.get('KV_STORE_SWEEP_INTERVAL', 60))  # seconds
+    PENDING_REGISTRATION_TTL = 24 * 60 * 60  # seconds a verification link stays valid
+    VERIFICATION_CODE_TTL = 10 * 60  # seconds a reset code is kept; verify_code rejects it after 2 minutes
+    # Flask-Login user cache: entries per process and seconds before a cached user is re-read
+    USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', 1024))
+    USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL', 300))
+    # Byte budget of the per-process LRU of shared-data snapshots (view_shared_data); 0 disables it
+    SHARE_SNAPSHOT_CACHE_BYTES = int(os.environ.get('SHARE_SNAPSHOT_CACHE_BYTES', 64 * 1024 * 1024))
+    # Byte budget of the per-process LRU of rendered template fragments (cached_fragment); 0 disables it
+    FRAGMENT_CACHE_BYTES = int(os.environ.get('FRAGMENT_CACHE_BYTES', 16 * 1024 * 1024))
+    # Compiled templates are kept here, so a new worker loads bytecode instead of recompiling; empty disables it
+    JINJA_BYTECODE_CACHE_DIR = os.environ.get('JINJA_BYTECODE_CACHE_DIR', os.path.join(instance_path, 'jinja_cache'))
+    # Per-request Server-Timing header and JSON log line (wall, SQL and template time)
+    REQUEST_TIMING = os.environ.get('REQUEST_TIMING', '').lower() in ('1', 'true', 'yes')
+    # Response compression (gzip, or brotli when the brotli package is installed) for text bodies
+    COMPRESS_RESPONSES = os.environ.get('COMPRESS_RESPONSES', '1').lower() in ('1', 'true', 'yes')
+    COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))  # bytes; smaller bodies are sent as is
+    COMPRESS_LEVEL = int(os.environ.get('COMPRESS_LEVEL', 6))  # gzip, 1 (fastest) to 9 (smallest)
+    COMPRESS_BROTLI_QUALITY = int(os.environ.get('COMPRESS_BROTLI_QUALITY', 4))  # 0 to 11
+    COMPRESS_MIMETYPES = {
+        'text/html', 'text/css', 'text/plain', 'text/csv', 'text/javascript', 'application/javascript',
+        'application/json', 'application/x-ndjson', 'image/svg+xml'
+    }
+    # Rows fetched from the database cursor and serialized per chunk by /api/export
+    EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', 1000))
+    # CSV rows parsed, validated and committed together by /upload/import
+    IMPORT_CHUNK_SIZE = int(os.environ.get('IMPORT_CHUNK_SIZE', 5000))
+    # Per-user memory-mapped column files of the entry history for the dashboard and fitness APIs
+    COLUMNAR_CACHE = os.environ.get('COLUMNAR_CACHE', '').lower() in ('1', 'true', 'yes')
+    COLUMNAR_CACHE_DIR = os.environ.get('COLUMNAR_CACHE_DIR') or os.path.join(instance_path, 'columnar')
+    # In-memory SQLite runs on a single static connection, which takes no pool sizing
+    if SQLALCHEMY_DATABASE_URI in ('sqlite://', 'sqlite:///:memory:'):
+        SQLALCHEMY_ENGINE_OPTIONS = {}
@@ -0,0 +1,32 @@
+"""Composite (user_id, date) indexes for fitness and food entries
+
+Revision ID: 3a7c91e2d4b5
+Revises: f133bbd81d59
+Create Date: 2025-05-20 10:12:41.204318
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3a7c91e2d4b5'
+down_revision = 'f133bbd81d59'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('fitness_entries', schema=None) as batch_op:
+        batch_op.create_index('ix_fitness_entries_user_id_date', ['user_id', 'date'], unique=False)
+
+    with op.batch_alter_table('food_entries', schema=None) as batch_op:
+        batch_op.create_index('ix_food_entries_user_id_date_meal_type', ['user_id', 'date', 'meal_type'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('food_entries', schema=None) as batch_op:
+        batch_op.drop_index('ix_food_entries_user_id_date_meal_type')
+
+    with op.batch_alter_table('fitness_entries', schema=None) as batch_op:
+        batch_op.drop_index('ix_fitness_entries_user_id_date')
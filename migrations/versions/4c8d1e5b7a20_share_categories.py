@@ -0,0 +1,60 @@
+"""Normalized share_categories table for indexed permission lookups
+
+Revision ID: 4c8d1e5b7a20
+Revises: e2a9c4d7f310
+Create Date: 2025-05-24 16:05:38.407126
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4c8d1e5b7a20'
+down_revision = 'e2a9c4d7f310'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    share_categories = op.create_table('share_categories',
+    sa.Column('share_id', sa.Integer(), nullable=False),
+    sa.Column('category', sa.String(length=64), nullable=False),
+    sa.Column('sharee_user_id', sa.Integer(), nullable=False),
+    sa.Column('sharer_user_id', sa.Integer(), nullable=False),
+    sa.Column('is_active', sa.Boolean(), nullable=False),
+    sa.ForeignKeyConstraint(['share_id'], ['share_entries.id'], ),
+    sa.ForeignKeyConstraint(['sharee_user_id'], ['users.id'], ),
+    sa.ForeignKeyConstraint(['sharer_user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('share_id', 'category')
+    )
+    with op.batch_alter_table('share_categories', schema=None) as batch_op:
+        batch_op.create_index('ix_share_categories_sharee_active_category', ['sharee_user_id', 'is_active', 'category', 'sharer_user_id'], unique=False)
+
+    # Split the existing comma-joined data_categories into one row per category
+    share_entries = sa.table('share_entries',
+        sa.column('id', sa.Integer),
+        sa.column('sharer_user_id', sa.Integer),
+        sa.column('sharee_user_id', sa.Integer),
+        sa.column('data_categories', sa.String),
+        sa.column('is_active', sa.Boolean)
+    )
+    rows = []
+    for share in op.get_bind().execute(sa.select(share_entries)):
+        for category in sorted({category.strip() for category in share.data_categories.split(',') if category.strip()}):
+            rows.append({
+                'share_id': share.id,
+                'category': category,
+                'sharee_user_id': share.sharee_user_id,
+                'sharer_user_id': share.sharer_user_id,
+                'is_active': share.is_active
+            })
+    if rows:
+        op.bulk_insert(share_categories, rows)
+
+
+def downgrade():
+    with op.batch_alter_table('share_categories', schema=None) as batch_op:
+        batch_op.drop_index('ix_share_categories_sharee_active_category')
+
+    op.drop_table('share_categories')
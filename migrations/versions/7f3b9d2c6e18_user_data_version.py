@@ -0,0 +1,26 @@
+"""Per-user data_version for conditional GETs on the visualisation APIs
+
+Revision ID: 7f3b9d2c6e18
+Revises: 4c8d1e5b7a20
+Create Date: 2025-05-25 10:12:47.305512
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7f3b9d2c6e18'
+down_revision = '4c8d1e5b7a20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('data_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('data_version')
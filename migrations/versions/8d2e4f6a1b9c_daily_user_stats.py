@@ -0,0 +1,36 @@
+"""Daily per-user rollup table for the summary APIs
+
+Revision ID: 8d2e4f6a1b9c
+Revises: 3a7c91e2d4b5
+Create Date: 2025-05-21 14:03:17.552190
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d2e4f6a1b9c'
+down_revision = '3a7c91e2d4b5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing entries are backfilled with `flask rebuild-daily-stats`
+    op.create_table('daily_user_stats',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('calories_burned', sa.Float(), nullable=False),
+    sa.Column('calories_consumed', sa.Float(), nullable=False),
+    sa.Column('workout_minutes', sa.Float(), nullable=False),
+    sa.Column('fitness_entry_count', sa.Integer(), nullable=False),
+    sa.Column('food_entry_count', sa.Integer(), nullable=False),
+    sa.Column('activity_counts', sa.JSON(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'date')
+    )
+
+
+def downgrade():
+    op.drop_table('daily_user_stats')
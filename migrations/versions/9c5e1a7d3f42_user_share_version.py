@@ -0,0 +1,26 @@
+"""Per-user share_version for caches of share lists and shared profiles
+
+Revision ID: 9c5e1a7d3f42
+Revises: 7f3b9d2c6e18
+Create Date: 2025-05-27 09:41:03.118274
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c5e1a7d3f42'
+down_revision = '7f3b9d2c6e18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('share_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('share_version')
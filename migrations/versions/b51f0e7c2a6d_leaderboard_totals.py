@@ -0,0 +1,34 @@
+"""Per-user leaderboard totals for the ranking API
+
+Revision ID: b51f0e7c2a6d
+Revises: 8d2e4f6a1b9c
+Create Date: 2025-05-22 10:41:09.318274
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b51f0e7c2a6d'
+down_revision = '8d2e4f6a1b9c'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Rows are built from daily_user_stats the first time a user is ranked or writes an entry
+    op.create_table('leaderboard_totals',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('period', sa.String(length=10), nullable=False),
+    sa.Column('window_start', sa.Date(), nullable=False),
+    sa.Column('calories_burned', sa.Float(), nullable=False),
+    sa.Column('duration', sa.Float(), nullable=False),
+    sa.Column('activity_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'period')
+    )
+
+
+def downgrade():
+    op.drop_table('leaderboard_totals')
@@ -0,0 +1,50 @@
+"""Make (user_id, date, meal_type) unique on food entries
+
+Revision ID: e2a9c4d7f310
+Revises: b51f0e7c2a6d
+Create Date: 2025-05-23 09:27:44.861532
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2a9c4d7f310'
+down_revision = 'b51f0e7c2a6d'
+branch_labels = None
+depends_on = None
+
+
+# Every row but the newest of each (user_id, date, meal_type), i.e. what the upsert would have replaced
+DUPLICATE_MEALS = (
+    "meal_type IS NOT NULL AND id NOT IN ("
+    "SELECT id FROM (SELECT MAX(id) AS id FROM food_entries WHERE meal_type IS NOT NULL "
+    "GROUP BY user_id, date, meal_type) AS keep)"
+)
+
+
+def upgrade():
+    conn = op.get_bind()
+    # Take the removed rows back out of daily_user_stats. Each day keeps at least one row per meal, so no
+    # rollup row empties; leaderboard_totals only counts fitness entries and is unaffected.
+    removed = conn.execute(sa.text(
+        "SELECT user_id, date, COUNT(id) AS entries, COALESCE(SUM(calories), 0) AS calories "
+        "FROM food_entries WHERE " + DUPLICATE_MEALS + " GROUP BY user_id, date"
+    )).fetchall()
+    for row in removed:
+        conn.execute(sa.text(
+            "UPDATE daily_user_stats SET food_entry_count = food_entry_count - :entries, "
+            "calories_consumed = calories_consumed - :calories WHERE user_id = :user_id AND date = :date"
+        ), {'entries': row.entries, 'calories': row.calories, 'user_id': row.user_id, 'date': row.date})
+    op.execute("DELETE FROM food_entries WHERE " + DUPLICATE_MEALS)
+
+    with op.batch_alter_table('food_entries', schema=None) as batch_op:
+        batch_op.drop_index('ix_food_entries_user_id_date_meal_type')
+        batch_op.create_index('ix_food_entries_user_id_date_meal_type', ['user_id', 'date', 'meal_type'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('food_entries', schema=None) as batch_op:
+        batch_op.drop_index('ix_food_entries_user_id_date_meal_type')
+        batch_op.create_index('ix_food_entries_user_id_date_meal_type', ['user_id', 'date', 'meal_type'], unique=False)
@@ -78,6 +78,77 @@ document.addEventListener('DOMContentLoaded', () => {
   console.log("Effective start date:", window.effectiveStartDate);
   console.log("Effective end date:", window.effectiveEndDate);
 
+  // ---------- Entry Loading (keyset-paginated /api/entries) ----------
+  // The page ships only the first page of entries for its default window.
+  // Later pages are fetched only when the entries log is paged past the rows
+  // already loaded; the charts come from /api/visualisation/dashboard instead.
+  const ENTRY_PAGE_LIMIT = 1000;
+  let loadedWindow = window.entryWindow ? { ...window.entryWindow } : null;
+  let pendingCursors = window.entryCursors ? { ...window.entryCursors } : {};
+  let shownWindow = null;
+  let loadingMoreEntries = null;
+
+  async function fetchEntryPage(type, start, end, cursor) {
+    const params = new URLSearchParams({ type, limit: ENTRY_PAGE_LIMIT });
+    if (start) params.set('start_date', start);
+    if (end) params.set('end_date', end);
+    if (cursor) params.set('cursor', cursor);
+    if (window.shareId) params.set('share_id', window.shareId);
+
+    const response = await fetch(`/api/entries?${params.toString()}`);
+    if (!response.ok) {
+      throw new Error(`HTTP error! Status: ${response.status}`);
+    }
+    return response.json();
+  }
+
+  function hasMoreEntries() {
+    return Boolean(pendingCursors.fitness || pendingCursors.food);
+  }
+
+  // Make sure window.rawData / window.foodData start with the newest entries between start and end
+  async function ensureEntriesLoaded(start, end) {
+    const sameWindow = loadedWindow && loadedWindow.start === start && loadedWindow.end === end;
+    // A narrower window can reuse the loaded rows only once they are complete
+    const covered = loadedWindow && !hasMoreEntries() &&
+      (!loadedWindow.start || start >= loadedWindow.start) &&
+      (!loadedWindow.end || end <= loadedWindow.end);
+    if (sameWindow || covered) return;
+
+    const [fitnessPage, foodPage] = await Promise.all([
+      fetchEntryPage('fitness', start, end, null),
+      fetchEntryPage('food', start, end, null)
+    ]);
+    window.rawData = fitnessPage.entries;
+    window.foodData = foodPage.entries;
+    loadedWindow = { start, end };
+    pendingCursors = { fitness: fitnessPage.next_cursor, food: foodPage.next_cursor };
+  }
+
+  // Append the next page of each entry type and refresh the log, keeping the current log page
+  function loadMoreEntries() {
+    if (!hasMoreEntries()) return Promise.resolve();
+    if (!loadingMoreEntries) {
+      const requestedWindow = loadedWindow;
+      const targets = { fitness: window.rawData, food: window.foodData };
+      loadingMoreEntries = Promise.all(Object.keys(targets).map(async type => {
+        if (!pendingCursors[type]) return;
+        const page = await fetchEntryPage(type, requestedWindow.start, requestedWindow.end, pendingCursors[type]);
+        // A different window was picked while this page was in flight
+        if (loadedWindow !== requestedWindow) return;
+        targets[type].push(...page.entries);
+        pendingCursors[type] = page.next_cursor;
+      }))
+        .then(() => {
+          refreshCombinedData();
+          renderDataEntriesLog();
+        })
+        .catch(error => console.error("Error loading entries:", error))
+        .finally(() => { loadingMoreEntries = null; });
+    }
+    return loadingMoreEntries;
+  }
+
   // ---------- Utility Functions ----------
   function getToday() {
     return new Date().toISOString().slice(0, 10);
@@ -89,14 +160,16 @@ document.addEventListener('DOMContentLoaded', () => {
     return date.toISOString().slice(0, 10);
   }
 
-  // Group data by date and sum the target key (e.g., calories or duration)
-  function groupData(data, key) {
-    const result = {};
-    data.forEach(entry => {
-      const date = entry.date;
-      result[date] = (result[date] || 0) + (entry[key] || 0);
-    });
-    return result;
+  // Chart numbers for a window, aggregated server-side by /api/visualisation/dashboard
+  async function fetchDashboardMetrics(start, end) {
+    const params = new URLSearchParams({ start_date: start, end_date: end });
+    if (window.shareId) params.set('share_id', window.shareId);
+
+    const response = await fetch(`/api/visualisation/dashboard?${params.toString()}`);
+    if (!response.ok) {
+      throw new Error(`HTTP error! Status: ${response.status}`);
+    }
+    return response.json();
   }
 
   // ---------- Detailed Data Log Functions ----------
@@ -120,6 +193,15 @@ document.addEventListener('DOMContentLoaded', () => {
     return combined.sort((a, b) => new Date(b.date) - new Date(a.date));
   }
 
+  // Rebuild the log rows from the loaded entries within the window on show
+  function refreshCombinedData() {
+    if (!shownWindow) return;
+    const { start, end } = shownWindow;
+    const filteredFitness = window.rawData.filter(row => row.date >= start && row.date <= end);
+    const filteredFood = window.foodData.filter(row => row.date >= start && row.date <= end);
+    combinedData = combineAndSortData(filteredFitness, filteredFood);
+  }
+
   function renderDataEntriesLog() {
     if (!dataEntriesLogContainer) return;
 
@@ -231,6 +313,10 @@ document.addEventListener('DOMContentLoaded', () => {
         currentPage++;
         renderDataEntriesLog();
       }
+      // Reaching the last loaded page pulls in the next page of entries
+      if (currentPage === totalPages) {
+        loadMoreEntries();
+      }
     });
     dataEntriesPaginationContainer.appendChild(nextButton);
   }
@@ -280,8 +366,35 @@ document.addEventListener('DOMContentLoaded', () => {
     }
   }
 
+  // ---------- Summary Card ----------
+  function renderSummaryCard(totalCalories, totalTime, calorieGap) {
+    const summaryContentDiv = document.getElementById('summary-content');
+    if (summaryContentDiv) {
+      summaryContentDiv.innerHTML = `
+        <div class="grid grid-cols-1 md:grid-cols-3 gap-6 mb-6">
+          <!-- Total Calories Burned Card -->
+          <div class="flex flex-col items-center justify-center p-6 bg-sky-100 dark:bg-sky-700 rounded-xl shadow-lg transform hover:scale-105 transition-transform duration-300">
+            <p class="text-sm font-medium text-sky-600 dark:text-sky-300 uppercase tracking-wider">Calories Burned</p>
+            <p class="text-3xl font-bold text-sky-800 dark:text-sky-100 mt-1">${totalCalories.toLocaleString()} kcal</p>
+          </div>
+
+          <!-- Total Workout Time Card -->
+          <div class="flex flex-col items-center justify-center p-6 bg-emerald-100 dark:bg-emerald-700 rounded-xl shadow-lg transform hover:scale-105 transition-transform duration-300">
+            <p class="text-sm font-medium text-emerald-600 dark:text-emerald-300 uppercase tracking-wider">Workout Time</p>
+            <p class="text-3xl font-bold text-emerald-800 dark:text-emerald-100 mt-1">${totalTime.toLocaleString()} mins</p>
+          </div>
+
+          <div class="flex flex-col items-center justify-center p-6 ${calorieGap <= 0 ? 'bg-teal-100 dark:bg-teal-700' : 'bg-rose-100 dark:bg-rose-700'} rounded-xl shadow-lg transform hover:scale-105 transition-transform duration-300">
+            <p class="text-sm font-medium ${calorieGap <= 0 ? 'text-teal-600 dark:text-teal-300' : 'text-rose-600 dark:text-rose-300'} uppercase tracking-wider">Calorie Balance</p>
+            <p class="text-3xl font-bold ${calorieGap <= 0 ? 'text-teal-800 dark:text-teal-100' : 'text-rose-800 dark:text-rose-100'} mt-1">${calorieGap.toLocaleString()} kcal</p>
+          </div>
+        </div>
+      `;
+    }
+  }
+
   // ---------- Main Dashboard Update Function ----------
-  function updateDashboard() {
+  async function updateDashboard() {
     let start = startDateInput.value;
     let end = endDateInput.value;
 
@@ -309,71 +422,31 @@ document.addEventListener('DOMContentLoaded', () => {
     if (!start) start = getNDaysAgo(6);
     if (!end) end = getToday();
 
-    // Filter records within the selected date range
-    const filteredFitness = window.rawData.filter(row => row.date >= start && row.date <= end);
-    const filteredFood = window.foodData.filter(row => row.date >= start && row.date <= end);
-
-    // Aggregate data
-    const groupedDuration = groupData(filteredFitness, 'duration');
-    const groupedBurned = groupData(filteredFitness, 'calories_burned');
-    const groupedIntake = groupData(filteredFood, 'calories');
-
-    // Merge and sort all dates
-    const allDates = Array.from(new Set([
-      ...Object.keys(groupedDuration),
-      ...Object.keys(groupedBurned),
-      ...Object.keys(groupedIntake)
-    ])).sort();
-
-    const durations = allDates.map(date => groupedDuration[date] || 0);
-    const calories = allDates.map(date => groupedBurned[date] || 0);
-    const intake = allDates.map(date => groupedIntake[date] || 0);
-    const gaps = allDates.map((_, i) => intake[i] - calories[i]);
-
-    // Count activity types
-    const typeCounts = {};
-    filteredFitness.forEach(entry => {
-      if (entry.activity_type) {
-        typeCounts[entry.activity_type] = (typeCounts[entry.activity_type] || 0) + 1;
-      }
-    });
+    // Charts come from the server-side aggregates; the rows are only needed for the entries log
+    let metrics;
+    try {
+      [metrics] = await Promise.all([
+        fetchDashboardMetrics(start, end),
+        ensureEntriesLoaded(start, end).catch(error => console.error("Error loading entries:", error))
+      ]);
+    } catch (error) {
+      console.error("Error loading dashboard metrics:", error);
+      return;
+    }
 
-    // Summary totals
-    const totalWorkouts = filteredFitness.length;
-    const totalTime = durations.reduce((sum, d) => sum + d, 0);
-    const totalCalories = calories.reduce((sum, c) => sum + c, 0);
-    const totalIntake = intake.reduce((sum, c) => sum + c, 0);
-    const calorieGap = totalIntake - totalCalories;
+    const allDates = metrics.dates;
+    const durations = metrics.daily.duration;
+    const calories = metrics.daily.calories_burned;
+    const intake = metrics.daily.calories_consumed;
 
     // Update combined data for the log
-    combinedData = combineAndSortData(filteredFitness, filteredFood);
+    shownWindow = { start, end };
+    refreshCombinedData();
     currentPage = 1; // Reset to first page on filter change
     renderDataEntriesLog();
 
     // ---------- Update Summary Card ----------
-    const summaryContentDiv = document.getElementById('summary-content');
-    if (summaryContentDiv) {
-      summaryContentDiv.innerHTML = `
-        <div class="grid grid-cols-1 md:grid-cols-3 gap-6 mb-6">
-          <!-- Total Calories Burned Card -->
-          <div class="flex flex-col items-center justify-center p-6 bg-sky-100 dark:bg-sky-700 rounded-xl shadow-lg transform hover:scale-105 transition-transform duration-300">
-            <p class="text-sm font-medium text-sky-600 dark:text-sky-300 uppercase tracking-wider">Calories Burned</p>
-            <p class="text-3xl font-bold text-sky-800 dark:text-sky-100 mt-1">${totalCalories.toLocaleString()} kcal</p>
-          </div>
-
-          <!-- Total Workout Time Card -->
-          <div class="flex flex-col items-center justify-center p-6 bg-emerald-100 dark:bg-emerald-700 rounded-xl shadow-lg transform hover:scale-105 transition-transform duration-300">
-            <p class="text-sm font-medium text-emerald-600 dark:text-emerald-300 uppercase tracking-wider">Workout Time</p>
-            <p class="text-3xl font-bold text-emerald-800 dark:text-emerald-100 mt-1">${totalTime.toLocaleString()} mins</p>
-          </div>
-
-          <div class="flex flex-col items-center justify-center p-6 ${calorieGap <= 0 ? 'bg-teal-100 dark:bg-teal-700' : 'bg-rose-100 dark:bg-rose-700'} rounded-xl shadow-lg transform hover:scale-105 transition-transform duration-300">
-            <p class="text-sm font-medium ${calorieGap <= 0 ? 'text-teal-600 dark:text-teal-300' : 'text-rose-600 dark:text-rose-300'} uppercase tracking-wider">Calorie Balance</p>
-            <p class="text-3xl font-bold ${calorieGap <= 0 ? 'text-teal-800 dark:text-teal-100' : 'text-rose-800 dark:text-rose-100'} mt-1">${calorieGap.toLocaleString()} kcal</p>
-          </div>
-        </div>
-      `;
-    }
+    renderSummaryCard(metrics.summary.calories_burned, metrics.summary.workout_minutes, metrics.summary.calorie_gap);
 
     // ---------- Charts Section ----------
 
@@ -462,11 +535,7 @@ document.addEventListener('DOMContentLoaded', () => {
 
     // Line Chart: Calorie Burn Efficiency (Calories per Minute)
     if (ctxCaloriesEfficiency) {
-      const efficiencyData = allDates.map(date => {
-        const duration = groupedDuration[date] || 0;
-        const calories = groupedBurned[date] || 0;
-        return duration > 0 ? calories / duration : 0; // Calculate calories per minute
-      });
+      const efficiencyData = metrics.daily.calories_per_minute;
 
       caloriesEfficiencyChart = new Chart(ctxCaloriesEfficiency, {
         type: 'line',
@@ -504,36 +573,8 @@ document.addEventListener('DOMContentLoaded', () => {
 
     // Intensity Chart (Activity Intensity Analysis)
     if (ctxIntensity) {
-      // Calculate intensity (calories/minute) for each activity type
-      const intensityData = [];
-      const activityTypes = Object.keys(typeCounts);
-      
-      activityTypes.forEach(type => {
-        const activities = filteredFitness.filter(entry => entry.activity_type === type);
-        let totalCalories = 0;
-        let totalDuration = 0;
-        
-        activities.forEach(activity => {
-          totalCalories += (activity.calories_burned || 0);
-          totalDuration += (activity.duration || 0);
-        });
-        
-        // Calculate intensity (calories/minute)
-        const intensity = totalDuration > 0 ? totalCalories / totalDuration : 0;
-        
-        intensityData.push({
-          type: type,
-          intensity: intensity,
-          count: activities.length,
-          totalCalories: totalCalories
-        });
-      });
-      
-      // Sort by intensity
-      intensityData.sort((a, b) => b.intensity - a.intensity);
-
-      // Slice to get top 10 records
-      const top10IntensityData = intensityData.slice(0, 10);
+      // Top 10 activity types by calories per minute
+      const top10IntensityData = metrics.intensity;
       
       // Create chart data
       const labels = top10IntensityData.map(item => item.type);
@@ -578,7 +619,7 @@ document.addEventListener('DOMContentLoaded', () => {
                   const index = context.dataIndex;
                   const item = top10IntensityData[index]; // Use top10IntensityData here
                   return [
-                    `Total Calories: ${item.totalCalories.toFixed(0)}`,
+                    `Total Calories: ${item.total_calories.toFixed(0)}`,
                     `Sessions: ${item.count}`
                   ];
                 }
@@ -591,27 +632,10 @@ document.addEventListener('DOMContentLoaded', () => {
     
     // Performance Radar Chart
     if (ctxPerformance) {
-      // Calculate performance metrics
-      const metrics = {
-        'Consistency': calculateConsistency(filteredFitness, allDates),
-        'Duration': calculateAverageDuration(filteredFitness),
-        'Intensity': calculateAverageIntensity(filteredFitness),
-        'Frequency': Math.min(Object.keys(typeCounts).length, 10),
-        'Diversity': calculateDiversityScore(filteredFitness)
-      };
-      
-      // Normalize metrics (0-100)
-      const maxValues = {
-        'Consistency': 100,
-        'Duration': 120, // 2-hour workout is considered excellent
-        'Intensity': 15, // 15 calories per minute is high intensity
-        'Frequency': 10, // 10 different activities is diverse
-        'Diversity': 10  // 10 different activity types is very diverse
-      };
-      
+      // Each metric is already scored 0-100 against its benchmark
       const normalizedMetrics = {};
-      Object.keys(metrics).forEach(key => {
-        normalizedMetrics[key] = Math.min(100, (metrics[key] / maxValues[key]) * 100);
+      metrics.performance.forEach(item => {
+        normalizedMetrics[item.metric] = item.score;
       });
       
       // Create radar chart data
@@ -666,14 +690,14 @@ document.addEventListener('DOMContentLoaded', () => {
           datasets: [
             {
               label: 'Calories Consumed',
-              data: allDates.map(date => groupedIntake[date] || 0),
+              data: intake,
               backgroundColor: 'rgba(255, 99, 132, 0.7)',
               borderColor: 'rgb(255, 99, 132)',
               borderWidth: 1
             },
             {
               label: 'Calories Burned',
-              data: allDates.map(date => groupedBurned[date] || 0),
+              data: calories,
               backgroundColor: 'rgba(75, 192, 192, 0.7)',
               borderColor: 'rgb(75, 192, 192)',
               borderWidth: 1
@@ -697,32 +721,16 @@ document.addEventListener('DOMContentLoaded', () => {
     }
 
     // Nutrition Chart (if we have food data)
-    if (ctxNutrition && filteredFood.length > 0) {
-      // Group meals by type
-      const mealTypes = ['Breakfast', 'Lunch', 'Dinner', 'Snack'];
-      const mealData = {};
-      
-      mealTypes.forEach(type => {
-        mealData[type] = {
-          count: 0,
-          calories: 0
-        };
-      });
-      
-      filteredFood.forEach(entry => {
-        const mealType = entry.meal_type || 'Snack';
-        const type = mealTypes.includes(mealType) ? mealType : 'Snack';
-        
-        mealData[type].count += 1;
-        mealData[type].calories += (entry.calories || 0);
-      });
+    if (ctxNutrition && metrics.summary.food_entries > 0) {
+      // Calories per meal type; missing or unknown meal types count as snacks
+      const mealTypes = metrics.meals.map(item => item.meal_type);
       
       nutritionChart = new Chart(ctxNutrition, {
         type: 'polarArea',
         data: {
           labels: mealTypes,
           datasets: [{
-            data: mealTypes.map(type => mealData[type].calories),
+            data: metrics.meals.map(item => item.calories),
             backgroundColor: [
               'rgba(255, 99, 132, 0.7)',
               'rgba(54, 162, 235, 0.7)',
@@ -746,15 +754,8 @@ document.addEventListener('DOMContentLoaded', () => {
 
     // Emotion Chart (if we have emotion data)
     if (ctxEmotion) {
-      const emotionCounts = {};
-      filteredFitness.forEach(entry => {
-        if (entry.emotion) {
-          emotionCounts[entry.emotion] = (emotionCounts[entry.emotion] || 0) + 1;
-        }
-      });
-      
-      const emotionLabels = Object.keys(emotionCounts);
-      const emotionData = Object.values(emotionCounts);
+      const emotionLabels = metrics.emotions.map(item => item.emotion);
+      const emotionData = metrics.emotions.map(item => item.count);
       
       if (emotionLabels.length > 0) {
         emotionChart = new Chart(ctxEmotion, {
@@ -788,7 +789,7 @@ document.addEventListener('DOMContentLoaded', () => {
 
     // Goal Progress Chart
     if (ctxGoal) {
-      initGoalProgressChart(filteredFitness);
+      initGoalProgressChart(metrics.goals);
     }
   }
 
@@ -811,6 +812,15 @@ document.addEventListener('DOMContentLoaded', () => {
   // Apply button listener
   applyButton.addEventListener('click', updateDashboard);
 
+  // Show the server-side summary straight away, then page in entries and draw the charts
+  if (window.entrySummary) {
+    renderSummaryCard(
+      window.entrySummary.calories_burned,
+      window.entrySummary.workout_minutes,
+      window.entrySummary.calories_consumed - window.entrySummary.calories_burned
+    );
+  }
+
   // First load
   updateDashboard();
 
@@ -953,121 +963,16 @@ document.addEventListener('DOMContentLoaded', () => {
     }
   }
   
-  // Helper function: Calculate consistency (percentage of days with activity)
-  function calculateConsistency(fitnessData, allDates) {
-    if (fitnessData.length === 0 || allDates.length === 0) return 0;
-    
-    // Get dates with activity
-    const activeDates = new Set(fitnessData.map(entry => entry.date));
-    
-    // Calculate consistency percentage
-    return (activeDates.size / allDates.length) * 100;
-  }
-  
-  // Helper function: Calculate average duration
-  function calculateAverageDuration(fitnessData) {
-    if (fitnessData.length === 0) return 0;
-    
-    const totalDuration = fitnessData.reduce((sum, entry) => sum + (entry.duration || 0), 0);
-    return totalDuration / fitnessData.length;
-  }
-  
-  // Helper function: Calculate average intensity
-  function calculateAverageIntensity(fitnessData) {
-    if (fitnessData.length === 0) return 0;
-    
-    let totalCalories = 0;
-    let totalDuration = 0;
-    
-    fitnessData.forEach(entry => {
-      totalCalories += (entry.calories_burned || 0);
-      totalDuration += (entry.duration || 0);
-    });
-    
-    return totalDuration > 0 ? (totalCalories / totalDuration) : 0;
-  }
-  
-  // Helper function: Calculate diversity score
-  function calculateDiversityScore(fitnessData) {
-    if (fitnessData.length === 0) return 0;
-    
-    const uniqueActivities = new Set(fitnessData.map(entry => entry.activity_type).filter(Boolean));
-    return uniqueActivities.size;
-  }
-
   // Goal Progress Tracker functions
-  function initGoalProgressChart(filteredFitness) {
+  function initGoalProgressChart(goalList) {
     if (!ctxGoal) return; // Ensure canvas context exists
     
-    // Calculate weekly sessions
-    function calculateWeeklySessions(fitnessData) {
-      // Group entries by week
-      const weekMap = {};
-      fitnessData.forEach(entry => {
-        const date = new Date(entry.date);
-        const weekKey = `${date.getFullYear()}-${Math.floor(date.getTime() / (7 * 24 * 60 * 60 * 1000))}`;
-        if (!weekMap[weekKey]) {
-          weekMap[weekKey] = new Set();
-        }
-        weekMap[weekKey].add(entry.date);
-      });
-      
-      // Calculate average sessions per week
-      const weeks = Object.keys(weekMap);
-      if (weeks.length === 0) return 0;
-      
-      const totalSessions = weeks.reduce((sum, week) => sum + weekMap[week].size, 0);
-      return totalSessions / weeks.length;
-    }
-    
-    // Calculate average daily movement
-    function calculateAverageDailyMovement(fitnessData) {
-      // Group entries by day
-      const dayMap = {};
-      fitnessData.forEach(entry => {
-        if (!dayMap[entry.date]) {
-          dayMap[entry.date] = 0;
-        }
-        dayMap[entry.date] += (entry.duration || 0);
-      });
-      
-      // Calculate average minutes per day
-      const days = Object.keys(dayMap);
-      if (days.length === 0) return 0;
-      
-      const totalMinutes = days.reduce((sum, day) => sum + dayMap[day], 0);
-      return totalMinutes / days.length;
-    }
-
-    // Define some typical fitness goals
-    const goals = {
-      'Weekly Activity': {
-        target: 5, // 5 sessions per week
-        current: calculateWeeklySessions(filteredFitness),
-        unit: 'sessions'
-      },
-      'Daily Movement': {
-        target: 30, // 30 minutes average per day
-        current: calculateAverageDailyMovement(filteredFitness),
-        unit: 'minutes'
-      },
-      'Calorie Burn': {
-        target: 2000, // 2000 calories per week
-        current: filteredFitness.reduce((sum, entry) => sum + (entry.calories_burned || 0), 0),
-        unit: 'calories'
-      },
-      'Activity Diversity': {
-        target: 3, // 3 different types of activities
-        current: calculateDiversityScore(filteredFitness),
-        unit: 'types'
-      }
-    };
-    
-    // Calculate percentage of goal achievement for each goal
+    // Goal values and percentages come from /api/visualisation/dashboard
+    const goals = {};
     const goalPercentages = {};
-    Object.keys(goals).forEach(goal => {
-      const percentage = Math.min(100, ((goals[goal].current || 0) / goals[goal].target) * 100);
-      goalPercentages[goal] = Math.round(percentage);
+    goalList.forEach(item => {
+      goals[item.goal] = item;
+      goalPercentages[item.goal] = item.percentage;
     });
     
     // Create datasets
@@ -1,15 +1,38 @@
 import sys
 import os
 import uuid
+import json
+import re
+import gzip
+import io
+import logging
 import unittest
 
 # Allow imports from parent directory
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from app import app
-from app.models import db, User
+from app.models import db, User, UserInfo, FitnessEntry, FoodEntry, ShareCategory, DailyUserStats, LeaderboardTotals
+from app.database import add_user_fitness_entry, upsert_user_food_entry, upsert_user_food_entries, create_share_entry, revoke_share_entry, get_user_activity_data, \
+    get_entry_page, get_entry_page_json, stream_entries, encode_entry_cursor
+from app.rollups import rebuild_daily_user_stats, get_leaderboard, track_entries, LEADERBOARD_WINDOWS
+from app import user_cache, passwords, share_cache, fragment_cache
+from app.instrumentation import init_instrumentation
+from unittest import mock
+from werkzeug.security import generate_password_hash
+import threading
+from types import SimpleNamespace
+import tempfile
+import shutil
+import time
+from app.kvstore import MemoryStore, SQLiteStore, SizedMemoryStore
+from app.serializers import rows_to_json
+from datetime import date, timedelta
 from app.routes import verification_codes, temp_users
-from flask import url_for
+from flask import Flask, url_for, g
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import text, event
+from sqlalchemy.exc import SQLAlchemyError
 
 
 class HomepageTestCase(unittest.TestCase):
@@ -260,6 +283,23 @@ class HomepageTestCase(unittest.TestCase):
         self.assertIn(email, temp_users)
         self.assertIn('code', temp_users[email])
 
+    # A pending registration keeps only the password hash, and verifying the link registers with it
+    def test_pending_registration_stores_password_hash(self):
+        email = 'pendinghash@example.com'
+        self.client.post('/register', data={
+            'username': 'pendinghash',
+            'email': email,
+            'password': 'Test@1234',
+            'confirm_password': 'Test@1234'
+        }, follow_redirects=True)
+        pending = temp_users[email]
+        self.assertNotIn('password', pending)
+        self.assertNotIn('Test@1234', json.dumps(pending))
+        self.client.get('/verify-email', query_string={'email': email, 'code': pending['code']})
+        user = User.query.filter_by(email=email).one()
+        self.assertEqual(user.password_hash, pending['password_hash'])
+        self.assertTrue(user.check_password('Test@1234'))
+
     # Valid email format
     def test_valid_email_format(self):
         response = self.client.post('/register', data={
@@ -282,5 +322,1017 @@ class HomepageTestCase(unittest.TestCase):
         }, follow_redirects=True)
         self.assertIn(b'Password must be at least 8 characters long and include at least one uppercase letter, one digit, and one special character.', response.data)
 
+
+class LoggedInTestCase(unittest.TestCase):
+    # Base for feature tests that need one user logged in through the login form
+
+    def setUp(self):
+        app.config['TESTING'] = True
+        app.config['WTF_CSRF_ENABLED'] = False
+        self.client = app.test_client()
+        self.app_context = app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.user = User(username='statsuser', email='stats@example.com')
+        self.user.set_password('Test@1234')
+        db.session.add(self.user)
+        db.session.commit()
+        self.client.post('/login', data={'email': 'stats@example.com', 'password': 'Test@1234'})
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+
+class DailyStatsTestCase(LoggedInTestCase):
+
+    def snapshot(self):
+        return [
+            (row.date, round(row.calories_burned, 2), round(row.calories_consumed, 2), round(row.workout_minutes, 2),
+             row.fitness_entry_count, row.food_entry_count, row.activity_counts)
+            for row in DailyUserStats.query.filter_by(user_id=self.user.id).order_by(DailyUserStats.date)
+        ]
+
+    # Incrementally maintained rollups must match a full rebuild after inserts, upserts and deletes
+    def test_rollups_match_rebuild(self):
+        add_user_fitness_entry(self.user.id, date(2025, 1, 1), 'Running', 30, 300, 'Happy')
+        removed = add_user_fitness_entry(self.user.id, date(2025, 1, 1), 'Yoga', 20, 80, 'Relaxed')
+        upsert_user_food_entry(self.user.id, date(2025, 1, 1), 'Oatmeal', 100, 200, 'Breakfast')
+        upsert_user_food_entry(self.user.id, date(2025, 1, 1), 'Oatmeal', 150, 300, 'Breakfast')
+        self.client.post('/upload', data={
+            'date': '2025-01-02', 'time': '08:00',
+            'activity_type': ['Cycling'], 'duration': ['45'], 'calories_burned': ['400'], 'emotion': ['Energized'],
+            'food_name': ['Apple'], 'food_quantity': ['1'], 'food_calories': ['80'], 'meal_type': ['Snack']
+        })
+        response = self.client.delete(f'/api/delete_entry/fitness/{removed.id}')
+        self.assertEqual(response.status_code, 200)
+
+        incremental = self.snapshot()
+        self.assertEqual(incremental[0], (date(2025, 1, 1), 300.0, 300.0, 30.0, 1, 1, {'Running': 1}))
+        rebuild_daily_user_stats([self.user.id])
+        self.assertEqual(incremental, self.snapshot())
+
+    # Batch upserts keep one row per (user, date, meal type), last row wins, and rollups follow
+    def test_batch_food_upsert(self):
+        day = date(2025, 2, 1)
+        upsert_user_food_entry(self.user.id, day, 'Toast', 1, 150, 'Breakfast')
+        written, replaced = upsert_user_food_entries([
+            {'user_id': self.user.id, 'date': day, 'food_name': 'Eggs', 'quantity': 2, 'calories': 180, 'meal_type': 'Breakfast'},
+            {'user_id': self.user.id, 'date': day, 'food_name': 'Salad', 'quantity': 1, 'calories': 250, 'meal_type': 'Lunch'},
+            {'user_id': self.user.id, 'date': day, 'food_name': 'Soup', 'quantity': 1, 'calories': 300, 'meal_type': 'Lunch'}
+        ])
+        self.assertEqual(written, 2)
+        self.assertEqual(replaced, [(self.user.id, day, 'Breakfast'), (self.user.id, day, 'Lunch')])
+        meals = {entry.meal_type: entry.food_name for entry in FoodEntry.query.filter_by(user_id=self.user.id)}
+        self.assertEqual(meals, {'Breakfast': 'Eggs', 'Lunch': 'Soup'})
+        incremental = self.snapshot()
+        self.assertEqual(incremental[0][2], 480.0)
+        rebuild_daily_user_stats([self.user.id])
+        self.assertEqual(incremental, self.snapshot())
+
+    # Dialects without an ON CONFLICT upsert fall back to updating loaded rows and inserting the rest
+    def test_batch_food_upsert_without_dialect_upsert(self):
+        day = date(2025, 2, 1)
+        upsert_user_food_entry(self.user.id, day, 'Toast', 1, 150, 'Breakfast')
+        with mock.patch('app.database._food_upsert_statement', return_value=None):
+            written, replaced = upsert_user_food_entries([
+                {'user_id': self.user.id, 'date': day, 'food_name': 'Eggs', 'quantity': 2, 'calories': 180, 'meal_type': 'Breakfast'},
+                {'user_id': self.user.id, 'date': day, 'food_name': 'Soup', 'quantity': 1, 'calories': 300, 'meal_type': 'Lunch'}
+            ])
+        self.assertEqual((written, replaced), (2, [(self.user.id, day, 'Breakfast')]))
+        meals = {entry.meal_type: entry.food_name for entry in FoodEntry.query.filter_by(user_id=self.user.id)}
+        self.assertEqual(meals, {'Breakfast': 'Eggs', 'Lunch': 'Soup'})
+        incremental = self.snapshot()
+        self.assertEqual(incremental[0][2], 480.0)
+        rebuild_daily_user_stats([self.user.id])
+        self.assertEqual(incremental, self.snapshot())
+
+    # The upload form tells the user when a meal replaced one already logged for that day
+    def test_upload_reports_replaced_meal(self):
+        upsert_user_food_entry(self.user.id, date(2025, 2, 1), 'Toast', 1, 150, 'Lunch')
+        response = self.client.post('/upload', data={
+            'date': '2025-02-01', 'time': '12:00',
+            'food_name': ['Soup'], 'food_quantity': ['1'], 'food_calories': ['300'], 'meal_type': ['Lunch']
+        }, follow_redirects=True)
+        self.assertIn(b'Lunch on 2025-02-01 replaced the earlier entry', response.data)
+        self.assertEqual([entry.food_name for entry in FoodEntry.query.filter_by(user_id=self.user.id)], ['Soup'])
+
+    def run_concurrently(self, *calls):
+        # Each call gets its own thread, app context and session; a barrier starts them together
+        barrier = threading.Barrier(len(calls))
+        errors = []
+
+        def run(call):
+            with app.app_context():
+                barrier.wait()
+                try:
+                    call()
+                except Exception as e:
+                    errors.append(e)
+                finally:
+                    db.session.remove()
+
+        threads = [threading.Thread(target=run, args=(call,)) for call in calls]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    # Concurrent inserts and deletes on one user's days leave rollups and leaderboard totals equal to a recompute
+    def test_concurrent_writes_keep_rollups(self):
+        today = date.today()
+        removed = [add_user_fitness_entry(self.user.id, today, 'Running', 10, 100, 'Happy').id for _ in range(4)]
+        for period in LEADERBOARD_WINDOWS:
+            get_leaderboard([self.user.id], period)
+        db.session.commit()
+
+        # A rollup read made before the transaction holds the write lock is the start of a lost update:
+        # hold each deleting thread after such a read until all of them have made it
+        gate = threading.Barrier(len(removed), timeout=10)
+        waiting = threading.local()
+
+        def hold(conn, cursor, statement, parameters, context, executemany):
+            unlocked_read = statement.startswith('SELECT') and not conn.connection.dbapi_connection.in_transaction
+            if getattr(waiting, 'rollup', False) and unlocked_read and \
+                    ('leaderboard_totals' in statement or 'daily_user_stats' in statement):
+                waiting.rollup = False
+                gate.wait()
+
+        def delete(entry_id):
+            # As /api/delete_entry does: fold the removal into the rollups, then delete
+            waiting.rollup = True
+            entry = db.session.get(FitnessEntry, entry_id)
+            track_entries(removed_fitness_entries=[entry])
+            db.session.delete(entry)
+            db.session.commit()
+
+        event.listen(db.engine, 'after_cursor_execute', hold)
+        try:
+            self.run_concurrently(
+                *[lambda entry_id=entry_id: delete(entry_id) for entry_id in removed],
+                # The day before has no rollup row yet, so these race to create it
+                *[lambda: add_user_fitness_entry(self.user.id, today - timedelta(days=1), 'Yoga', 20, 50, 'Calm') for _ in range(4)]
+            )
+        finally:
+            event.remove(db.engine, 'after_cursor_execute', hold)
+
+        db.session.expire_all()
+        for period in LEADERBOARD_WINDOWS:
+            self.assertEqual([(row.calories_burned, row.activity_count) for row in get_leaderboard([self.user.id], period)], [(200.0, 4)])
+        incremental = self.snapshot()
+        self.assertEqual(incremental, [(today - timedelta(days=1), 200.0, 0.0, 80.0, 4, 0, {'Yoga': 4})])
+        rebuild_daily_user_stats([self.user.id])
+        self.assertEqual(incremental, self.snapshot())
+
+    # Two uploads of the same meal at once leave one entry, counted once in the rollups
+    def test_concurrent_food_upserts_count_once(self):
+        day = date(2025, 3, 1)
+        # Hold each upload after it reads the entries it replaces, until the other has read them too.
+        # With the write lock taken before the read, the second upload cannot read until the first
+        # commits, so the wait times out and the uploads run one after the other
+        gate = threading.Barrier(2, timeout=1)
+
+        def hold(conn, cursor, statement, parameters, context, executemany):
+            if statement.startswith('SELECT') and 'FROM food_entries' in statement:
+                try:
+                    gate.wait()
+                except threading.BrokenBarrierError:
+                    pass
+
+        def upload():
+            upsert_user_food_entry(self.user.id, day, 'Soup', 1, 100, 'Lunch')
+
+        event.listen(db.engine, 'after_cursor_execute', hold)
+        try:
+            self.run_concurrently(upload, upload)
+        finally:
+            event.remove(db.engine, 'after_cursor_execute', hold)
+
+        db.session.expire_all()
+        self.assertEqual([entry.calories for entry in FoodEntry.query.filter_by(user_id=self.user.id)], [100])
+        incremental = self.snapshot()
+        self.assertEqual(incremental, [(day, 0.0, 100.0, 0.0, 0, 1, {})])
+        rebuild_daily_user_stats([self.user.id])
+        self.assertEqual(incremental, self.snapshot())
+
+    # Entries without a date are left out of the rollups, as a rebuild leaves them out
+    def test_undated_entries_are_not_rolled_up(self):
+        track_entries(fitness_entries=[SimpleNamespace(user_id=self.user.id, date=None, activity_type='Running',
+                                                       duration=10, calories_burned=100)])
+        db.session.commit()
+        self.assertEqual(self.snapshot(), [])
+
+    # Leaderboard totals follow inserts and deletes, and roll forward to match a fresh recompute
+    def test_leaderboard_rolls_forward(self):
+        today = date.today()
+        for days_ago, calories in ((1, 100), (5, 200), (20, 400), (200, 800)):
+            add_user_fitness_entry(self.user.id, today - timedelta(days=days_ago), 'Running', 10, calories, 'Happy')
+        removed = add_user_fitness_entry(self.user.id, today - timedelta(days=2), 'Yoga', 10, 50, 'Relaxed')
+        self.client.delete(f'/api/delete_entry/fitness/{removed.id}')
+
+        response = self.client.get('/api/visualisation/ranking?time_range=month')
+        self.assertEqual(response.get_json()['ranking'][0]['total_calories_burned'], 700)
+        self.assertEqual(response.get_json()['ranking'][0]['activity_count'], 3)
+
+        def totals(period, on):
+            return [(row.calories_burned, row.duration, row.activity_count) for row in get_leaderboard([self.user.id], period, on)]
+
+        expected = {(period, days): None for period in ('week', 'month', 'year') for days in (3, 30, 400)}
+        for period, days in expected:
+            LeaderboardTotals.query.delete()
+            expected[(period, days)] = totals(period, today + timedelta(days=days))
+        LeaderboardTotals.query.delete()
+        for period in ('week', 'month', 'year'):
+            totals(period, today)
+            for days in (3, 30, 400):
+                self.assertEqual(totals(period, today + timedelta(days=days)), expected[(period, days)])
+        self.assertEqual(totals('year', today + timedelta(days=3)), [(1500.0, 40.0, 4)])
+
+
+class CsvImportTestCase(LoggedInTestCase):
+
+    def post(self, entry_type, content, **kwargs):
+        return self.client.post('/upload/import', data={'type': entry_type, 'file': (io.BytesIO(content.encode()), 'log.csv')},
+                                headers={'Accept': 'application/json'}, **kwargs)
+
+    def import_fitness(self):
+        with mock.patch.dict(app.config, {'IMPORT_CHUNK_SIZE': 2}):
+            return self.post('fitness', '\n'.join([
+                'date,activity_type,duration,calories_burned,emotion,notes',
+                '2025-01-01,Running,30,300,Happy,x',
+                '2025-01-02,,10,50,,',  # Line 3: no activity
+                '2025-01-02,Yoga,20,,Calm,',
+                '2025-1-3,Cycling,40,400,,',  # Line 5: bad date
+                '2025-01-03,Cycling,forty,400,,,extra',  # Line 6: one field too many
+                '2025-01-04,Swimming,-5,100,,',  # Line 7: negative duration
+                '2025-01-04,Rowing,15,150,Tired,'
+            ])).get_json()
+
+    # CSV import writes valid rows in chunks and reports bad rows by file line
+    def test_csv_import_reports_row_errors(self):
+        report = self.import_fitness()
+        self.assertEqual(report['imported'], 3)
+        self.assertEqual(report['error_count'], 4)
+        self.assertEqual([error['line'] for error in sorted(report['errors'], key=lambda error: error['line'])], [3, 5, 6, 7])
+        self.assertGreater(report['rows_per_second'], 0)
+
+    # Imported rows reach the daily rollups
+    def test_csv_import_updates_rollups(self):
+        self.import_fitness()
+        self.assertEqual(DailyUserStats.query.filter_by(user_id=self.user.id, date=date(2025, 1, 2)).one().workout_minutes, 20)
+
+    # A file with only a header imports nothing; one without the date column is rejected
+    def test_csv_import_checks_header(self):
+        self.assertEqual(self.post('food', 'date,food_name\n').status_code, 200)
+        self.assertEqual(self.post('food', 'day,food_name\n2025-01-01,Soup\n').status_code, 400)
+
+    # A repeated meal replaces the earlier one, as on the upload form; the report counts the entry kept and the one replaced
+    def test_csv_import_replaces_repeated_meal(self):
+        report = self.post('food', 'date,food_name,calories,meal_type\n2025-01-01,Soup,100,Lunch\n2025-01-01,Salad,80,Lunch\n').get_json()
+        self.assertEqual((report['imported'], report['replaced']), (1, 1))
+        self.assertEqual([entry.food_name for entry in FoodEntry.query.filter_by(user_id=self.user.id)], ['Salad'])
+
+    # The importer reads its own export back
+    def test_csv_import_reads_export(self):
+        self.import_fitness()
+        exported = self.client.get('/api/export?type=fitness').get_data(as_text=True)
+        self.assertEqual(len(exported.splitlines()), 4)
+        response = self.client.post('/upload/import', data={'type': 'fitness', 'file': (io.BytesIO(exported.encode()), 'export.csv')})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.client.get('/api/export?type=fitness').get_data(as_text=True).count('Running'), 2)
+
+    # A chunk the database rejects is logged and its rows reported, without stopping the import
+    def test_csv_import_logs_database_errors(self):
+        with mock.patch('app.importer._write_chunk', side_effect=SQLAlchemyError('disk full')), \
+                self.assertLogs(app.logger, 'ERROR') as logs:
+            report = self.post('fitness', 'date,activity_type\n2025-01-01,Running\n').get_json()
+        self.assertEqual((report['imported'], report['error_count']), (0, 1))
+        self.assertIn('Database error importing rows 1-1', logs.output[0])
+
+
+class UserCacheTestCase(LoggedInTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.statements = []
+        event.listen(db.engine, 'before_cursor_execute', self.record)
+
+    def tearDown(self):
+        event.remove(db.engine, 'before_cursor_execute', self.record)
+        super().tearDown()
+
+    def record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def user_queries(self):
+        # The test's app context outlives requests, so drop the user Flask-Login memoised on g
+        g.pop('_login_user', None)
+        self.client.get('/api/entries')
+        return [statement for statement in self.statements if 'FROM users' in statement]
+
+    # Authenticated requests are served from the user cache without loading the user
+    def test_user_loader_uses_cache(self):
+        self.assertFalse(self.user_queries())
+
+    # Invalidating the cached user makes the next request load it again
+    def test_invalidated_user_is_reloaded(self):
+        user_cache.invalidate_user(self.user.id)
+        self.assertTrue(self.user_queries())
+
+
+class RequestTimingTestCase(LoggedInTestCase):
+
+    # With REQUEST_TIMING on, responses carry Server-Timing with the SQL statement count
+    def test_request_timing_header(self):
+        with mock.patch.dict(app.config, {'REQUEST_TIMING': True}):
+            response = self.client.get('/visualise')
+        self.assertRegex(response.headers['Server-Timing'], r'app;dur=[\d.]+, db;dur=[\d.]+;desc="[1-9]\d* queries", tpl;dur=[\d.]+')
+
+    # With REQUEST_TIMING off, responses carry no Server-Timing header
+    def test_no_timing_header_when_off(self):
+        with mock.patch.dict(app.config, {'REQUEST_TIMING': False}):
+            response = self.client.get('/visualise')
+        self.assertNotIn('Server-Timing', response.headers)
+
+    # Registering the hooks leaves the logger level alone unless timing is switched on
+    def test_logger_level_follows_request_timing(self):
+        for enabled, level in ((False, logging.NOTSET), (True, logging.INFO)):
+            timed_app = Flask(__name__)
+            timed_app.config.update(SQLALCHEMY_DATABASE_URI='sqlite://', REQUEST_TIMING=enabled)
+            init_instrumentation(timed_app, SQLAlchemy(timed_app))
+            self.assertEqual(timed_app.logger.level, level)
+
+
+class DashboardMetricsTestCase(LoggedInTestCase):
+
+    # Dashboard metrics follow the browser's old rules: missing numbers count as 0, blank types and
+    # emotions are skipped, unknown meals are snacks, and goal percentages round halves up
+    def test_dashboard_metrics_match_chart_semantics(self):
+        add_user_fitness_entry(self.user.id, date(2025, 1, 2), 'Running', 30, 300, 'Happy')
+        add_user_fitness_entry(self.user.id, date(2025, 1, 1), None, None, 50, '')
+        add_user_fitness_entry(self.user.id, date(2025, 1, 1), 'Yoga', 20, None, 'Calm')
+        add_user_fitness_entry(self.user.id, date(2024, 12, 1), 'Running', 60, 600, 'Happy')  # Outside the window
+        upsert_user_food_entry(self.user.id, date(2025, 1, 3), 'Pizza', 1, 200, None)
+        upsert_user_food_entry(self.user.id, date(2025, 1, 1), 'Salad', 1, None, 'Lunch')
+
+        metrics = self.client.get('/api/visualisation/dashboard?start_date=2024-12-30&end_date=2025-01-05').get_json()
+        self.assertEqual(metrics['dates'], ['2025-01-01', '2025-01-02', '2025-01-03'])
+        self.assertEqual(metrics['daily']['duration'], [20.0, 30.0, 0.0])
+        self.assertEqual(metrics['daily']['calorie_gap'], [-50.0, -300.0, 200.0])
+        self.assertEqual(metrics['daily']['calories_per_minute'], [2.5, 10.0, 0.0])
+        self.assertEqual(metrics['summary']['workouts'], 3)
+        self.assertEqual(metrics['summary']['calorie_gap'], -150.0)
+        self.assertEqual([(item['type'], item['intensity'], item['count']) for item in metrics['intensity']],
+                         [('Running', 10.0, 1), ('Yoga', 0.0, 1)])
+        performance = {item['metric']: round(item['score'], 2) for item in metrics['performance']}
+        self.assertEqual(performance, {'Consistency': 66.67, 'Duration': 13.89, 'Intensity': 46.67, 'Frequency': 20.0, 'Diversity': 20.0})
+        self.assertEqual([(item['meal_type'], item['count'], item['calories']) for item in metrics['meals']],
+                         [('Breakfast', 0, 0.0), ('Lunch', 1, 0.0), ('Dinner', 0, 0.0), ('Snack', 1, 200.0)])
+        self.assertEqual([(item['emotion'], item['count']) for item in metrics['emotions']], [('Happy', 1), ('Calm', 1)])
+        # 1/1 and 1/2 fall in different epoch weeks; 350 of 2000 calories is 17.5%
+        self.assertEqual({item['goal']: (item['current'], item['percentage']) for item in metrics['goals']}, {
+            'Weekly Activity': (1.0, 20), 'Daily Movement': (25.0, 83), 'Calorie Burn': (350.0, 18), 'Activity Diversity': (2.0, 67)
+        })
+
+    # The dashboard refuses a share the viewer was not given
+    def test_dashboard_rejects_unknown_share(self):
+        self.assertEqual(self.client.get('/api/visualisation/dashboard?share_id=999').status_code, 403)
+
+
+class ColumnarCacheTestCase(LoggedInTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.today = date.today()
+        add_user_fitness_entry(self.user.id, self.today - timedelta(days=3), 'Running', 30, 300, 'Happy')
+        add_user_fitness_entry(self.user.id, self.today - timedelta(days=3), None, None, 50, None)
+        self.removed = add_user_fitness_entry(self.user.id, self.today - timedelta(days=1), 'Yoga', 20, None, 'Calm')
+        upsert_user_food_entry(self.user.id, self.today - timedelta(days=2), 'Salad', None, 250, 'Lunch')
+        self.paths = ['/api/visualisation/fitness?days=30', '/api/visualisation/dashboard',
+                      f'/api/visualisation/dashboard?start_date={self.today - timedelta(days=2)}']
+        self.cache_dir = tempfile.mkdtemp()
+        self.config = mock.patch.dict(app.config, {'COLUMNAR_CACHE': True, 'COLUMNAR_CACHE_DIR': self.cache_dir})
+        self.config.start()
+        # Build the cached tables before each test changes anything
+        self.payloads(True)
+
+    def tearDown(self):
+        self.config.stop()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        super().tearDown()
+
+    def payloads(self, cached):
+        app.config['COLUMNAR_CACHE'] = cached
+        try:
+            return [self.client.get(path).get_json() for path in self.paths]
+        finally:
+            app.config['COLUMNAR_CACHE'] = True
+
+    def cached_files(self):
+        return set(os.listdir(os.path.join(self.cache_dir, str(self.user.id))))
+
+    # The columnar cache serves the same payloads as SQL
+    def test_columnar_cache_matches_sql(self):
+        self.assertIn('fitness.json', self.cached_files())
+        self.assertEqual(self.payloads(True), self.payloads(False))
+
+    # Today's upload is appended to the cached tables in place
+    def test_upload_appends_in_place(self):
+        files = self.cached_files()
+        self.client.post('/upload', data={
+            'date': self.today.isoformat(), 'time': '08:00', 'gender': 'Other', 'age': '30', 'height': '170', 'weight': '60',
+            'activity_type': ['Swimming'], 'duration': ['45'], 'calories_burned': ['400'], 'emotion': ['Happy'],
+            'food_name': ['Soup'], 'food_quantity': ['1'], 'food_calories': ['150'], 'meal_type': ['Dinner']
+        })
+        self.assertEqual(self.cached_files(), files)
+        self.assertEqual(self.payloads(True), self.payloads(False))
+
+    # A meal replacing a cached one is not served stale
+    def test_replaced_meal_is_not_stale(self):
+        upsert_user_food_entry(self.user.id, self.today - timedelta(days=2), 'Pasta', 1, 600, 'Lunch')
+        self.assertEqual(self.payloads(True), self.payloads(False))
+
+    # Deleting an entry drops the cached fitness table
+    def test_delete_drops_fitness_table(self):
+        self.assertEqual(self.client.delete(f'/api/delete_entry/fitness/{self.removed.id}').status_code, 200)
+        self.assertNotIn('fitness.json', self.cached_files())
+        self.assertEqual(self.payloads(True), self.payloads(False))
+
+
+class ExportTestCase(LoggedInTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.today = date.today()
+        add_user_fitness_entry(self.user.id, self.today - timedelta(days=40), 'Running', 30, 300, 'Happy')
+        add_user_fitness_entry(self.user.id, self.today, 'Yoga', None, 80, None)
+        upsert_user_food_entry(self.user.id, self.today, 'Soup, hot', 1, 150, 'Dinner')
+
+    def log_in_as_sharee(self, data_categories):
+        friend = User(username='exportfriend', email='exportfriend@example.com')
+        friend.set_password('Test@1234')
+        db.session.add(friend)
+        db.session.commit()
+        share = create_share_entry(self.user.id, friend.id, data_categories, 'last_7_days')
+        with self.client.session_transaction() as flask_session:
+            flask_session['_user_id'] = str(friend.id)
+            flask_session['_fresh'] = True
+        g.pop('_login_user', None)
+        return share
+
+    # CSV exports stream every entry oldest first as an attachment, blanks for missing values
+    def test_csv_export_streams_entries(self):
+        response = self.client.get('/api/export?type=fitness')
+        self.assertTrue(response.is_streamed)
+        self.assertEqual(response.mimetype, 'text/csv')
+        self.assertIn('fitness-entries.csv', response.headers['Content-Disposition'])
+        lines = response.get_data(as_text=True).splitlines()
+        self.assertEqual(lines[0], 'id,date,activity_type,duration,calories_burned,emotion')
+        self.assertEqual([line.split(',')[1:] for line in lines[1:]], [
+            [(self.today - timedelta(days=40)).isoformat(), 'Running', '30.0', '300.0', 'Happy'],
+            [self.today.isoformat(), 'Yoga', '', '80.0', '']
+        ])
+
+    # CSV fields containing commas are quoted
+    def test_csv_export_quotes_fields(self):
+        self.assertIn('"Soup, hot"', self.client.get('/api/export?type=food').get_data(as_text=True))
+
+    # NDJSON exports can be gzipped
+    def test_gzipped_ndjson_export(self):
+        compressed = self.client.get('/api/export?type=food&format=ndjson&gzip=1')
+        self.assertEqual(compressed.mimetype, 'application/gzip')
+        records = [json.loads(line) for line in gzip.decompress(compressed.data).decode().splitlines()]
+        self.assertEqual([(record['food_name'], record['calories'], record['date']) for record in records],
+                         [('Soup, hot', 150.0, self.today.isoformat())])
+
+    # A window with no entries exports just the header
+    def test_empty_window_exports_header(self):
+        self.assertEqual(self.client.get('/api/export?type=fitness&start_date=2000-01-01&end_date=2000-01-02')
+                         .get_data(as_text=True), 'id,date,activity_type,duration,calories_burned,emotion\n')
+
+    # Unknown formats are rejected
+    def test_unknown_format_is_rejected(self):
+        self.assertEqual(self.client.get('/api/export?format=xml').status_code, 400)
+
+    # A sharee exports only the entries within the share's 7-day window
+    def test_sharee_export_is_clamped_to_share_window(self):
+        share = self.log_in_as_sharee('activity_log')
+        shared = self.client.get(f'/api/export?type=fitness&format=ndjson&share_id={share.id}')
+        self.assertEqual([json.loads(line)['activity_type'] for line in shared.get_data(as_text=True).splitlines()], ['Yoga'])
+
+    # A sharee cannot export a log the share leaves out, nor use someone else's share
+    def test_sharee_export_respects_share_categories(self):
+        share = self.log_in_as_sharee('activity_log')
+        self.assertEqual(self.client.get(f'/api/export?type=food&share_id={share.id}').status_code, 403)
+        self.assertEqual(self.client.get('/api/export?type=fitness&share_id=999').status_code, 403)
+
+
+class CompressionTestCase(LoggedInTestCase):
+
+    def setUp(self):
+        super().setUp()
+        for day in range(1, 8):
+            add_user_fitness_entry(self.user.id, date.today() - timedelta(days=day), 'Running', 30, 300, 'Happy')
+        self.path = '/api/visualisation/fitness?days=30'
+
+    # Text responses are gzipped for clients that accept it and vary on Accept-Encoding
+    def test_responses_are_compressed(self):
+        plain = self.client.get(self.path)
+        compressed = self.client.get(self.path, headers={'Accept-Encoding': 'gzip, deflate'})
+        self.assertNotIn('Content-Encoding', plain.headers)
+        self.assertEqual(compressed.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', compressed.headers['Vary'])
+        self.assertEqual(gzip.decompress(compressed.data), plain.data)
+        self.assertLess(len(compressed.data), len(plain.data))
+
+    # Compressed responses keep a weak ETag that still revalidates
+    def test_compressed_etag_revalidates(self):
+        etag = self.client.get(self.path, headers={'Accept-Encoding': 'gzip'}).headers['ETag']
+        self.assertTrue(etag.startswith('W/'))
+        self.assertEqual(self.client.get(self.path, headers={'If-None-Match': etag, 'Accept-Encoding': 'gzip'}).status_code, 304)
+
+    # Bodies under the minimum size get the identity encoding
+    def test_small_bodies_are_not_compressed(self):
+        self.assertNotIn('Content-Encoding', self.client.get('/api/entries?type=food', headers={'Accept-Encoding': 'gzip'}).headers)
+
+    # Clients that refuse gzip get the identity encoding
+    def test_refused_gzip_is_not_used(self):
+        self.assertNotIn('Content-Encoding', self.client.get(self.path, headers={'Accept-Encoding': 'gzip;q=0'}).headers)
+
+
+class VisualisationETagTestCase(LoggedInTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.friend = User(username='etagfriend', email='etagfriend@example.com', password_hash='x')
+        db.session.add(self.friend)
+        db.session.commit()
+
+    def revalidate(self, path, etag):
+        return self.client.get(path, headers={'If-None-Match': etag})
+
+    # Repeating a request with its ETag answers 304; other query parameters get their own ETag
+    def test_unchanged_data_revalidates(self):
+        fitness_etag = self.client.get('/api/visualisation/fitness?days=7').headers['ETag']
+        ranking_etag = self.client.get('/api/visualisation/ranking').headers['ETag']
+        self.assertEqual(self.revalidate('/api/visualisation/fitness?days=7', fitness_etag).status_code, 304)
+        self.assertEqual(self.revalidate('/api/visualisation/ranking', ranking_etag).status_code, 304)
+        self.assertEqual(self.revalidate('/api/visualisation/fitness?days=30', fitness_etag).status_code, 200)
+
+    # A new share changes who the ranking can see
+    def test_new_share_changes_ranking_etag(self):
+        ranking_etag = self.client.get('/api/visualisation/ranking').headers['ETag']
+        create_share_entry(self.friend.id, self.user.id, 'fitness_ranking', 'all_time')
+        self.assertEqual(self.revalidate('/api/visualisation/ranking', ranking_etag).status_code, 200)
+
+    # A visible user's new entry changes the ranking but not the viewer's own charts
+    def test_shared_user_entry_changes_ranking_etag(self):
+        create_share_entry(self.friend.id, self.user.id, 'fitness_ranking', 'all_time')
+        fitness_etag = self.client.get('/api/visualisation/fitness?days=7').headers['ETag']
+        ranking_etag = self.client.get('/api/visualisation/ranking').headers['ETag']
+        add_user_fitness_entry(self.friend.id, date.today(), 'Running', 30, 300, 'Happy')
+        self.assertEqual(self.revalidate('/api/visualisation/fitness?days=7', fitness_etag).status_code, 304)
+        self.assertEqual(self.revalidate('/api/visualisation/ranking', ranking_etag).status_code, 200)
+
+    # The viewer's own entry changes both the charts and the ranking
+    def test_own_entry_changes_every_etag(self):
+        fitness_etag = self.client.get('/api/visualisation/fitness?days=7').headers['ETag']
+        ranking_etag = self.client.get('/api/visualisation/ranking').headers['ETag']
+        add_user_fitness_entry(self.user.id, date.today(), 'Yoga', 20, 80, 'Relaxed')
+        self.assertEqual(self.revalidate('/api/visualisation/fitness?days=7', fitness_etag).status_code, 200)
+        self.assertEqual(self.revalidate('/api/visualisation/ranking', ranking_etag).status_code, 200)
+
+
+class EntryPageTestCase(unittest.TestCase):
+
+    def setUp(self):
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+        self.app_context = app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.user = User(username='pageuser', email='page@example.com', password_hash='x')
+        db.session.add(self.user)
+        db.session.commit()
+        with self.client.session_transaction() as sess:
+            sess['_user_id'] = str(self.user.id)
+            sess['_fresh'] = True
+        user_cache.invalidate_user(self.user.id)
+        for day in range(1, 6):
+            add_user_fitness_entry(self.user.id, date(2025, 1, day), 'Running', 30, 300, 'Happy')
+            add_user_fitness_entry(self.user.id, date(2025, 1, day), 'Yoga</script>', 20, 80, 'Relaxed')
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    # Walking /api/entries cursors returns every entry once, newest first
+    def test_entries_api_pages_with_cursor(self):
+        seen, cursor = [], None
+        while True:
+            params = {'type': 'fitness', 'start_date': '2025-01-02', 'limit': 3}
+            if cursor:
+                params['cursor'] = cursor
+            payload = self.client.get('/api/entries', query_string=params).get_json()
+            seen.extend((entry['date'], entry['id']) for entry in payload['entries'])
+            cursor = payload['next_cursor']
+            if not cursor:
+                break
+        self.assertEqual(len(seen), 8)
+        self.assertEqual(seen, sorted(set(seen), reverse=True))
+
+    # A cursor that does not decode is rejected rather than restarting from the first page
+    def test_entries_api_rejects_bogus_cursor(self):
+        self.assertEqual(self.client.get('/api/entries?cursor=bogus').status_code, 400)
+
+    # The page embedded in visualise.html, serialized from the cursor, walks the same entries as the API pages
+    def test_script_json_pages_match_entry_pages(self):
+        cursors = [None, None]
+        while True:
+            entries, cursors[0] = get_entry_page('fitness', self.user.id, date(2025, 1, 2), limit=3, cursor=cursors[0])
+            payload, cursors[1] = get_entry_page_json('fitness', self.user.id, date(2025, 1, 2), limit=3, cursor=cursors[1])
+            self.assertNotIn('</script>', payload)
+            self.assertEqual(json.loads(payload), entries)
+            self.assertEqual(cursors[0] is None, cursors[1] is None)
+            if not cursors[0]:
+                break
+
+
+class SerializerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.app_context = app.app_context()
+        self.app_context.push()
+
+    def tearDown(self):
+        self.app_context.pop()
+
+    # Serialized rows decode to the same records pandas' to_dict(orient='records') produced
+    def test_rows_to_json_matches_records(self):
+        result = db.session.execute(text(
+            "SELECT 1 AS id, '2025-01-01' AS date, 'Run</script>' AS activity_type, 30.5 AS duration, NULL AS emotion "
+            "UNION ALL SELECT 2, '2025-01-02', 'Swim', 10.0, 'Happy'"
+        ))
+        payload = rows_to_json(result, html_safe=True)
+        self.assertNotIn('</script>', payload)
+        self.assertEqual(json.loads(payload), [
+            {'id': 1, 'date': '2025-01-01', 'activity_type': 'Run</script>', 'duration': 30.5, 'emotion': None},
+            {'id': 2, 'date': '2025-01-02', 'activity_type': 'Swim', 'duration': 10.0, 'emotion': 'Happy'}
+        ])
+        self.assertEqual(rows_to_json(db.session.execute(text("SELECT 1 AS id WHERE 0"))), '[]')
+
+
+class ShareCategoryTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.app_context = app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.sharer = User(username='sharer', email='sharer@example.com', password_hash='x')
+        self.sharee = User(username='sharee', email='sharee@example.com', password_hash='x')
+        db.session.add_all([self.sharer, self.sharee])
+        db.session.commit()
+
+    def tearDown(self):
+        share_cache.clear()
+        fragment_cache.clear()
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def rows(self):
+        return sorted((row.category, row.sharee_user_id, row.is_active) for row in ShareCategory.query)
+
+    # share_categories follows data_categories and is_active through create, update and revoke
+    def test_categories_follow_share_changes(self):
+        share = create_share_entry(self.sharer.id, self.sharee.id, 'fitness_ranking,meal_log', 'all_time')
+        self.assertEqual(self.rows(), [('fitness_ranking', self.sharee.id, True), ('meal_log', self.sharee.id, True)])
+
+        share.data_categories = 'basic_profile,fitness_ranking'
+        db.session.commit()
+        self.assertEqual(share.category_names, ['basic_profile', 'fitness_ranking'])
+        self.assertEqual(self.rows(), [('basic_profile', self.sharee.id, True), ('fitness_ranking', self.sharee.id, True)])
+
+        revoke_share_entry(share.id, self.sharer.id)
+        self.assertEqual(self.rows(), [('basic_profile', self.sharee.id, False), ('fitness_ranking', self.sharee.id, False)])
+        db.session.delete(share)
+        db.session.commit()
+        self.assertEqual(self.rows(), [])
+
+    # The /share page issues the same number of queries whether the user has a few shares or many
+    def test_share_page_query_count_is_constant(self):
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['_user_id'] = str(self.sharer.id)
+            sess['_fresh'] = True
+
+        def count_queries():
+            statements = []
+            listener = lambda *args: statements.append(args[2])
+            g.pop('_login_user', None)
+            event.listen(db.engine, 'before_cursor_execute', listener)
+            try:
+                response = client.get('/share')
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', listener)
+            self.assertEqual(response.status_code, 200)
+            return len(statements)
+
+        def add_shares(start, count):
+            for i in range(start, start + count):
+                other = User(username=f'friend{i}', email=f'friend{i}@example.com', password_hash='x')
+                db.session.add(other)
+                db.session.flush()
+                create_share_entry(self.sharer.id, other.id, 'fitness_ranking', 'all_time')
+                create_share_entry(other.id, self.sharer.id, 'meal_log', 'last_7_days')
+                revoked = create_share_entry(self.sharer.id, other.id, 'basic_profile', 'all_time')
+                revoke_share_entry(revoked.id, self.sharer.id)
+
+        add_shares(0, 1)
+        few = count_queries()
+        response = client.get('/share')
+        self.assertIn(b'friend0', response.data)
+        add_shares(1, 20)
+        self.assertEqual(count_queries(), few)
+
+
+    # A second view of a share is served from the snapshot cache until the sharer writes or the share is revoked
+    def test_shared_snapshots_follow_data_version(self):
+        share = create_share_entry(self.sharer.id, self.sharee.id, 'activity_log,meal_log', 'all_time')
+        add_user_fitness_entry(self.sharer.id, date.today(), 'Running', 30, 300, 'Happy')
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['_user_id'] = str(self.sharee.id)
+            sess['_fresh'] = True
+
+        def view():
+            statements = []
+            listener = lambda *args: statements.append(args[2])
+            g.pop('_login_user', None)
+            event.listen(db.engine, 'before_cursor_execute', listener)
+            try:
+                response = client.get(f'/view_shared_data/{share.id}')
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', listener)
+            return response, len(statements)
+
+        first, miss_queries = view()
+        self.assertEqual(first.status_code, 200)
+        second, hit_queries = view()
+        self.assertEqual(second.data, first.data)
+        self.assertLess(hit_queries, miss_queries)
+
+        add_user_fitness_entry(self.sharer.id, date.today(), 'Swimming', 45, 400, 'Calm')
+        self.assertIn(b'Swimming', view()[0].data)
+        self.assertEqual(get_user_activity_data(self.sharer.id, 'fitness_log', 'all_time')['fitness_log'][0]['activity_type'], 'Swimming')
+        revoke_share_entry(share.id, self.sharer.id)
+        self.assertEqual(share_cache._cache.pop_matching(lambda key: key[0] == 'share'), 0)
+        self.assertEqual(len(share_cache._cache), 1)
+        self.assertEqual(view()[0].status_code, 302)
+
+    # A profile-only snapshot survives entry uploads and follows profile changes through share_version
+    def test_profile_snapshots_follow_share_version(self):
+        info = UserInfo(user_id=self.sharer.id, gender='Other', age=30, height=170, weight=60, date=date.today())
+        db.session.add(info)
+        db.session.commit()
+        self.assertEqual(get_user_activity_data(self.sharer.id, 'basic_profile', 'all_time')['basic_profile']['weight'], 60)
+        add_user_fitness_entry(self.sharer.id, date.today(), 'Running', 30, 300, 'Happy')
+        get_user_activity_data(self.sharer.id, 'basic_profile', 'all_time')
+        self.assertEqual(len(share_cache._cache), 1)
+
+        info.weight = 65
+        db.session.commit()
+        self.assertEqual(get_user_activity_data(self.sharer.id, 'basic_profile', 'all_time')['basic_profile']['weight'], 65)
+        self.assertEqual(len(share_cache._cache), 2)
+
+    # The /share lists come from the fragment cache until a share changes
+    def test_share_lists_fragment_cache(self):
+        # The history names come from current_user, which an earlier test may have cached under this id
+        user_cache.invalidate_user(self.sharer.id)
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['_user_id'] = str(self.sharer.id)
+            sess['_fresh'] = True
+
+        def view():
+            statements = []
+            listener = lambda *args: statements.append(args[2])
+            g.pop('_login_user', None)
+            event.listen(db.engine, 'before_cursor_execute', listener)
+            try:
+                response = client.get('/share')
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', listener)
+            self.assertEqual(response.status_code, 200)
+            return response.data, len(statements)
+
+        share = create_share_entry(self.sharer.id, self.sharee.id, 'meal_log', 'all_time')
+        first, miss_queries = view()
+        second, hit_queries = view()
+        self.assertEqual(second, first)
+        self.assertLess(hit_queries, miss_queries)
+        self.assertIn(b'sharee', first)
+
+        revoke_share_entry(share.id, self.sharer.id)
+        self.assertIn(b'You shared with sharee', view()[0])
+        with mock.patch('app.database.invalidate_fragments', lambda *key: 0):
+            create_share_entry(self.sharer.id, self.sharee.id, 'basic_profile', 'all_time')
+        # Even without the invalidation hook (another worker's cache), the bumped share_version misses
+        self.assertIn(b'Basic Profile', view()[0])
+        # Entry uploads leave share_version, and so the cached lists, alone
+        cached = view()
+        add_user_fitness_entry(self.sharer.id, date.today(), 'Running', 30, 300, 'Happy')
+        self.assertEqual(view(), cached)
+
+
+class PasswordHashingTestCase(unittest.TestCase):
+
+    def setUp(self):
+        app.config['TESTING'] = True
+        app.config['WTF_CSRF_ENABLED'] = False
+        self.client = app.test_client()
+        self.app_context = app.app_context()
+        self.app_context.push()
+        db.create_all()
+        # A hash made with an older, cheaper work factor
+        self.user = User(username='hashuser', email='hash@example.com',
+                         password_hash=generate_password_hash('Test@1234', method='pbkdf2:sha256:1000'))
+        db.session.add(self.user)
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    # A successful login upgrades an outdated hash to the configured work factor
+    def test_login_rehashes_outdated_hash(self):
+        response = self.client.post('/login', data={'email': 'hash@example.com', 'password': 'Test@1234'})
+        self.assertEqual(response.status_code, 302)
+        user = User.query.filter_by(email='hash@example.com').first()
+        self.assertTrue(user.password_hash.startswith(f"pbkdf2:sha256:{app.config['PASSWORD_HASH_ITERATIONS']}$"))
+        self.assertTrue(user.check_password('Test@1234'))
+
+    # With no free hashing slot, login answers 503 straight away
+    def test_login_returns_503_when_pool_saturated(self):
+        self.user.check_password('warm up the pool')
+        with mock.patch.object(passwords, '_slots', threading.BoundedSemaphore(1)) as slots:
+            slots.acquire()
+            response = self.client.post('/login', data={'email': 'hash@example.com', 'password': 'Test@1234'})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers['Retry-After'], '1')
+
+
+class KeyValueStoreTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        path = os.path.join(self.tmpdir.name, 'kv.db')
+        # Two SQLite handles on one file stand in for two worker processes
+        self.stores = {
+            'memory': (MemoryStore(3, 60), None),
+            'sqlite': (SQLiteStore(path, 'test', 3, 60), SQLiteStore(path, 'test', 3, 60))
+        }
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    # Entries expire, the size cap evicts, and the SQLite backend is shared between handles
+    def test_expiry_cap_and_sharing(self):
+        for name, (store, other) in self.stores.items():
+            with self.subTest(backend=name):
+                store['a@example.com'] = {'code': '123456'}
+                self.assertEqual(store['a@example.com']['code'], '123456')
+                self.assertIn('a@example.com', store)
+                if other is not None:
+                    self.assertEqual(other.get('a@example.com'), {'code': '123456'})
+
+                store.set('short', 1, ttl=0.01)
+                time.sleep(0.02)
+                self.assertNotIn('short', store)
+                store.set('swept', 1, ttl=0.01)
+                time.sleep(0.02)
+                self.assertEqual(store.sweep(), 1)
+
+                for key in ('b', 'c', 'd'):
+                    store[key] = key
+                self.assertEqual(len(store), 3)
+                self.assertNotIn('a@example.com', store)
+                self.assertEqual(store.pop('d'), 'd')
+                self.assertIsNone(store.get('d'))
+
+    # The sized store's byte budget evicts least recently used values first and refuses oversized ones
+    def test_sized_store_evicts_by_bytes(self):
+        store = SizedMemoryStore(10)
+        store.set('a', b'1234')
+        store.set('b', b'1234')
+        store.get('a')
+        store.set('c', b'1234')
+        self.assertEqual((store.get('a'), store.get('b'), store.nbytes), (b'1234', None, 8))
+        store.set('d', b'x' * 11)
+        self.assertIsNone(store.get('d'))
+
+
+class EngineProfileTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.app_context = app.app_context()
+        self.app_context.push()
+
+    def tearDown(self):
+        self.app_context.pop()
+
+    # Every pooled SQLite connection gets the configured pragma profile
+    def test_sqlite_pragmas_applied(self):
+        with db.engine.connect() as conn:
+            for name, value in app.config['SQLITE_PRAGMAS'].items():
+                actual = conn.execute(text(f"PRAGMA {name}")).scalar()
+                if name == 'journal_mode':
+                    self.assertEqual(str(actual).lower(), value.lower())
+                elif isinstance(value, int):
+                    self.assertEqual(actual, value)
+
+
+class QueryPlanTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.app_context = app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.users = [User(username=f'plan{i}', email=f'plan{i}@example.com', password_hash='x') for i in range(3)]
+        db.session.add_all(self.users)
+        db.session.commit()
+        self.user_id = self.users[0].id
+        self.start, self.end = date(2025, 1, 1), date(2025, 1, 31)
+        add_user_fitness_entry(self.user_id, date(2025, 1, 10), 'Running', 30, 300, 'Happy')
+        add_user_fitness_entry(self.user_id, date.today(), 'Running', 30, 300, 'Happy')
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def assertNoTableScans(self, run):
+        """Runs run(), then asserts that no SELECT it issued is planned as a full table scan."""
+        issued = []
+        def listener(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith('SELECT'):
+                issued.append((statement, parameters))
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            run()
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+        self.assertTrue(issued, 'No SELECT was issued')
+        for statement, parameters in issued:
+            plan = db.session.connection().exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).fetchall()
+            details = [row[-1] for row in plan]
+            # SCAN CONSTANT ROW and SCAN (subquery-N) are SQLite's empty IN lists and subqueries, not tables
+            self.assertFalse([detail for detail in details if re.match(r'SCAN (?!CONSTANT ROW|\()', detail)],
+                             f"Table scan in {statement}: {details}")
+
+    # The keyset pages read by /visualise, /view_shared_data and /api/entries seek the (user_id, date) indexes
+    def test_entry_pages_use_indexes(self):
+        def run():
+            for entry_type in ('fitness', 'food'):
+                get_entry_page(entry_type, self.user_id, self.start, self.end, limit=1)
+                get_entry_page(entry_type, self.user_id, cursor=encode_entry_cursor(self.end, 10), limit=1)
+        self.assertNoTableScans(run)
+
+    # /api/export streams from the same indexes
+    def test_export_stream_uses_indexes(self):
+        def run():
+            for entry_type in ('fitness', 'food'):
+                stream_entries(entry_type, self.user_id, self.start, self.end).fetchall()
+        self.assertNoTableScans(run)
+
+    # Building, rolling forward and reading leaderboard rows stays on the rollup indexes
+    def test_leaderboard_uses_indexes(self):
+        user_ids = [user.id for user in self.users]
+        def run():
+            get_leaderboard(user_ids, 'week', today=date(2025, 1, 12))
+            get_leaderboard(user_ids, 'week', today=date(2025, 1, 14))
+        self.assertNoTableScans(run)
+
+    # Every query of the ranking and fitness APIs, including the share_categories sharer lookup
+    def test_visualisation_apis_use_indexes(self):
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['_user_id'] = str(self.user_id)
+            sess['_fresh'] = True
+        def run():
+            g.pop('_login_user', None)
+            self.assertEqual(client.get('/api/visualisation/ranking').status_code, 200)
+            self.assertEqual(client.get('/api/visualisation/fitness').status_code, 200)
+        self.assertNoTableScans(run)
+
+    # The shared-activity reads behind get_user_activity_data
+    def test_activity_data_uses_indexes(self):
+        with mock.patch.dict(app.config, {'SHARE_SNAPSHOT_CACHE_BYTES': 0}):
+            self.assertNoTableScans(lambda: get_user_activity_data(self.user_id, 'basic_profile,fitness_log,food_log', 'last_30_days'))
+
 if __name__ == '__main__':
     unittest.main(verbosity=2)